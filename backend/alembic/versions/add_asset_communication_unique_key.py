@@ -0,0 +1,47 @@
+"""Add unique key on asset_communications for bulk upserts
+
+Revision ID: add_asset_communication_unique_key
+Revises: add_asset_interface_lookup_indexes
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_communication_unique_key'
+down_revision = 'add_asset_interface_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicated pairs (possible before the key existed) into one row
+    op.execute("""
+        UPDATE asset_communications c
+        SET packet_count = d.packet_count
+        FROM (
+            SELECT tenant_id, site_id, src_interface_id, dst_interface_id,
+                   MAX(packet_count) AS packet_count
+            FROM asset_communications
+            GROUP BY tenant_id, site_id, src_interface_id, dst_interface_id
+            HAVING COUNT(*) > 1
+        ) d
+        WHERE c.tenant_id = d.tenant_id AND c.site_id = d.site_id
+          AND c.src_interface_id = d.src_interface_id AND c.dst_interface_id = d.dst_interface_id
+    """)
+    op.execute("""
+        DELETE FROM asset_communications a
+        USING asset_communications b
+        WHERE a.tenant_id = b.tenant_id AND a.site_id = b.site_id
+          AND a.src_interface_id = b.src_interface_id AND a.dst_interface_id = b.dst_interface_id
+          AND a.ctid < b.ctid
+    """)
+    op.create_index(
+        'ux_asset_communications_key', 'asset_communications',
+        ['tenant_id', 'site_id', 'src_interface_id', 'dst_interface_id'], unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index('ux_asset_communications_key', table_name='asset_communications')
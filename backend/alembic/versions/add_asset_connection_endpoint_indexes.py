@@ -0,0 +1,25 @@
+"""Add tenant/endpoint indexes on asset_connections
+
+Revision ID: add_asset_connection_endpoint_indexes
+Revises: add_asset_position_version
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_connection_endpoint_indexes'
+down_revision = 'add_asset_position_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_asset_connections_tenant_parent', 'asset_connections', ['tenant_id', 'parent_asset_id'], unique=False)
+    op.create_index('ix_asset_connections_tenant_child', 'asset_connections', ['tenant_id', 'child_asset_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_asset_connections_tenant_child', table_name='asset_connections')
+    op.drop_index('ix_asset_connections_tenant_parent', table_name='asset_connections')
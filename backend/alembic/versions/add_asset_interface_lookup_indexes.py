@@ -0,0 +1,25 @@
+"""Add tenant MAC / IP lookup indexes on asset_interfaces
+
+Revision ID: add_asset_interface_lookup_indexes
+Revises: add_asset_risk_score_dirty
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_interface_lookup_indexes'
+down_revision = 'add_asset_risk_score_dirty'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_asset_interfaces_tenant_mac', 'asset_interfaces', ['tenant_id', 'mac_address'], unique=False)
+    op.create_index('ix_asset_interfaces_tenant_ip', 'asset_interfaces', ['tenant_id', 'ip_address'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_asset_interfaces_tenant_ip', table_name='asset_interfaces')
+    op.drop_index('ix_asset_interfaces_tenant_mac', table_name='asset_interfaces')
@@ -0,0 +1,28 @@
+"""Add composite indexes for keyset pagination of assets
+
+Revision ID: add_asset_keyset_indexes
+Revises: add_modern_email_providers
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_keyset_indexes'
+down_revision = 'add_modern_email_providers'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows without updated_at would be skipped by the (updated_at, id) cursor
+    op.execute("UPDATE assets SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL")
+
+    op.create_index('ix_assets_tenant_name_id', 'assets', ['tenant_id', 'name', 'id'], unique=False)
+    op.create_index('ix_assets_tenant_updated_at_id', 'assets', ['tenant_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_assets_tenant_updated_at_id', table_name='assets')
+    op.drop_index('ix_assets_tenant_name_id', table_name='assets')
@@ -0,0 +1,23 @@
+"""Add position_version for optimistic locking of asset map positions
+
+Revision ID: add_asset_position_version
+Revises: add_pcap_import_jobs
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_position_version'
+down_revision = 'add_pcap_import_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('assets', sa.Column('position_version', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade():
+    op.drop_column('assets', 'position_version')
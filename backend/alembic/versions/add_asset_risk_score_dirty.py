@@ -0,0 +1,29 @@
+"""Add risk_score_dirty flag for incremental risk rescoring
+
+Revision ID: add_asset_risk_score_dirty
+Revises: add_asset_risk_score_index
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_risk_score_dirty'
+down_revision = 'add_asset_risk_score_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing assets start dirty: the rescore worker scores them once
+    op.add_column('assets', sa.Column('risk_score_dirty', sa.Boolean(), server_default=sa.text('true'), nullable=False))
+    op.create_index(
+        'ix_assets_risk_score_dirty', 'assets', ['tenant_id'],
+        unique=False, postgresql_where=sa.text('risk_score_dirty'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_assets_risk_score_dirty', table_name='assets')
+    op.drop_column('assets', 'risk_score_dirty')
@@ -0,0 +1,23 @@
+"""Add index for the top risky assets of the risk overview
+
+Revision ID: add_asset_risk_score_index
+Revises: add_tenant_asset_stats
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_risk_score_index'
+down_revision = 'add_tenant_asset_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_assets_tenant_risk_score', 'assets', ['tenant_id', 'risk_score'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_assets_tenant_risk_score', table_name='assets')
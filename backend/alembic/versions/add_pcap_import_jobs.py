@@ -0,0 +1,51 @@
+"""Add pcap_import_jobs queue table
+
+Revision ID: add_pcap_import_jobs
+Revises: add_asset_communication_unique_key
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_pcap_import_jobs'
+down_revision = 'add_asset_communication_unique_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pcap_import_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('sites.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('created_by', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('accumulate', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('phase', sa.String(30), nullable=False, server_default='queued'),
+        sa.Column('files', postgresql.JSONB(), nullable=False, server_default='[]'),
+        sa.Column('total_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('bytes_processed', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('packets_processed', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('devices_found', sa.Integer(), nullable=True),
+        sa.Column('result', postgresql.JSONB(), nullable=True),
+        sa.Column('error_code', sa.String(100), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_pcap_import_jobs_tenant_created', 'pcap_import_jobs', ['tenant_id', 'created_at'])
+    op.create_index(
+        'ix_pcap_import_jobs_queued', 'pcap_import_jobs', ['created_at'],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_pcap_import_jobs_queued', table_name='pcap_import_jobs')
+    op.drop_index('ix_pcap_import_jobs_tenant_created', table_name='pcap_import_jobs')
+    op.drop_table('pcap_import_jobs')
@@ -0,0 +1,25 @@
+"""Add worker lease columns to pcap_import_jobs
+
+Revision ID: add_pcap_job_leases
+Revises: add_asset_connection_endpoint_indexes
+Create Date: 2026-10-17 23:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_pcap_job_leases'
+down_revision = 'add_asset_connection_endpoint_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('pcap_import_jobs', sa.Column('worker_id', sa.String(100), nullable=True))
+    op.add_column('pcap_import_jobs', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('pcap_import_jobs', 'lease_expires_at')
+    op.drop_column('pcap_import_jobs', 'worker_id')
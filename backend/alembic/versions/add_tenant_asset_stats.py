@@ -0,0 +1,33 @@
+"""Add tenant_asset_stats rollup table
+
+Revision ID: add_tenant_asset_stats
+Revises: add_asset_keyset_indexes
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_tenant_asset_stats'
+down_revision = 'add_asset_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows are filled lazily by the first dashboard read or by the periodic reconcile
+    op.create_table('tenant_asset_stats',
+    sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('asset_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tenant_id', 'dimension', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('tenant_asset_stats')
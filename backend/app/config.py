@@ -34,6 +34,42 @@ class Settings(BaseSettings):
     AUDIT_LOG_ENABLED: bool = os.getenv("AUDIT_LOG_ENABLED", "true").lower() == "true"
     AUDIT_LOG_RETENTION_DAYS: int = int(os.getenv("AUDIT_LOG_RETENTION_DAYS", "365"))
 
+    # Asset statistics rollup (tenant_asset_stats)
+    ASSET_STATS_RECONCILE_SECONDS: int = int(
+        os.getenv("ASSET_STATS_RECONCILE_SECONDS", "3600")
+    )
+
+    # PCAP import
+    PCAP_MAX_UPLOAD_MB: int = int(os.getenv("PCAP_MAX_UPLOAD_MB", "2048"))
+    # Parser processes (0 = one per CPU) and byte range parsed by each task
+    PCAP_PARSE_WORKERS: int = int(os.getenv("PCAP_PARSE_WORKERS", "0"))
+    PCAP_CHUNK_MB: int = int(os.getenv("PCAP_CHUNK_MB", "64"))
+    # Background import job workers (0 = no worker in this process) and queue polling
+    PCAP_JOB_WORKERS: int = int(os.getenv("PCAP_JOB_WORKERS", "1"))
+    PCAP_JOB_POLL_SECONDS: float = float(os.getenv("PCAP_JOB_POLL_SECONDS", "2"))
+    # Lease of a running job, renewed by its worker: past it the job is requeued
+    PCAP_JOB_LEASE_SECONDS: int = int(os.getenv("PCAP_JOB_LEASE_SECONDS", "120"))
+
+    # Live flow ingestion: aggregation window and maximum size of a posted chunk
+    FLOW_WINDOW_SECONDS: int = int(os.getenv("FLOW_WINDOW_SECONDS", "10"))
+    FLOW_MAX_CHUNK_MB: int = int(os.getenv("FLOW_MAX_CHUNK_MB", "32"))
+
+    # XLSX/CSV imports: rows written (and, per batch, committed) together and
+    # lifetime of the rows staged by a preview for its confirm
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_TOKEN_TTL_MINUTES: int = int(os.getenv("IMPORT_TOKEN_TTL_MINUTES", "60"))
+
+    # Network map topology: default node budget of a request and lifetime
+    # of the per-tenant cached topologies
+    TOPOLOGY_MAX_NODES: int = int(os.getenv("TOPOLOGY_MAX_NODES", "500"))
+    TOPOLOGY_CACHE_TTL_SECONDS: int = int(os.getenv("TOPOLOGY_CACHE_TTL_SECONDS", "300"))
+
+    # Incremental risk rescoring of dirty assets
+    RISK_RESCORE_INTERVAL_SECONDS: int = int(
+        os.getenv("RISK_RESCORE_INTERVAL_SECONDS", "30")
+    )
+    RISK_RESCORE_BATCH_SIZE: int = int(os.getenv("RISK_RESCORE_BATCH_SIZE", "1000"))
+
     # CORS
     CORS_ORIGINS: str = os.getenv(
         "CORS_ORIGINS",
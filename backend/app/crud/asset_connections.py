@@ -2,9 +2,10 @@
 
 from typing import List, Optional
 import uuid
-from app.models import AssetConnection
+from app.models import Asset, AssetConnection, AssetStatus, AssetType, Site
 from app.schemas.asset_connection import AssetConnectionCreate, AssetConnectionUpdate
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, aliased
 
 
 def create_asset_connection(
@@ -110,25 +111,43 @@ def delete_asset_connection(db: Session, connection: AssetConnection) -> None:
     db.commit()
 
 
+def _endpoint_filter(parent, child, site_id=None, asset_type_id=None):
+    """
+    Criteria of the connections with an endpoint (parent or child) matching
+    every given filter, None without filters
+    """
+
+    def matches(asset):
+        criteria = []
+        if site_id:
+            criteria.append(asset.site_id == site_id)
+        if asset_type_id:
+            criteria.append(asset.asset_type_id == asset_type_id)
+        return criteria
+
+    if not site_id and not asset_type_id:
+        return None
+    return or_(and_(*matches(parent)), and_(*matches(child)))
+
+
 def get_all_connections(
     db: Session, 
     tenant_id: uuid.UUID,
     site_id: uuid.UUID = None,
     asset_type_id: uuid.UUID = None
 ) -> List[AssetConnection]:
-    """Get all connections with optional filtering"""
+    """Get all connections, optionally those with an endpoint in site_id / of asset_type_id"""
     query = db.query(AssetConnection).filter(AssetConnection.tenant_id == tenant_id)
-    
-    if site_id:
-        # Filter by site - need to join with assets
-        from app.models.asset import Asset
-        query = query.join(Asset, AssetConnection.parent_asset_id == Asset.id).filter(Asset.site_id == site_id)
-    
-    if asset_type_id:
-        # Filter by asset type - need to join with assets
-        from app.models.asset import Asset
-        query = query.join(Asset, AssetConnection.parent_asset_id == Asset.id).filter(Asset.asset_type_id == asset_type_id)
-    
+
+    parent, child = aliased(Asset), aliased(Asset)
+    endpoint_filter = _endpoint_filter(parent, child, site_id, asset_type_id)
+    if endpoint_filter is not None:
+        query = (
+            query.join(parent, AssetConnection.parent_asset_id == parent.id)
+            .join(child, AssetConnection.child_asset_id == child.id)
+            .filter(endpoint_filter)
+        )
+
     return query.all()
 
 
@@ -138,57 +157,59 @@ def get_network_topology(
     site_id: uuid.UUID = None,
     asset_type_id: uuid.UUID = None
 ) -> dict:
-    """Get network topology data for visualization"""
-    connections = get_all_connections(db, tenant_id, site_id, asset_type_id)
-    
-    # Get unique assets from connections
-    asset_ids = set()
-    for conn in connections:
-        if conn.parent_asset_id:
-            asset_ids.add(conn.parent_asset_id)
-        if conn.child_asset_id:
-            asset_ids.add(conn.child_asset_id)
-    
-    # Get asset details
-    from app.models.asset import Asset
-    from app.models.asset_type import AssetType
-    from app.models.site import Site
-    from app.models.asset_status import AssetStatus
-    
-    assets = (
-        db.query(Asset)
-        .join(AssetType, Asset.asset_type_id == AssetType.id)
-        .join(Site, Asset.site_id == Site.id)
-        .join(AssetStatus, Asset.status_id == AssetStatus.id)
-        .filter(Asset.id.in_(asset_ids))
-        .all()
-    )
-    
-    # Build nodes and edges
-    nodes = []
+    """
+    Get network topology data for visualization: the connections (filtered
+    as by get_all_connections) with the attributes of both endpoints, in
+    one query
+    """
+    parent, child = aliased(Asset), aliased(Asset)
+    columns = [AssetConnection.connection_type, AssetConnection.protocol]
+    joins = []
+    for asset, asset_id in (
+        (parent, AssetConnection.parent_asset_id),
+        (child, AssetConnection.child_asset_id),
+    ):
+        asset_type, site, status = aliased(AssetType), aliased(Site), aliased(AssetStatus)
+        columns += [asset.id, asset.name, asset_type.name, site.name, status.name, asset.risk_score]
+        joins += [
+            (asset, asset.id == asset_id),
+            (asset_type, asset.asset_type_id == asset_type.id),
+            (site, asset.site_id == site.id),
+            (status, asset.status_id == status.id),
+        ]
+    query = select(*columns).select_from(AssetConnection)
+    for target, onclause in joins:
+        query = query.join(target, onclause)
+    query = query.where(AssetConnection.tenant_id == tenant_id)
+    endpoint_filter = _endpoint_filter(parent, child, site_id, asset_type_id)
+    if endpoint_filter is not None:
+        query = query.where(endpoint_filter)
+
+    nodes = {}
     edges = []
-    
-    for asset in assets:
-        nodes.append({
-            "id": str(asset.id),
-            "label": asset.name,
-            "type": asset.asset_type.name,
-            "site": asset.site.name,
-            "status": asset.status.name,
-            "risk_score": asset.risk_score
-        })
-    
-    for conn in connections:
-        if conn.parent_asset_id and conn.child_asset_id:
-            edges.append({
-                "from": str(conn.parent_asset_id),
-                "to": str(conn.child_asset_id),
-                "type": conn.connection_type,
-                "protocol": conn.protocol
+    for connection_type, protocol, *attributes in db.execute(query):
+        # Six attributes per endpoint: id, name, type, site, status, risk_score
+        for asset_id, name, type_name, site_name, status_name, risk_score in (
+            attributes[:6],
+            attributes[6:],
+        ):
+            nodes.setdefault(asset_id, {
+                "id": str(asset_id),
+                "label": name,
+                "type": type_name,
+                "site": site_name,
+                "status": status_name,
+                "risk_score": risk_score
             })
-    
+        edges.append({
+            "from": str(attributes[0]),
+            "to": str(attributes[6]),
+            "type": connection_type,
+            "protocol": protocol
+        })
+
     return {
-        "nodes": nodes,
+        "nodes": list(nodes.values()),
         "edges": edges,
         "total_assets": len(nodes),
         "total_connections": len(edges)
@@ -1,8 +1,9 @@
 # backend/crud/assets.py
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.models import Asset, Location
-from app.schemas import AssetCreate, AssetUpdate, AssetCustomFieldUpdate
-from sqlalchemy import and_, or_
+from app.schemas import AssetCreate, AssetUpdate, AssetCustomFieldUpdate, AssetPositionUpdate
+from sqlalchemy import Float, Integer, and_, cast, column, or_, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 import uuid
 from typing import List, Optional
 from app.crud import asset_connections as crud_asset_connections
@@ -15,35 +16,46 @@ from app.crud.asset_interface import (
 from app.schemas.asset_interface import AssetInterfaceCreate, AssetInterfaceUpdate
 from uuid import UUID
 from app.utils import sanitize_text_fields
+from app.services.network_topology import invalidate_topology_cache
+
+
+def asset_load_profile(profile: str = "list") -> list:
+    """
+    Eager-loading options for Asset queries, so that a whole page of assets
+    (relations included) resolves in a fixed number of queries.
+    - list: everything serialized by AssetRead
+    - detail: as list, plus the location floorplan
+    - map: only the many-to-one relations used by the network map
+    """
+    options = [
+        joinedload(Asset.site),
+        joinedload(Asset.location),
+        joinedload(Asset.area),
+        joinedload(Asset.status),
+        joinedload(Asset.manufacturer),
+        joinedload(Asset.asset_type),
+    ]
+    if profile == "map":
+        return options
+    options += [
+        selectinload(Asset.interfaces),
+        selectinload(Asset.contacts),
+        selectinload(Asset.documents),
+        selectinload(Asset.photos),
+    ]
+    if profile == "detail":
+        options[1] = joinedload(Asset.location).joinedload(Location.floorplan)
+    return options
 
 
 def get_asset(db: Session, asset_id: uuid.UUID) -> Optional[Asset]:
     """Retrieve an asset by ID"""
-    asset = (
+    return (
         db.query(Asset)
-        .options(
-            joinedload(Asset.location).joinedload(Location.floorplan),
-            joinedload(Asset.manufacturer),
-            joinedload(Asset.status),
-            joinedload(Asset.site),
-        )
+        .options(*asset_load_profile("detail"))
         .filter(Asset.id == asset_id)
         .first()
     )
-    
-    if asset and asset.area_id:
-        print(f"DEBUG: Asset {asset.name} has area_id: {asset.area_id}")
-        
-        # Carica l'area separatamente
-        from app.models.area import Area
-        area = db.query(Area).filter(Area.id == asset.area_id).first()
-        print(f"DEBUG: Area loaded separately: {area}")
-        if area:
-            print(f"DEBUG: Area name: {area.name}")
-            # Non assegniamo l'area all'asset per evitare problemi di serializzazione
-            # L'area verrà aggiunta manualmente nella risposta del router
-    
-    return asset
 
 
 def get_assets(
@@ -344,11 +356,72 @@ def update_asset_position(db: Session, asset_id: uuid.UUID, map_x: float, map_y:
         return None
     db_asset.map_x = map_x
     db_asset.map_y = map_y
+    db_asset.position_version = Asset.position_version + 1
     db.commit()
     db.refresh(db_asset)
     return db_asset
 
 
+def _position(asset_id, map_x, map_y, version) -> dict:
+    return {"id": asset_id, "map_x": map_x, "map_y": map_y, "version": version}
+
+
+def update_asset_positions(
+    db: Session, tenant_id: uuid.UUID, positions: List[AssetPositionUpdate]
+) -> dict:
+    """
+    Save many positions with one UPDATE ... FROM (VALUES ...) and commit.
+    A position with a version is only saved if the asset position_version
+    still matches (optimistic locking). Return {"updated": [...],
+    "conflicts": [current position of the rejected assets], "not_found":
+    [ids]}; positions carry their new version.
+    """
+    # The last position of an id wins
+    by_id = {position.id: position for position in positions}
+    if not by_id:
+        return {"updated": [], "conflicts": [], "not_found": []}
+    rows = values(
+        column("id", PG_UUID(as_uuid=True)),
+        column("map_x", Float),
+        column("map_y", Float),
+        column("version", Integer),
+        name="positions",
+    ).data([(p.id, p.map_x, p.map_y, p.version) for p in by_id.values()])
+    updated = db.execute(
+        update(Asset)
+        .where(
+            Asset.id == rows.c.id,
+            Asset.tenant_id == tenant_id,
+            or_(
+                rows.c.version == None,
+                Asset.position_version == cast(rows.c.version, Integer),
+            ),
+        )
+        .values(
+            map_x=rows.c.map_x,
+            map_y=rows.c.map_y,
+            position_version=Asset.position_version + 1,
+        )
+        .returning(Asset.id, Asset.map_x, Asset.map_y, Asset.position_version)
+        .execution_options(synchronize_session=False)
+    ).all()
+    rejected = by_id.keys() - {row.id for row in updated}
+    conflicts = []
+    if rejected:
+        conflicts = db.query(
+            Asset.id, Asset.map_x, Asset.map_y, Asset.position_version
+        ).filter(Asset.id.in_(rejected), Asset.tenant_id == tenant_id).all()
+    db.commit()
+    if updated:
+        invalidate_topology_cache(tenant_id)
+    not_found = rejected - {row.id for row in conflicts}
+    return {
+        "updated": [_position(*row) for row in updated],
+        "conflicts": [_position(*row) for row in conflicts],
+        "not_found": [asset_id for asset_id in by_id if asset_id in not_found],
+    }
+
+
 def get_asset_photos(db: Session, asset_id: uuid.UUID) -> List:
     """Retrieve the photos of an asset"""
     from app.models.asset_photo import AssetPhoto
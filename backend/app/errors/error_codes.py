@@ -36,6 +36,7 @@ class ErrorCode(str, Enum):
     DELETE_USER_FAILED = "DELETE_USER_FAILED"
     INVALID_USER_CREATION = "INVALID_USER_CREATION"
     PCAP_UPLOAD_FAILED = "PCAP_UPLOAD_FAILED"
+    PCAP_JOB_NOT_FOUND = "PCAP_JOB_NOT_FOUND"
     CONTACT_NOT_FOUND = "CONTACT_NOT_FOUND"
     PERMISSION_NOT_FOUND = "PERMISSION_NOT_FOUND"
     ROLE_NOT_FOUND = "ROLE_NOT_FOUND"
@@ -66,3 +67,5 @@ class ErrorCode(str, Enum):
     FILE_DOWNLOAD_FAILED = "FILE_DOWNLOAD_FAILED"
     INVALID_FILE_FORMAT = "INVALID_FILE_FORMAT"
     FILE_TOO_LARGE = "FILE_TOO_LARGE"
+    INVALID_CURSOR = "INVALID_CURSOR"
+    IMPORT_NOT_FOUND = "IMPORT_NOT_FOUND"
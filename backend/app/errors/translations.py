@@ -12,8 +12,12 @@ messages = {
         "INVALID_USER_LIST": "Invalid user list.",
         "INVALID_USER_DELETE": "Invalid user delete.",
         "INVALID_ASSET_DOCUMENT_FORMAT": "Invalid document format. Allowed types: PDF, DOC, DOCX, TXT, CSV, XLS, XLSX.",
-        "INVALID_FILE_FORMAT": "Invalid file format. Only PCAP files are allowed.",
-        "FILE_TOO_LARGE": "File too large. Maximum size is 50MB.",
+        "INVALID_FILE_FORMAT": "Invalid file format. Only PCAP / PCAPNG files are allowed.",
+        "FILE_TOO_LARGE": "File too large.",
+        "PCAP_UPLOAD_FAILED": "PCAP import failed.",
+        "PCAP_JOB_NOT_FOUND": "PCAP import job not found.",
+        "INVALID_CURSOR": "Invalid or expired pagination cursor.",
+        "IMPORT_NOT_FOUND": "Import not found or expired. Please upload the file again.",
         "VALIDATION_ERROR": "Invalid input data.",
         "INTERNAL_ERROR": "Internal server error.",
     },
@@ -28,8 +32,12 @@ messages = {
         "INVALID_USER_LIST": "Elenco utenti non valido.",
         "INVALID_USER_DELETE": "Eliminazione utente non valida.",
         "INVALID_ASSET_DOCUMENT_FORMAT": "Formato documento non valido. Tipi consentiti: PDF, DOC, DOCX, TXT, CSV, XLS, XLSX.",
-        "INVALID_FILE_FORMAT": "Formato file non valido. Sono consentiti solo file PCAP.",
-        "FILE_TOO_LARGE": "File troppo grande. Dimensione massima 50MB.",
+        "INVALID_FILE_FORMAT": "Formato file non valido. Sono consentiti solo file PCAP / PCAPNG.",
+        "FILE_TOO_LARGE": "File troppo grande.",
+        "PCAP_UPLOAD_FAILED": "Importazione PCAP non riuscita.",
+        "PCAP_JOB_NOT_FOUND": "Importazione PCAP non trovata.",
+        "INVALID_CURSOR": "Cursore di paginazione non valido o scaduto.",
+        "IMPORT_NOT_FOUND": "Importazione non trovata o scaduta. Carica di nuovo il file.",
         "VALIDATION_ERROR": "Dati di input non validi.",
         "INTERNAL_ERROR": "Errore interno del server.",
     },
@@ -89,10 +89,28 @@ from app.routers import setup
 from app.setup_system import setup_system
 from app.database import SessionLocal
 from app.models import Tenant, User, Role
+from app.services.asset_stats import (
+    register_asset_stats_listeners,
+    start_asset_stats_reconciler,
+)
+from app.services.risk_scoring import (
+    register_risk_dirty_listeners,
+    start_risk_rescore_worker,
+)
+from app.services.network_topology import register_topology_cache_listeners
+from app.services.pcap_jobs import start_pcap_job_workers
+from app.services.flow_ingest import flow_aggregator, start_flow_flusher
 
 # Setup logging
 setup_logging()
 
+# Keep the tenant_asset_stats rollup in sync with asset writes
+register_asset_stats_listeners()
+# Mark assets for rescoring when their risk inputs change
+register_risk_dirty_listeners()
+# Drop the cached network topologies of a tenant when its map changes
+register_topology_cache_listeners()
+
 app = FastAPI(
     title="Industrace Multi-Tenant",
     description="Configuration Management Database for Industrial Control Systems",
@@ -228,6 +246,26 @@ async def startup_event():
         # Non blocchiamo l'avvio dell'app in caso di errore
 
 
+@app.on_event("startup")
+async def start_background_jobs():
+    """
+    Periodic full reconcile of the asset statistics rollup, rescoring of
+    dirty assets, the PCAP import job workers and the live flow flush
+    """
+    start_asset_stats_reconciler(SessionLocal, settings.ASSET_STATS_RECONCILE_SECONDS)
+    start_risk_rescore_worker(
+        SessionLocal, settings.RISK_RESCORE_INTERVAL_SECONDS, settings.RISK_RESCORE_BATCH_SIZE
+    )
+    start_pcap_job_workers(SessionLocal, settings.PCAP_JOB_WORKERS, settings.PCAP_JOB_POLL_SECONDS)
+    start_flow_flusher(SessionLocal, settings.FLOW_WINDOW_SECONDS)
+
+
+@app.on_event("shutdown")
+def flush_live_flows():
+    """Write the live flows aggregated since the last window"""
+    flow_aggregator.flush(SessionLocal)
+
+
 from app.errors.validation_errors import ValidationError, InvalidVATNumberError, InvalidTaxCodeError, InvalidURLError, InvalidPhoneError, InvalidEmailError, InvalidIPAddressError, InvalidMACAddressError, InvalidVLANError, InvalidImpactValueError, InvalidPurdueLevelError, InvalidRiskScoreError, InvalidBusinessCriticalityError, InvalidRemoteAccessTypeError, InvalidPhysicalAccessEaseError, InvalidTenantSlugError, InvalidPasswordError
 
 @app.exception_handler(RequestValidationError)
@@ -18,6 +18,8 @@ from .tenant_smtp_config import TenantSMTPConfig
 from .print_template import PrintTemplate
 from .print_history import PrintHistory
 from .api_key import ApiKey
+from .tenant_asset_stat import TenantAssetStat
+from .pcap_import_job import PcapImportJob
 
 # Questi modelli dipendono dagli altri (devono venire dopo)
 from .supplier import Supplier, SupplierDocument
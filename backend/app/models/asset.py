@@ -10,6 +10,8 @@ from sqlalchemy import (
     Integer,
     Boolean,
     Date,
+    Index,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
@@ -57,6 +59,15 @@ asset_suppliers = Table(
 
 class Asset(Base):
     __tablename__ = "assets"
+    __table_args__ = (
+        # Keyset pagination of the asset list (see routers/assets.list_assets)
+        Index("ix_assets_tenant_name_id", "tenant_id", "name", "id"),
+        Index("ix_assets_tenant_updated_at_id", "tenant_id", "updated_at", "id"),
+        # Top risky assets of the risk overview
+        Index("ix_assets_tenant_risk_score", "tenant_id", "risk_score"),
+        # Queue of the risk rescore worker
+        Index("ix_assets_risk_score_dirty", "tenant_id", postgresql_where=text("risk_score_dirty")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
@@ -89,6 +100,8 @@ class Asset(Base):
     last_seen = Column(DateTime)
     map_x = Column(Float, nullable=True)
     map_y = Column(Float, nullable=True)
+    # Bumped by every position save, checked by the batch position update
+    position_version = Column(Integer, default=0, server_default=text("0"), nullable=False)
     deleted_at = Column(DateTime, nullable=True)
     installation_date = Column(Date, nullable=True)
     business_criticality = Column(String, nullable=True)
@@ -102,6 +115,8 @@ class Asset(Base):
     update_status = Column(String(50), default="manual")  # manual/imported/auto
     risk_score = Column(Float, default=0.0)  # calculated field 0-100
     last_risk_assessment = Column(DateTime, default=func.now())
+    # Set when a scoring input changes, cleared by the risk rescore worker
+    risk_score_dirty = Column(Boolean, default=True, server_default=text("true"), nullable=False)
     status = relationship("AssetStatus", back_populates="assets")
     site = relationship("Site", back_populates="assets")
     asset_type = relationship("AssetType", back_populates="assets")
@@ -117,3 +132,11 @@ class Asset(Base):
     interfaces = relationship(
         "AssetInterface", back_populates="asset", cascade="all, delete-orphan"
     )
+
+    @property
+    def area_name(self):
+        return self.area.name if self.area else None
+
+    @property
+    def area_code(self):
+        return self.area.code if self.area else None
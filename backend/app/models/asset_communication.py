@@ -1,5 +1,5 @@
 # backend/models/asset_communication.py
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -8,6 +8,17 @@ from app.database import Base
 
 class AssetCommunication(Base):
     __tablename__ = "asset_communications"
+    __table_args__ = (
+        # Key of the bulk upsert in services/asset_sync.sync_communications
+        Index(
+            "ux_asset_communications_key",
+            "tenant_id",
+            "site_id",
+            "src_interface_id",
+            "dst_interface_id",
+            unique=True,
+        ),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     src_interface_id = Column(
         UUID(as_uuid=True), ForeignKey("asset_interfaces.id"), nullable=False
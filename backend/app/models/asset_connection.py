@@ -1,5 +1,5 @@
 # backend/models/asset_connection.py
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -9,6 +9,11 @@ from app.database import Base
 
 class AssetConnection(Base):
     __tablename__ = "asset_connections"
+    __table_args__ = (
+        # Connections of an asset from either side, within the tenant
+        Index("ix_asset_connections_tenant_parent", "tenant_id", "parent_asset_id"),
+        Index("ix_asset_connections_tenant_child", "tenant_id", "child_asset_id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
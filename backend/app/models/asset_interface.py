@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, ForeignKey, DateTime
+from sqlalchemy import Column, String, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -8,6 +8,11 @@ from datetime import datetime
 
 class AssetInterface(Base):
     __tablename__ = "asset_interfaces"
+    __table_args__ = (
+        # Prefetch of the PCAP import (see services/asset_sync.py)
+        Index("ix_asset_interfaces_tenant_mac", "tenant_id", "mac_address"),
+        Index("ix_asset_interfaces_tenant_ip", "tenant_id", "ip_address"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     asset_id = Column(UUID(as_uuid=True), ForeignKey("assets.id"), nullable=False)
     name = Column(String(50))  
@@ -0,0 +1,53 @@
+# backend/models/pcap_import_job.py
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+import uuid
+from app.database import Base
+
+
+class PcapImportJob(Base):
+    """
+    A PCAP upload waiting for, or going through, parsing and sync.
+    The table is the queue: workers claim queued rows with
+    SELECT ... FOR UPDATE SKIP LOCKED (see services/pcap_jobs.py) and
+    write the progress back on the row.
+    """
+
+    __tablename__ = "pcap_import_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False)
+    site_id = Column(UUID(as_uuid=True), ForeignKey("sites.id", ondelete="CASCADE"), nullable=False)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    accumulate = Column(Boolean, nullable=False, default=False)
+
+    # queued -> running -> completed | failed
+    status = Column(String(20), nullable=False, default="queued")
+    # queued, parsing, syncing_assets, syncing_communications, done
+    phase = Column(String(30), nullable=False, default="queued")
+    # Spooled captures: [{"name", "path", "digest", "size"}]
+    files = Column(JSONB, nullable=False, default=list)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+    bytes_processed = Column(BigInteger, nullable=False, default=0)
+    packets_processed = Column(BigInteger, nullable=False, default=0)
+    devices_found = Column(Integer, nullable=True)
+    result = Column(JSONB, nullable=True)
+    error_code = Column(String(100), nullable=True)
+    # Worker running the job and end of its lease, renewed while it runs
+    worker_id = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_pcap_import_jobs_tenant_created", "tenant_id", "created_at"),
+        Index(
+            "ix_pcap_import_jobs_queued",
+            "created_at",
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
@@ -0,0 +1,26 @@
+# backend/models/tenant_asset_stat.py
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class TenantAssetStat(Base):
+    """
+    Per-tenant rollup of asset counters, one row per (dimension, key).
+    Dimensions: total, site, status, type, criticality, risk_band.
+    Kept current by services/asset_stats on every flush and fully
+    reconciled periodically.
+    """
+
+    __tablename__ = "tenant_asset_stats"
+
+    tenant_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("tenants.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    dimension = Column(String(20), primary_key=True)
+    key = Column(String(64), primary_key=True)
+    asset_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
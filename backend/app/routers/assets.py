@@ -1,16 +1,25 @@
 import uuid
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, Request, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, UploadFile, File, Form
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-import pandas as pd
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy import func, literal, or_, select, tuple_
 
+from app.config import settings
 from app.database import get_db
-from app.models import User, Asset, AssetCommunication
+from app.models import (
+    User,
+    Area,
+    Asset,
+    AssetCommunication,
+    AssetStatus,
+    AssetType,
+    Location,
+    Manufacturer,
+    Site,
+)
 from app.services.audit_decorator import audit_log_action
 from app.schemas import (
     AssetRead as AssetSchema,
@@ -19,22 +28,37 @@ from app.schemas import (
     AssetCustomFieldUpdate,
     AssetRead,
     PositionUpdate,
+    AssetPositionUpdate,
 )
 from app.services.auth import get_current_user
 from app.services.audit_log import create_audit_log
 from app.crud import assets as crud_assets
 from app.errors.exceptions import ErrorCodeException
 from app.errors.error_codes import ErrorCode
+from app.utils import clamp_page_size, decode_cursor, encode_cursor, estimate_row_count
 from app.schemas.asset_status import AssetStatus as AssetStatusSchema
 from app.schemas.contact import Contact as ContactSchema
 from app.schemas.asset import AssetBulkUpdateRequest, AssetBulkSoftDeleteRequest
 from app.schemas.asset import RiskScoreRequest, RiskScoreResponse, RiskOverviewResponse
-from app.services.risk_scoring import CompositeRiskScoringEngine
+from app.services.asset_graph import AssetAdjacency
+from app.services.asset_import import AssetImport
+from app.services.import_engine import (
+    ImportFileError,
+    confirm_import,
+    preview_import,
+    stage_import,
+    staged_import_path,
+)
+from app.services.table_export import stream_export
+from app.services import asset_bulk
+from app.services.risk_scoring import (
+    CompositeRiskScoringEngine,
+    recalculate_risk_scores,
+)
 import io
 import json
 import math
 from app.models.asset_interface import AssetInterface
-from app.models.print_history import PrintHistory
 from app.models.supplier import Supplier
 from app.schemas.supplier import Supplier as SupplierSchema
 
@@ -62,15 +86,37 @@ def create_asset(
 # Schema per la risposta paginata
 class PaginatedAssetsResponse(BaseModel):
     data: List[AssetSchema]
-    total: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
 
-# List assets (with optional filters)
-@router.get("", response_model=PaginatedAssetsResponse)
-def list_assets(
-    skip: int = 0,
-    limit: int = 100,
+
+# Keyset sort orders: (sort expression, descending)
+ASSET_SORT_KEYS = {
+    "name": (Asset.name, False),
+    "updated_at": (Asset.updated_at, True),
+}
+
+
+def _decode_asset_cursor(cursor: str, sort: str):
+    values = decode_cursor(cursor)
+    if not values or len(values) != 2:
+        raise ErrorCodeException(status_code=400, error_code=ErrorCode.INVALID_CURSOR)
+    key, last_id = values
+    try:
+        last_id = uuid.UUID(last_id)
+        if sort == "updated_at":
+            key = datetime.fromisoformat(key)
+    except (TypeError, ValueError):
+        raise ErrorCodeException(status_code=400, error_code=ErrorCode.INVALID_CURSOR)
+    return key, last_id
+
+
+def _filter_assets(
+    query,
+    tenant_id: uuid.UUID,
     status_id: Optional[uuid.UUID] = None,
     site_id: Optional[uuid.UUID] = None,
     area_id: Optional[uuid.UUID] = None,
@@ -79,30 +125,9 @@ def list_assets(
     business_criticality: Optional[str] = None,
     risk_score_min: Optional[float] = None,
     risk_score_max: Optional[float] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
-    # Calcola il limite dinamico basato sul numero totale di asset
-    total_assets = db.query(Asset).filter(
-        Asset.tenant_id == current_user.tenant_id, 
-        Asset.deleted_at == None
-    ).count()
-    
-    # Usa sempre il totale + margine per vedere tutti gli asset
-    limit = total_assets + 50  # Margine di sicurezza
-    
-    query = (
-        db.query(Asset)
-        .options(
-            joinedload(Asset.interfaces),
-            joinedload(Asset.site),
-            joinedload(Asset.location),
-            joinedload(Asset.status),
-            joinedload(Asset.manufacturer),
-            joinedload(Asset.asset_type),
-        )
-        .filter(Asset.tenant_id == current_user.tenant_id, Asset.deleted_at == None)
-    )
+    """Filters of the asset list on a Query or select(), shared with the export"""
+    query = query.filter(Asset.tenant_id == tenant_id, Asset.deleted_at == None)
 
     # Filtri specifici
     if status_id:
@@ -123,42 +148,185 @@ def list_assets(
     # Ricerca globale
     if global_search:
         search_term = f"%{global_search}%"
-        from sqlalchemy import or_
-
         query = query.filter(or_(Asset.name.ilike(search_term)))
+    return query
+
+
+# List assets (with optional filters)
+@router.get("", response_model=PaginatedAssetsResponse)
+def list_assets(
+    skip: int = 0,
+    limit: int = settings.DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sort: Literal["name", "updated_at"] = "name",
+    total_mode: Literal["exact", "estimate", "none"] = "exact",
+    status_id: Optional[uuid.UUID] = None,
+    site_id: Optional[uuid.UUID] = None,
+    area_id: Optional[uuid.UUID] = None,
+    location_id: Optional[uuid.UUID] = None,
+    global_search: Optional[str] = None,
+    business_criticality: Optional[str] = None,
+    risk_score_min: Optional[float] = None,
+    risk_score_max: Optional[float] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    List assets with keyset pagination on (sort key, id).
+    Pass the returned next_cursor to get the following page; skip is only
+    honoured for the first page, when no cursor is given.
+    """
+    limit = clamp_page_size(limit)
+    sort_expr, descending = ASSET_SORT_KEYS[sort]
+
+    query = _filter_assets(
+        db.query(Asset),
+        current_user.tenant_id,
+        status_id=status_id,
+        site_id=site_id,
+        area_id=area_id,
+        location_id=location_id,
+        global_search=global_search,
+        business_criticality=business_criticality,
+        risk_score_min=risk_score_min,
+        risk_score_max=risk_score_max,
+    )
+
+    # Conta il totale degli asset (prima di applicare il cursore)
+    if total_mode == "exact":
+        total_count = query.order_by(None).count()
+    elif total_mode == "estimate":
+        total_count = estimate_row_count(db, query)
+    else:
+        total_count = None
+
+    page_query = query
+    if cursor:
+        key, last_id = _decode_asset_cursor(cursor, sort)
+        boundary = tuple_(literal(key), literal(last_id, type_=Asset.id.type))
+        if descending:
+            page_query = page_query.filter(tuple_(sort_expr, Asset.id) < boundary)
+        else:
+            page_query = page_query.filter(tuple_(sort_expr, Asset.id) > boundary)
+    elif skip:
+        page_query = page_query.offset(skip)
+
+    if descending:
+        page_query = page_query.order_by(sort_expr.desc(), Asset.id.desc())
+    else:
+        page_query = page_query.order_by(sort_expr, Asset.id)
+
+    # Una riga in piu' per sapere se esiste la pagina successiva
+    rows = (
+        page_query.add_columns(sort_expr)
+        .options(*crud_assets.asset_load_profile("list"))
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_asset, last_key = rows[-1]
+        next_cursor = encode_cursor(
+            [
+                last_key.isoformat() if isinstance(last_key, datetime) else last_key,
+                str(last_asset.id),
+            ]
+        )
 
-    # Conta il totale degli asset (prima di applicare skip/limit)
-    total_count = query.count()
-    
-    assets = query.offset(skip).limit(limit).all()
-    if assets:
-        # Aggiungi i campi area_name e area_code a ogni asset
-        result = []
-        for asset in assets:
-            asset_dict = AssetRead.from_orm(asset).dict()
-            if asset.area_id:
-                from app.models.area import Area
-                area = db.query(Area).filter(Area.id == asset.area_id).first()
-                if area:
-                    asset_dict["area_name"] = area.name
-                    asset_dict["area_code"] = area.code
-            result.append(asset_dict)
-        
-        # Restituisci sia gli asset che il conteggio totale
-        return {
-            "data": result,
-            "total": total_count,
-            "skip": skip,
-            "limit": limit
-        }
     return {
-        "data": [],
+        "data": [AssetRead.from_orm(asset).dict() for asset, _ in rows],
         "total": total_count,
+        "total_is_estimate": total_mode == "estimate",
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor,
     }
 
 
+# Export the asset inventory, with the filters of the list
+@router.get("/export")
+@audit_log_action("export", "Asset", model_class=Asset)
+def export_assets(
+    format: Literal["csv", "xlsx", "jsonl"] = "csv",
+    status_id: Optional[uuid.UUID] = None,
+    site_id: Optional[uuid.UUID] = None,
+    area_id: Optional[uuid.UUID] = None,
+    location_id: Optional[uuid.UUID] = None,
+    global_search: Optional[str] = None,
+    business_criticality: Optional[str] = None,
+    risk_score_min: Optional[float] = None,
+    risk_score_max: Optional[float] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Stream every asset matching the list filters, ordered by name. The
+    columns of the import (site_code, asset_type, manufacturer, ...) come
+    first, so an export can be edited and imported back.
+    """
+    tenant_id = current_user.tenant_id
+    # All the IPs of an asset, aggregated once for the tenant (no per-row subquery)
+    ips = (
+        select(
+            AssetInterface.asset_id,
+            func.string_agg(AssetInterface.ip_address.distinct(), literal(";")).label("ip_addresses"),
+        )
+        .where(AssetInterface.tenant_id == tenant_id, AssetInterface.ip_address != None)
+        .group_by(AssetInterface.asset_id)
+        .subquery()
+    )
+    columns = {
+        "name": Asset.name,
+        "tag": Asset.tag,
+        "site_code": Site.code,
+        "asset_type": AssetType.name,
+        "manufacturer": Manufacturer.name,
+        "serial_number": Asset.serial_number,
+        "model": Asset.model,
+        "firmware_version": Asset.firmware_version,
+        "description": Asset.description,
+        "business_criticality": Asset.business_criticality,
+        "physical_access_ease": Asset.physical_access_ease,
+        "purdue_level": Asset.purdue_level,
+        "installation_date": Asset.installation_date,
+        "ip_addresses": ips.c.ip_addresses,
+        "id": Asset.id,
+        "status": AssetStatus.name,
+        "area_code": Area.code,
+        "location": Location.name,
+        "protocols": Asset.protocols,
+        "risk_score": Asset.risk_score,
+        "last_seen": Asset.last_seen,
+        "created_at": Asset.created_at,
+        "updated_at": Asset.updated_at,
+    }
+    statement = (
+        select(*columns.values())
+        .select_from(Asset)
+        .join(Site, Site.id == Asset.site_id)
+        .join(AssetType, AssetType.id == Asset.asset_type_id)
+        .outerjoin(AssetStatus, AssetStatus.id == Asset.status_id)
+        .outerjoin(Manufacturer, Manufacturer.id == Asset.manufacturer_id)
+        .outerjoin(Area, Area.id == Asset.area_id)
+        .outerjoin(Location, Location.id == Asset.location_id)
+        .outerjoin(ips, ips.c.asset_id == Asset.id)
+    )
+    statement = _filter_assets(
+        statement,
+        tenant_id,
+        status_id=status_id,
+        site_id=site_id,
+        area_id=area_id,
+        location_id=location_id,
+        global_search=global_search,
+        business_criticality=business_criticality,
+        risk_score_min=risk_score_min,
+        risk_score_max=risk_score_max,
+    ).order_by(Asset.name, Asset.id)
+    return stream_export(db, statement, list(columns), format, "assets")
+
+
 # Trash: lista asset eliminati
 @router.get("/trash", response_model=List[AssetSchema])
 def list_assets_trash(
@@ -169,6 +337,7 @@ def list_assets_trash(
 ):
     return (
         db.query(Asset)
+        .options(*crud_assets.asset_load_profile("list"))
         .filter(Asset.tenant_id == current_user.tenant_id, Asset.deleted_at != None)
         .offset(skip)
         .limit(limit)
@@ -188,14 +357,7 @@ def get_assets_by_location(
     """Get all assets for a specific location"""
     query = (
         db.query(Asset)
-        .options(
-            joinedload(Asset.interfaces),
-            joinedload(Asset.site),
-            joinedload(Asset.location),
-            joinedload(Asset.status),
-            joinedload(Asset.manufacturer),
-            joinedload(Asset.asset_type),
-        )
+        .options(*crud_assets.asset_load_profile("list"))
         .filter(
             Asset.tenant_id == current_user.tenant_id,
             Asset.location_id == location_id,
@@ -217,14 +379,7 @@ def get_assets_for_network_map(
     """Get all assets for network map visualization (no limit, no validation)"""
     query = (
         db.query(Asset)
-        .options(
-            joinedload(Asset.interfaces),
-            joinedload(Asset.site),
-            joinedload(Asset.location),
-            joinedload(Asset.status),
-            joinedload(Asset.manufacturer),
-            joinedload(Asset.asset_type),
-        )
+        .options(*crud_assets.asset_load_profile("map"))
         .filter(Asset.tenant_id == current_user.tenant_id, Asset.deleted_at == None)
     )
     
@@ -289,12 +444,9 @@ def get_assets_for_network_map(
         }
         
         # Aggiungi area info se presente
-        if asset.area_id:
-            from app.models.area import Area
-            area = db.query(Area).filter(Area.id == asset.area_id).first()
-            if area:
-                asset_dict["area_name"] = area.name
-                asset_dict["area_code"] = area.code
+        if asset.area:
+            asset_dict["area_name"] = asset.area.name
+            asset_dict["area_code"] = asset.area.code
         
         result.append(asset_dict)
     
@@ -305,42 +457,41 @@ def get_assets_for_network_map(
 def get_risk_overview(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    """Restituisce l'overview generale del risk scoring (nuova logica composita)"""
-    assets = (
-        db.query(Asset)
-        .filter(Asset.tenant_id == current_user.tenant_id, Asset.deleted_at == None)
-        .all()
+    """
+    Restituisce l'overview generale del risk scoring dai risk_score salvati.
+    Read-only: i punteggi si aggiornano con recalculate-all-risk-scores.
+    """
+    tenant_filter = (Asset.tenant_id == current_user.tenant_id, Asset.deleted_at == None)
+
+    totals = (
+        db.query(
+            func.count().label("total_assets"),
+            func.count().filter(Asset.risk_score >= 7).label("high"),
+            func.count().filter(Asset.risk_score >= 4, Asset.risk_score < 7).label("medium"),
+            func.count().filter(Asset.risk_score < 4).label("low"),
+            func.coalesce(func.sum(Asset.risk_score), 0).label("total_score"),
+            func.min(Asset.last_risk_assessment).label("oldest_assessment"),
+            func.max(Asset.last_risk_assessment).label("last_assessment"),
+        )
+        .filter(*tenant_filter)
+        .one()
     )
 
-    risk_engine = CompositeRiskScoringEngine()
-
-    # Calculate risk score for all assets
-    total_score = 0
-    high_risk_count = 0
-    medium_risk_count = 0
-    low_risk_count = 0
-
-    for asset in assets:
-        breakdown = risk_engine.calculate(asset)
-        risk_score = breakdown["final_score"]
-        if risk_score is not None:
-            total_score += risk_score
-            # Update asset if the score has changed
-            if asset.risk_score != risk_score:
-                asset.risk_score = risk_score
-                asset.last_risk_assessment = datetime.utcnow()
-            # Count by risk level
-            if risk_score >= 7:
-                high_risk_count += 1
-            elif risk_score >= 4:
-                medium_risk_count += 1
-            else:
-                low_risk_count += 1
-
-    db.commit()
-
     # Top 10 risky assets
-    top_risk_assets = sorted(assets, key=lambda x: x.risk_score or 0, reverse=True)[:10]
+    top_risk_assets = (
+        db.query(
+            Asset.id,
+            Asset.name,
+            Asset.risk_score,
+            Asset.business_criticality,
+            Site.name.label("site_name"),
+        )
+        .outerjoin(Site, Asset.site_id == Site.id)
+        .filter(*tenant_filter, Asset.risk_score != None)
+        .order_by(Asset.risk_score.desc())
+        .limit(10)
+        .all()
+    )
     top_risk_data = []
     for asset in top_risk_assets:
         top_risk_data.append(
@@ -350,25 +501,26 @@ def get_risk_overview(
                 "risk_score": asset.risk_score,
                 "risk_level": (
                     "alto"
-                    if asset.risk_score is not None and asset.risk_score >= 7
-                    else (
-                        "medio"
-                        if asset.risk_score is not None and asset.risk_score >= 4
-                        else "basso"
-                    )
+                    if asset.risk_score >= 7
+                    else ("medio" if asset.risk_score >= 4 else "basso")
                 ),
-                "business_criticality": getattr(asset, "business_criticality", None),
-                "site_name": asset.site.name if asset.site else None,
+                "business_criticality": asset.business_criticality,
+                "site_name": asset.site_name,
             }
         )
 
+    total_assets = totals.total_assets
     return RiskOverviewResponse(
-        high_risk_count=high_risk_count,
-        medium_risk_count=medium_risk_count,
-        low_risk_count=low_risk_count,
-        total_assets=len(assets),
-        average_risk_score=round(total_score / len(assets), 2) if assets else 0,
+        high_risk_count=totals.high,
+        medium_risk_count=totals.medium,
+        low_risk_count=totals.low,
+        total_assets=total_assets,
+        average_risk_score=(
+            round(float(totals.total_score) / total_assets, 2) if total_assets else 0
+        ),
         top_risk_assets=top_risk_data,
+        oldest_risk_assessment=totals.oldest_assessment,
+        last_risk_assessment=totals.last_assessment,
     )
 
 
@@ -377,90 +529,24 @@ def recalculate_all_risk_scores(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
     """Recalculate the risk score for all tenant assets (new composite logic)"""
-    assets = (
-        db.query(Asset)
-        .filter(Asset.tenant_id == current_user.tenant_id, Asset.deleted_at == None)
-        .all()
-    )
-
-    risk_engine = CompositeRiskScoringEngine()
-    updated_count = 0
-
-    for asset in assets:
-        breakdown = risk_engine.calculate(asset)
-        new_score = breakdown["final_score"]
-        old_score = asset.risk_score
-        if new_score is not None and old_score != new_score:
-            asset.risk_score = new_score
-            asset.last_risk_assessment = datetime.utcnow()
-            updated_count += 1
-
-    db.commit()
+    result = recalculate_risk_scores(db, current_user.tenant_id)
 
     return {
-        "message": f"Risk scores ricalcolati per {updated_count} asset su {len(assets)} totali",
-        "updated_count": updated_count,
-        "total_count": len(assets),
+        "message": f"Risk scores ricalcolati per {result['updated_count']} asset su {result['total_count']} totali",
+        **result,
     }
 
 
 @router.delete("/trash/empty")
 @audit_log_action("empty_trash", "Asset", model_class=Asset)
 def empty_assets_trash(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    from app.models.asset_interface import AssetInterface
-    from app.models.asset_document import AssetDocument
-    from app.models.asset_photo import AssetPhoto
-    from app.models.asset_connection import AssetConnection
-    from app.models.asset_communication import AssetCommunication
-    from app.models.contact import Contact
-
-    assets = (
-        db.query(Asset)
-        .filter(Asset.tenant_id == current_user.tenant_id, Asset.deleted_at != None)
-        .all()
-    )
-    count = 0
-    for asset in assets:
-        # Delete communications where the asset's interfaces are involved
-        interface_ids = [
-            i.id
-            for i in db.query(AssetInterface).filter(
-                AssetInterface.asset_id == asset.id
-            )
-        ]
-        if interface_ids:
-            db.query(AssetCommunication).filter(
-                (AssetCommunication.src_interface_id.in_(interface_ids))
-                | (AssetCommunication.dst_interface_id.in_(interface_ids))
-            ).delete(synchronize_session=False)
-        # Delete connections where the asset is involved
-        db.query(AssetConnection).filter(
-            (AssetConnection.parent_asset_id == asset.id)
-            | (AssetConnection.child_asset_id == asset.id)
-        ).delete(synchronize_session=False)
-        # Delete documents
-        db.query(AssetDocument).filter(AssetDocument.asset_id == asset.id).delete(
-            synchronize_session=False
-        )
-        # Delete photos
-        db.query(AssetPhoto).filter(AssetPhoto.asset_id == asset.id).delete(
-            synchronize_session=False
-        )
-        # Delete interfaces
-        db.query(AssetInterface).filter(AssetInterface.asset_id == asset.id).delete(
-            synchronize_session=False
-        )
-        # Delete associated contacts (many-to-many table)
-        asset.contacts = []
-        # Delete print history connected
-        db.query(PrintHistory).filter(PrintHistory.asset_id == asset.id).delete(
-            synchronize_session=False
-        )
-        db.delete(asset)
-        count += 1
-    db.commit()
+    count, files = asset_bulk.empty_assets_trash(db, current_user.tenant_id)
+    # Files go once the deletion is committed, without delaying the response
+    background_tasks.add_task(asset_bulk.remove_upload_files, files)
     return {"detail": f"Trash emptied: {count} assets deleted"}
 
 
@@ -470,523 +556,37 @@ def import_assets_xlsx_preview(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    from sqlalchemy import func
-    from app.models.manufacturer import Manufacturer
-    from app.models.asset_interface import AssetInterface
-    import os
-
-    def _validate_business_criticality(value):
-        """Valida e pulisce il valore di business_criticality"""
-        if not value or str(value).strip() in ["[NULL]", "NULL", ""]:
-            return None
-        clean_value = str(value).strip().lower()
-        if clean_value in ["low", "medium", "high", "critical"]:
-            return clean_value
-        return None
-
+    """
+    Parse and check the sheet without writing. The returned token confirms
+    the import of the same rows, see services/import_engine.py.
+    """
     try:
-        filename = file.filename.lower()
-        if filename.endswith(".csv"):
-            # Read CSV with string dtype for all columns to avoid numeric interpretation
-            df = pd.read_csv(file.file, dtype=str)
-            # Replace NaN values with None
-            df = df.where(pd.notnull(df), None)
-        else:
-            df = pd.read_excel(file.file, engine="openpyxl")
-    except Exception as e:
+        token = stage_import(file, AssetImport.kind, current_user.tenant_id)
+    except ImportFileError as e:
         return {"error": f"Errore nella lettura del file: {str(e)}"}
-    to_create, to_update, errors = [], [], []
-    for idx, row in df.iterrows():
-        name = row.get("nome") or row.get("name")
-        tag = row.get("tag")
-        site_code = row.get("site_code")
-        asset_type_name = row.get("asset_type") or row.get("asset_type_name")
-        ip_address = row.get("ip_address")
-        manufacturer_name = row.get("manufacturer")
-        missing = []
-        # Handle None, empty string
-        if name is None or str(name).strip() == "":
-            missing.append("name")
-        if site_code is None or str(site_code).strip() == "":
-            missing.append("site_code")
-        if asset_type_name is None or str(asset_type_name).strip() == "":
-            missing.append("asset_type")
-        site_id = None
-        asset_type_id = None
-        manufacturer_id = None
-        status_id = None
-                    # Validation of site_code and asset_type
-        if not missing:
-            from app.crud.sites import get_site_by_code
-
-            site = get_site_by_code(db, current_user.tenant_id, site_code)
-            if not site:
-                errors.append(
-                    {
-                        "row": int(idx) + 2,
-                        "error": f"Site con code '{site_code}' non trovato",
-                    }
-                )
-            else:
-                site_id = site.id
-            from app.models.asset_type import AssetType
-
-            asset_type = (
-                db.query(AssetType)
-                .filter(
-                    AssetType.name.ilike(asset_type_name),
-                    (AssetType.tenant_id == current_user.tenant_id)
-                    | (AssetType.tenant_id == None),
-                )
-                .first()
-            )
-            if not asset_type:
-                errors.append(
-                    {
-                        "row": int(idx) + 2,
-                        "error": f"AssetType con name '{asset_type_name}' non trovato",
-                    }
-                )
-            else:
-                asset_type_id = asset_type.id
-            
-            # Get default status (Active)
-            from app.models.asset_status import AssetStatus
-            default_status = (
-                db.query(AssetStatus)
-                .filter(
-                    AssetStatus.name == "Active",
-                    AssetStatus.tenant_id == current_user.tenant_id,
-                )
-                .first()
-            )
-            if default_status:
-                status_id = default_status.id
-            else:
-                # Fallback: get first available status
-                first_status = (
-                    db.query(AssetStatus)
-                    .filter(AssetStatus.tenant_id == current_user.tenant_id)
-                    .first()
-                )
-                if first_status:
-                    status_id = first_status.id
-                else:
-                    errors.append(
-                        {
-                            "row": int(idx) + 2,
-                            "error": "No asset status available",
-                        }
-                    )
-                    continue
-        # Validation/lookup/creation of manufacturer
-        if not missing and manufacturer_name and str(manufacturer_name).strip() != "":
-            manufacturer = (
-                db.query(Manufacturer)
-                .filter(
-                    func.lower(Manufacturer.name)
-                    == str(manufacturer_name).strip().lower(),
-                    Manufacturer.tenant_id == current_user.tenant_id,
-                )
-                .first()
-            )
-            if not manufacturer:
-                # We don't really create the manufacturer in preview, but we report that it will be created
-                manufacturer_id = None
-                manufacturer_action = "create"
-            else:
-                manufacturer_id = manufacturer.id
-                manufacturer_action = "use_existing"
-        else:
-            manufacturer_action = None
-        if missing or not site_id or not asset_type_id:
-            if missing:
-                errors.append(
-                    {
-                        "row": int(idx) + 2,
-                        "error": f"Campi obbligatori mancanti: {', '.join(missing)}",
-                    }
-                )
-            continue
-        # Search asset only if tag is filled
-        if tag is not None and not pd.isna(tag) and str(tag).strip() != "":
-            asset = (
-                db.query(Asset)
-                .filter(Asset.tag == tag, Asset.tenant_id == current_user.tenant_id)
-                .first()
-            )
-        else:
-            asset = None
-        # Prepare preview of interfaces
-        interfaces = []
-        if ip_address and not pd.isna(ip_address) and str(ip_address).strip() != "":
-            interfaces.append(
-                {
-                    "name": "LAN",
-                    "type": "ethernet",
-                    "ip_address": str(ip_address).strip(),
-                }
-            )
-        if asset:
-            diff = {}
-            # Check all CSV fields for differences
-            csv_fields = {
-                "name": name,
-                "site_code": site_code,
-                "asset_type": asset_type_name,
-                "ip_address": row.get("ip_address"),
-                "manufacturer": manufacturer_name,
-                "serial_number": row.get("serial_number"),
-                "model": row.get("model"),
-                "firmware_version": row.get("firmware_version"),
-                "description": row.get("description"),
-                "business_criticality": row.get("business_criticality"),
-                "physical_access_ease": row.get("physical_access_ease"),
-                "purdue_level": row.get("purdue_level"),
-                "installation_date": row.get("installation_date"),
-            }
-            
-            for field, new_value in csv_fields.items():
-                if field == "manufacturer":
-                    # compare the manufacturer name
-                    old_manuf = asset.manufacturer.name if asset.manufacturer else None
-                    if (
-                        str(old_manuf).strip().lower()
-                        != str(new_value).strip().lower()
-                    ):
-                        diff[field] = {"old": old_manuf, "new": new_value}
-                elif field == "site_code":
-                    # compare site code
-                    old_site_code = asset.site.code if asset.site else None
-                    if str(old_site_code) != str(new_value):
-                        diff[field] = {"old": old_site_code, "new": new_value}
-                elif field == "asset_type":
-                    # compare asset type name
-                    old_asset_type = asset.asset_type.name if asset.asset_type else None
-                    if str(old_asset_type) != str(new_value):
-                        diff[field] = {"old": old_asset_type, "new": new_value}
-                else:
-                    old_value = getattr(asset, field, None)
-                    if str(old_value) != str(new_value):
-                        diff[field] = {"old": old_value, "new": new_value}
-            
-            if diff or interfaces:
-                to_update.append(
-                    {
-                        "tag": tag,
-                        "diff": diff,
-                        "interfaces": interfaces,
-                        "manufacturer_action": manufacturer_action,
-                    }
-                )
-        else:
-            to_create.append(
-                {
-                    "name": name,
-                    "tag": tag,
-                    "site_code": site_code,
-                    "asset_type": asset_type_name,
-                    "ip_address": row.get("ip_address"),
-                    "manufacturer": manufacturer_name,
-                    "serial_number": row.get("serial_number"),
-                    "model": row.get("model"),
-                    "firmware_version": row.get("firmware_version"),
-                    "description": row.get("description"),
-                    "business_criticality": row.get("business_criticality"),
-                    "physical_access_ease": row.get("physical_access_ease"),
-                    "purdue_level": row.get("purdue_level"),
-                    "installation_date": row.get("installation_date"),
-                    "manufacturer_action": manufacturer_action,
-                    "interfaces": interfaces,
-                }
-            )
-    return sanitize_for_json(
-        {"to_create": to_create, "to_update": to_update, "errors": errors}
-    )
+    target = AssetImport(db, current_user.tenant_id)
+    path = staged_import_path(token, target.kind, current_user.tenant_id)
+    return sanitize_for_json({"token": token, **preview_import(target, path)})
 
 
-def _validate_business_criticality(value):
-    """Valida e pulisce il valore di business_criticality"""
-    if not value or str(value).strip() in ["[NULL]", "NULL", ""]:
-        return None
-    clean_value = str(value).strip().lower()
-    if clean_value in ["low", "medium", "high", "critical"]:
-        return clean_value
-    return None
-
 @router.post("/import/xlsx/confirm")
 def import_assets_xlsx_confirm(
     request: Request,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    token: Optional[str] = Form(None),
+    mode: Literal["per_batch", "all_or_nothing"] = Form("per_batch"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    from app.models.manufacturer import Manufacturer
-    from app.models.asset_interface import AssetInterface
-    from sqlalchemy import func
-    import os
-
+    """
+    Create or update (by tag) the assets of a previewed token, or of a new
+    upload. mode=all_or_nothing writes nothing if any row is invalid.
+    """
     try:
-        filename = file.filename.lower()
-        if filename.endswith(".csv"):
-            # Read CSV with string dtype for all columns to avoid numeric interpretation
-            df = pd.read_csv(file.file, dtype=str)
-            # Replace NaN values with None
-            df = df.where(pd.notnull(df), None)
-        else:
-            df = pd.read_excel(file.file, engine="openpyxl")
-    except Exception as e:
+        result = confirm_import(AssetImport(db, current_user.tenant_id), file, token, mode)
+    except ImportFileError as e:
         return {"error": f"Errore nella lettura del file: {str(e)}"}
-    created, updated, errors = [], [], []
-    for idx, row in df.iterrows():
-        name = row.get("nome") or row.get("name")
-        tag = row.get("tag")
-        site_code = row.get("site_code")
-        asset_type_name = row.get("asset_type") or row.get("asset_type_name")
-        ip_address = row.get("ip_address")
-        manufacturer_name = row.get("manufacturer")
-        missing = []
-        if name is None or str(name).strip() == "":
-            missing.append("name")
-        if site_code is None or str(site_code).strip() == "":
-            missing.append("site_code")
-        if asset_type_name is None or str(asset_type_name).strip() == "":
-            missing.append("asset_type")
-        site_id = None
-        asset_type_id = None
-        manufacturer_id = None
-        status_id = None
-        if not missing:
-            from app.crud.sites import get_site_by_code
-
-            site = get_site_by_code(db, current_user.tenant_id, site_code)
-            if not site:
-                errors.append(
-                    {
-                        "row": int(idx) + 2,
-                        "error": f"Site con code '{site_code}' non trovato",
-                    }
-                )
-            else:
-                site_id = site.id
-            from app.models.asset_type import AssetType
-
-            asset_type = (
-                db.query(AssetType)
-                .filter(
-                    AssetType.name.ilike(asset_type_name),
-                    (AssetType.tenant_id == current_user.tenant_id)
-                    | (AssetType.tenant_id == None),
-                )
-                .first()
-            )
-            if not asset_type:
-                errors.append(
-                    {
-                        "row": int(idx) + 2,
-                        "error": f"AssetType con name '{asset_type_name}' non trovato",
-                    }
-                )
-            else:
-                asset_type_id = asset_type.id
-            
-            # Get default status (Active)
-            from app.models.asset_status import AssetStatus
-            default_status = (
-                db.query(AssetStatus)
-                .filter(
-                    AssetStatus.name == "Active",
-                    AssetStatus.tenant_id == current_user.tenant_id,
-                )
-                .first()
-            )
-            if default_status:
-                status_id = default_status.id
-            else:
-                # Fallback: get first available status
-                first_status = (
-                    db.query(AssetStatus)
-                    .filter(AssetStatus.tenant_id == current_user.tenant_id)
-                    .first()
-                )
-                if first_status:
-                    status_id = first_status.id
-                else:
-                    errors.append(
-                        {
-                            "row": int(idx) + 2,
-                            "error": "No asset status available",
-                        }
-                    )
-                    continue
-        # Lookup/creazione manufacturer
-        if not missing and manufacturer_name and str(manufacturer_name).strip() != "":
-            manufacturer = (
-                db.query(Manufacturer)
-                .filter(
-                    func.lower(Manufacturer.name)
-                    == str(manufacturer_name).strip().lower(),
-                    Manufacturer.tenant_id == current_user.tenant_id,
-                )
-                .first()
-            )
-            if not manufacturer:
-                try:
-                    manufacturer = Manufacturer(
-                        name=str(manufacturer_name).strip(),
-                        tenant_id=current_user.tenant_id,
-                    )
-                    db.add(manufacturer)
-                    db.commit()
-                    db.refresh(manufacturer)
-                except Exception as e:
-                    db.rollback()
-                    errors.append(
-                        {
-                            "row": int(idx) + 2,
-                            "error": f"Errore creazione manufacturer: {str(e)}",
-                        }
-                    )
-                    continue
-            manufacturer_id = manufacturer.id
-        if missing or not site_id or not asset_type_id:
-            if missing:
-                errors.append(
-                    {
-                        "row": int(idx) + 2,
-                        "error": f"Campi obbligatori mancanti: {', '.join(missing)}",
-                    }
-                )
-            continue
-        # Search assets only if tag is provided
-        if tag is not None and not pd.isna(tag) and str(tag).strip() != "":
-            asset = (
-                db.query(Asset)
-                .filter(Asset.tag == tag, Asset.tenant_id == current_user.tenant_id)
-                .first()
-            )
-        else:
-            asset = None
-        try:
-            if asset:
-                # Parse installation_date if provided
-                installation_date = None
-                if row.get("installation_date") and str(row.get("installation_date")).strip() != "":
-                    try:
-                        installation_date = datetime.strptime(str(row.get("installation_date")).strip(), "%Y-%m-%d").date()
-                    except:
-                        pass  # Keep as None if parsing fails
-                
-                # Parse purdue_level if provided
-                purdue_level = 0.0
-                if row.get("purdue_level") and str(row.get("purdue_level")).strip() != "":
-                    try:
-                        purdue_level = float(str(row.get("purdue_level")).strip())
-                    except:
-                        pass  # Keep default if parsing fails
-                
-                asset.name = name
-                asset.site_id = site_id
-                asset.asset_type_id = asset_type_id
-                if manufacturer_id:
-                    asset.manufacturer_id = manufacturer_id
-                asset.serial_number = row.get("serial_number")
-                asset.model = row.get("model")
-                asset.firmware_version = row.get("firmware_version")
-                asset.description = row.get("description")
-                asset.business_criticality = _validate_business_criticality(row.get("business_criticality"))
-                asset.physical_access_ease = row.get("physical_access_ease")
-                asset.purdue_level = purdue_level
-                asset.installation_date = installation_date
-                db.commit()
-                updated.append(tag)
-                # If ip_address present, create LAN interface if not already present
-                if (
-                    ip_address
-                    and not pd.isna(ip_address)
-                    and str(ip_address).strip() != ""
-                ):
-                    existing_iface = (
-                        db.query(AssetInterface)
-                        .filter(
-                            AssetInterface.asset_id == asset.id,
-                            func.lower(AssetInterface.name) == "lan",
-                            AssetInterface.type == "ethernet",
-                            AssetInterface.ip_address == str(ip_address).strip(),
-                        )
-                        .first()
-                    )
-                    if not existing_iface:
-                        interface = AssetInterface(
-                            asset_id=asset.id,
-                            name="LAN",
-                            type="ethernet",
-                            ip_address=str(ip_address).strip(),
-                            tenant_id=current_user.tenant_id,
-                        )
-                        db.add(interface)
-                        db.commit()
-            else:
-                # Parse installation_date if provided
-                installation_date = None
-                if row.get("installation_date") and str(row.get("installation_date")).strip() != "":
-                    try:
-                        installation_date = datetime.strptime(str(row.get("installation_date")).strip(), "%Y-%m-%d").date()
-                    except:
-                        pass  # Keep as None if parsing fails
-                
-                # Parse purdue_level if provided
-                purdue_level = 0.0
-                if row.get("purdue_level") and str(row.get("purdue_level")).strip() != "":
-                    try:
-                        purdue_level = float(str(row.get("purdue_level")).strip())
-                    except:
-                        pass  # Keep default if parsing fails
-                
-                new_asset = Asset(
-                    name=name,
-                    tag=tag,
-                    site_id=site_id,
-                    asset_type_id=asset_type_id,
-                    status_id=status_id,
-                    tenant_id=current_user.tenant_id,
-                    manufacturer_id=manufacturer_id,
-                    serial_number=row.get("serial_number"),
-                    model=row.get("model"),
-                    firmware_version=row.get("firmware_version"),
-                    description=row.get("description"),
-                    business_criticality=_validate_business_criticality(row.get("business_criticality")),
-                    physical_access_ease=row.get("physical_access_ease"),
-                    purdue_level=purdue_level,
-                    installation_date=installation_date,
-                )
-                db.add(new_asset)
-                db.commit()
-                created.append(tag)
-                # If ip_address present, create LAN interface if not already present
-                if (
-                    ip_address
-                    and not pd.isna(ip_address)
-                    and str(ip_address).strip() != ""
-                ):
-                    interface = AssetInterface(
-                        asset_id=new_asset.id,
-                        name="LAN",
-                        type="ethernet",
-                        ip_address=str(ip_address).strip(),
-                        tenant_id=current_user.tenant_id,
-                    )
-                    db.add(interface)
-                    db.commit()
-        except IntegrityError as e:
-            db.rollback()
-            errors.append(
-                {"row": int(idx) + 2, "error": f"Errore di integrità: {str(e)}"}
-            )
-        except Exception as e:
-            db.rollback()
-            errors.append({"row": int(idx) + 2, "error": str(e)})
-    return sanitize_for_json({"created": created, "updated": updated, "errors": errors})
+    return sanitize_for_json(result)
 
 
 @router.post("/bulk-update")
@@ -996,76 +596,19 @@ def bulk_update_assets(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    updated, errors = [], []
-
-    # Get the field names for the description
-    field_names = []
-    for field in req.fields.keys():
-        field_labels = {
-            "manufacturer_id": "produttore",
-            "asset_status_id": "stato",
-            "site_id": "sito",
-            "area_id": "area",
-            "location_id": "posizione",
-            "asset_type_id": "tipo",
-            "risk_score": "risk score",
-            "purdue_level": "livello Purdue",
-            "impact_value": "valore impatto",
-            "access_ease": "facilità accesso",
-            "exposure_level": "livello esposizione",
-            "update_status": "stato aggiornamento",
-        }
-        field_names.append(field_labels.get(field, field))
-
-    for asset_id in req.ids:
-        asset = (
-            db.query(Asset)
-            .filter(Asset.id == asset_id, Asset.tenant_id == current_user.tenant_id)
-            .first()
-        )
-        if not asset:
-            errors.append({"id": str(asset_id), "error": "Asset non trovato"})
-            continue
-
-        # Prepare old data with names
-        old_data = {}
-        for field in req.fields.keys():
-            if hasattr(asset, field):
-                old_data[field] = getattr(asset, field)
-
-        # Apply the changes
-        for field, value in req.fields.items():
-            if hasattr(asset, field):
-                setattr(asset, field, value)
-
-        try:
-            db.commit()
-            updated.append(str(asset_id))
-
-            # Create readable description
-            asset_name = asset.name or str(asset_id)
-            fields_text = ", ".join(field_names)
-            description = (
-                f"Aggiornamento massivo: modificati {fields_text} per '{asset_name}'"
-            )
-
-            # Audit log with automatic translation
-            create_audit_log(
-                db=db,
-                user_id=current_user.id,
-                tenant_id=current_user.tenant_id,
-                action="bulk_update",
-                entity="Asset",
-                entity_id=asset_id,
-                old_data=old_data,
-                new_data=req.fields,
-                description=description,
-            )
-        except Exception as e:
-            db.rollback()
-            errors.append({"id": str(asset_id), "error": str(e)})
-
-    return {"updated": updated, "errors": errors}
+    """
+    Set the same fields on many assets with one UPDATE and one audit
+    INSERT. Unknown ids are reported in errors; with mode all_or_nothing
+    nothing is updated unless every id is found.
+    """
+    return asset_bulk.bulk_update_assets(
+        db,
+        tenant_id=current_user.tenant_id,
+        user_id=current_user.id,
+        ids=req.ids,
+        fields=req.fields,
+        mode=req.mode,
+    )
 
 
 # Bulk soft delete
@@ -1139,16 +682,6 @@ def get_asset(
     asset = crud_assets.get_asset(db, asset_id)
     if not asset or asset.tenant_id != current_user.tenant_id:
         raise ErrorCodeException(status_code=404, error_code=ErrorCode.ASSET_NOT_FOUND)
-    
-    # Carica l'area se l'asset ha un area_id
-    if asset.area_id:
-        from app.models.area import Area
-        area = db.query(Area).filter(Area.id == asset.area_id).first()
-        if area:
-            # Assegna direttamente i campi dell'area all'asset
-            asset.area_name = area.name
-            asset.area_code = area.code
-    
     return asset
 
 
@@ -1253,6 +786,22 @@ def patch_custom_fields(
     return asset
 
 
+@router.patch("/positions")
+@audit_log_action("update_positions", "Asset", model_class=Asset)
+def update_asset_positions_endpoint(
+    positions: List[AssetPositionUpdate],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Save the positions of many assets (group drag, auto-arrange) in one
+    statement. Positions sent with the version read with the asset are
+    rejected, and returned in conflicts with their current value, if the
+    asset was moved since.
+    """
+    return crud_assets.update_asset_positions(db, current_user.tenant_id, positions)
+
+
 @router.patch("/{asset_id}/position")
 @audit_log_action("update_position", "Asset", model_class=Asset)
 def update_asset_position_endpoint(
@@ -1266,7 +815,12 @@ def update_asset_position_endpoint(
     )
     if not asset or asset.tenant_id != current_user.tenant_id:
         raise ErrorCodeException(status_code=404, error_code=ErrorCode.ASSET_NOT_FOUND)
-    return {"id": asset_id, "map_x": asset.map_x, "map_y": asset.map_y}
+    return {
+        "id": asset_id,
+        "map_x": asset.map_x,
+        "map_y": asset.map_y,
+        "version": asset.position_version,
+    }
 
 
 @router.get("/{asset_id}/communications")
@@ -1472,7 +1026,8 @@ def calculate_asset_risk(
         raise ErrorCodeException(status_code=404, error_code=ErrorCode.ASSET_NOT_FOUND)
 
     risk_engine = CompositeRiskScoringEngine()
-    breakdown = risk_engine.calculate(asset)
+    graph_features = AssetAdjacency.load(db, current_user.tenant_id, [asset.id]).features_of(asset.id)
+    breakdown = risk_engine.calculate(asset, graph_features=graph_features)
     risk_score = breakdown["final_score"]
     # Determine level and severity
     if risk_score is None:
@@ -1491,6 +1046,7 @@ def calculate_asset_risk(
     if risk_score is not None:
         asset.risk_score = risk_score
         asset.last_risk_assessment = datetime.utcnow()
+        asset.risk_score_dirty = False
         db.commit()
     return RiskScoreResponse(
         asset_id=asset_id,
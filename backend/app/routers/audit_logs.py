@@ -1,9 +1,7 @@
 import uuid
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
-from io import StringIO
-import csv
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.database import get_db
@@ -11,6 +9,7 @@ from app.models import User, AuditLog
 from app.schemas.audit_log import AuditLog as AuditLogSchema
 from app.services.auth import get_current_user
 from app.services.audit_log import get_entity_name_by_id
+from app.services.table_export import stream_export
 
 router = APIRouter(
     prefix="/audit-logs",
@@ -67,42 +66,19 @@ def export_audit_logs(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    query = db.query(AuditLog).filter(AuditLog.tenant_id == current_user.tenant_id)
+    columns = ["timestamp", "user_id", "action", "entity", "entity_id", "description"]
+    query = select(*(getattr(AuditLog, column) for column in columns)).where(
+        AuditLog.tenant_id == current_user.tenant_id
+    )
     if from_date:
-        query = query.filter(AuditLog.timestamp >= from_date)
+        query = query.where(AuditLog.timestamp >= from_date)
     if to_date:
-        query = query.filter(AuditLog.timestamp <= to_date)
+        query = query.where(AuditLog.timestamp <= to_date)
     if action:
-        query = query.filter(AuditLog.action == action)
+        query = query.where(AuditLog.action == action)
     if entity:
-        query = query.filter(AuditLog.entity == entity)
+        query = query.where(AuditLog.entity == entity)
     if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
+        query = query.where(AuditLog.user_id == user_id)
     query = query.order_by(AuditLog.timestamp.desc())
-    logs = query.all()
-
-    def iter_csv():
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(
-            ["timestamp", "user_id", "action", "entity", "entity_id", "description"]
-        )
-        for log in logs:
-            writer.writerow(
-                [
-                    log.timestamp.isoformat() if log.timestamp else "",
-                    str(log.user_id) if log.user_id else "",
-                    log.action,
-                    log.entity,
-                    str(log.entity_id) if log.entity_id else "",
-                    log.description or "",
-                ]
-            )
-        output.seek(0)
-        yield output.read()
-
-    return StreamingResponse(
-        iter_csv(),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=audit_logs.csv"},
-    )
+    return stream_export(db, query, columns, "csv", "audit_logs")
@@ -1,11 +1,8 @@
 import uuid
-from typing import List
-from fastapi import APIRouter, Depends, Request, UploadFile, File, Body
-from fastapi.responses import StreamingResponse
-from io import StringIO
-import pandas as pd
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Request, UploadFile, File, Form, Body
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 from app.database import get_db
 from app.models import User, Contact
 from app.schemas.contact import Contact as ContactSchema, ContactCreate, ContactUpdate
@@ -14,8 +11,16 @@ from app.errors.error_codes import ErrorCode
 from app.services.auth import get_current_user
 from app.crud import contacts as crud_contacts
 from app.services.audit_decorator import audit_log_action
+from app.services.contact_import import ContactImport
+from app.services.table_export import stream_export
+from app.services.import_engine import (
+    ImportFileError,
+    confirm_import,
+    preview_import,
+    stage_import,
+    staged_import_path,
+)
 from datetime import datetime
-import csv
 
 router = APIRouter(
     prefix="/contacts",
@@ -39,38 +44,11 @@ def list_contacts_trash(
 def export_contacts_csv(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    contacts = (
-        db.query(Contact)
-        .filter(Contact.tenant_id == current_user.tenant_id, Contact.deleted_at == None)
-        .all()
-    )
-
-    def iter_csv():
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(
-            ["first_name", "last_name", "email", "phone1", "phone2", "type", "notes"]
-        )
-        for c in contacts:
-            writer.writerow(
-                [
-                    c.first_name or "",
-                    c.last_name or "",
-                    c.email or "",
-                    c.phone1 or "",
-                    c.phone2 or "",
-                    c.type or "",
-                    c.notes or "",
-                ]
-            )
-        output.seek(0)
-        yield output.read()
-
-    return StreamingResponse(
-        iter_csv(),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=contacts.csv"},
+    columns = ["first_name", "last_name", "email", "phone1", "phone2", "type", "notes"]
+    statement = select(*(getattr(Contact, column) for column in columns)).where(
+        Contact.tenant_id == current_user.tenant_id, Contact.deleted_at == None
     )
+    return stream_export(db, statement, columns, "csv", "contacts")
 
 
 @router.post("/import/xlsx/preview")
@@ -81,150 +59,27 @@ def import_contacts_xlsx_preview(
     current_user: User = Depends(get_current_user),
 ):
     try:
-        if file.filename.endswith(".csv"):
-            # Read CSV with string dtype for all columns to avoid numeric interpretation
-            df = pd.read_csv(file.file, dtype=str)
-            # Replace NaN values with None
-            df = df.where(pd.notnull(df), None)
-        else:
-            df = pd.read_excel(file.file)
-    except Exception as e:
+        token = stage_import(file, ContactImport.kind, current_user.tenant_id)
+    except ImportFileError as e:
         return {"error": f"Error reading file: {str(e)}"}
-    to_create, to_update, errors = [], [], []
-    for idx, row in df.iterrows():
-        first_name = row.get("first_name")
-        last_name = row.get("last_name")
-        email = row.get("email")
-        missing = []
-        if first_name is None or str(first_name).strip() == "":
-            missing.append("first_name")
-        if last_name is None or str(last_name).strip() == "":
-            missing.append("last_name")
-        if missing:
-            errors.append(
-                {
-                    "row": int(idx) + 2,
-                    "error": f"Missing required fields: {', '.join(missing)}",
-                }
-            )
-            continue
-        contact = (
-            db.query(Contact)
-            .filter(
-                Contact.tenant_id == current_user.tenant_id,
-                Contact.first_name == first_name,
-                Contact.last_name == last_name,
-            )
-            .first()
-        )
-        if contact:
-            diff = {}
-            for field in ["phone1", "phone2", "type", "notes"]:
-                new = row.get(field)
-                old = getattr(contact, field)
-                if str(old) != str(new):
-                    diff[field] = {"old": old, "new": new}
-            if diff:
-                to_update.append(
-                    {
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "email": email,
-                        "diff": diff,
-                    }
-                )
-        else:
-            to_create.append(
-                {
-                    "first_name": first_name,
-                    "last_name": last_name,
-                    "email": email,
-                    "phone1": row.get("phone1"),
-                    "phone2": row.get("phone2"),
-                    "type": row.get("type"),
-                    "notes": row.get("notes"),
-                }
-            )
-    return {"to_create": to_create, "to_update": to_update, "errors": errors}
+    target = ContactImport(db, current_user.tenant_id)
+    path = staged_import_path(token, target.kind, current_user.tenant_id)
+    return {"token": token, **preview_import(target, path)}
 
 
 @router.post("/import/xlsx/confirm")
 @audit_log_action("import", "Contact", model_class=Contact)
 def import_contacts_xlsx_confirm(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    token: Optional[str] = Form(None),
+    mode: Literal["per_batch", "all_or_nothing"] = Form("per_batch"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     try:
-        if file.filename.endswith(".csv"):
-            # Read CSV with string dtype for all columns to avoid numeric interpretation
-            df = pd.read_csv(file.file, dtype=str)
-            # Replace NaN values with None
-            df = df.where(pd.notnull(df), None)
-        else:
-            df = pd.read_excel(file.file)
-    except Exception as e:
+        return confirm_import(ContactImport(db, current_user.tenant_id), file, token, mode)
+    except ImportFileError as e:
         return {"error": f"Error reading file: {str(e)}"}
-    created, updated, errors = [], [], []
-    for idx, row in df.iterrows():
-        first_name = row.get("first_name")
-        last_name = row.get("last_name")
-        email = row.get("email")
-        missing = []
-        if first_name is None or str(first_name).strip() == "":
-            missing.append("first_name")
-        if last_name is None or str(last_name).strip() == "":
-            missing.append("last_name")
-        if missing:
-            errors.append(
-                {
-                    "row": int(idx) + 2,
-                    "error": f"Missing required fields: {', '.join(missing)}",
-                }
-            )
-            continue
-        contact = (
-            db.query(Contact)
-            .filter(
-                Contact.tenant_id == current_user.tenant_id,
-                Contact.first_name == first_name,
-                Contact.last_name == last_name,
-            )
-            .first()
-        )
-        try:
-            if contact:
-                contact.phone1 = row.get("phone1")
-                contact.phone2 = row.get("phone2")
-                contact.type = row.get("type")
-                contact.notes = row.get("notes")
-                db.commit()
-                email_display = f" <{email}>" if email else ""
-                updated.append(f"{first_name} {last_name}{email_display}")
-            else:
-                new_contact = Contact(
-                    first_name=first_name,
-                    last_name=last_name,
-                    email=email,
-                    phone1=row.get("phone1"),
-                    phone2=row.get("phone2"),
-                    type=row.get("type"),
-                    notes=row.get("notes"),
-                    tenant_id=current_user.tenant_id,
-                )
-                db.add(new_contact)
-                db.commit()
-                email_display = f" <{email}>" if email else ""
-                created.append(f"{first_name} {last_name}{email_display}")
-        except IntegrityError as e:
-            db.rollback()
-            errors.append(
-                {"row": int(idx) + 2, "error": f"Integrity error: {str(e)}"}
-            )
-        except Exception as e:
-            db.rollback()
-            errors.append({"row": int(idx) + 2, "error": str(e)})
-    return {"created": created, "updated": updated, "errors": errors}
 
 
 @router.post("", response_model=ContactSchema)
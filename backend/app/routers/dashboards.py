@@ -1,4 +1,6 @@
 import math
+import uuid
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
@@ -7,6 +9,7 @@ from app.models import User, Asset, AssetStatus
 from app.services.audit_decorator import audit_log_action
 from app.services.auth import get_current_user
 from app.services.audit_log import create_audit_log
+from app.services.asset_stats import build_dashboard_stats
 
 def clean_float_values(data):
     """Clean float values to prevent JSON serialization errors"""
@@ -30,124 +33,12 @@ router = APIRouter(
 # Dashboard endpoints
 @router.get("/stats")
 def get_dashboard_stats(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    site_id: Optional[uuid.UUID] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    from datetime import datetime, timedelta
-    from sqlalchemy import func, and_
-    
-    # Statistiche base
-    total_assets = (
-        db.query(Asset).filter(Asset.tenant_id == current_user.tenant_id).count()
-    )
-    
-    # Asset critici (business_criticality = 'critical' o 'high')
-    critical_assets = (
-        db.query(Asset)
-        .filter(
-            and_(
-                Asset.tenant_id == current_user.tenant_id,
-                Asset.business_criticality.in_(['critical', 'high'])
-            )
-        )
-        .count()
-    )
-    
-    # Asset a rischio (risk_score >= 5)
-    assets_at_risk = (
-        db.query(Asset)
-        .filter(
-            and_(
-                Asset.tenant_id == current_user.tenant_id,
-                Asset.risk_score >= 5
-            )
-        )
-        .count()
-    )
-    
-    # Modifiche recenti (ultime 24 ore)
-    yesterday = datetime.utcnow() - timedelta(days=1)
-    recent_changes = (
-        db.query(Asset)
-        .filter(
-            and_(
-                Asset.tenant_id == current_user.tenant_id,
-                Asset.updated_at >= yesterday
-            )
-        )
-        .count()
-    )
-    
-    # Asset attivi/inattivi
-    active_assets = (
-        db.query(Asset)
-        .join(AssetStatus)
-        .filter(
-            and_(
-                Asset.tenant_id == current_user.tenant_id,
-                AssetStatus.name == "Active"
-            )
-        )
-        .count()
-    )
-    
-    inactive_assets = total_assets - active_assets
-    
-    # Statistiche per status
-    statuses = (
-        db.query(AssetStatus)
-        .filter(AssetStatus.tenant_id == current_user.tenant_id)
-        .all()
-    )
-    status_stats = []
-    for status in statuses:
-        count = (
-            db.query(Asset)
-            .filter(
-                Asset.tenant_id == current_user.tenant_id, 
-                Asset.status_id == status.id
-            )
-            .count()
-        )
-        status_stats.append({
-            "status_id": str(status.id),
-            "name": status.name,
-            "color": status.color,
-            "count": count,
-        })
-    
-    # Statistiche per tipo di asset
-    from app.models import AssetType
-    asset_types = (
-        db.query(AssetType)
-        .filter(AssetType.tenant_id == current_user.tenant_id)
-        .all()
-    )
-    type_stats = []
-    for asset_type in asset_types:
-        count = (
-            db.query(Asset)
-            .filter(
-                Asset.tenant_id == current_user.tenant_id, 
-                Asset.asset_type_id == asset_type.id
-            )
-            .count()
-        )
-        type_stats.append({
-            "type_id": str(asset_type.id),
-            "name": asset_type.name,
-            "asset_count": count,
-        })
-    
-    return {
-        "total_assets": total_assets,
-        "critical_assets": critical_assets,
-        "assets_at_risk": assets_at_risk,
-        "recent_changes": recent_changes,
-        "active_assets": active_assets,
-        "inactive_assets": inactive_assets,
-        "status_stats": status_stats,
-        "type_stats": type_stats
-    }
+    """Asset counters for the dashboard, optionally restricted to a site"""
+    return build_dashboard_stats(db, current_user.tenant_id, site_id)
 
 
 @router.get("/risky-assets")
@@ -2,9 +2,11 @@
 import uuid
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import Asset, User
+from app.config import settings
+from app.models import Asset, Site, User
 from app.schemas import AssetRead as AssetSchema
 from app.services.api_auth import (
     get_api_key_user,
@@ -13,6 +15,8 @@ from app.services.api_auth import (
 )
 from app.services.rate_limiter import add_rate_limit_headers, check_rate_limit
 from app.crud import assets as crud_assets
+from app.services.asset_stats import read_tenant_asset_stats
+from app.services.flow_ingest import flow_aggregator
 from app.errors.exceptions import ErrorCodeException
 from app.errors.error_codes import ErrorCode
 
@@ -77,8 +81,10 @@ async def list_assets_external(
         )
 
     # Filter by tenant of the API Key
-    query = db.query(Asset).filter(
-        Asset.tenant_id == api_key.tenant_id, Asset.deleted_at == None
+    query = (
+        db.query(Asset)
+        .options(*crud_assets.asset_load_profile("list"))
+        .filter(Asset.tenant_id == api_key.tenant_id, Asset.deleted_at == None)
     )
 
     if status_id:
@@ -126,35 +132,17 @@ async def get_assets_stats(
             status_code=429, error_code=ErrorCode.RATE_LIMIT_EXCEEDED
         )
 
-    from sqlalchemy import func
-
-    # Count total assets
-    total_assets = (
-        db.query(func.count(Asset.id))
-        .filter(Asset.tenant_id == api_key.tenant_id, Asset.deleted_at == None)
-        .scalar()
-    )
-
-    # Count by status
-    status_counts = (
-        db.query(Asset.status_id, func.count(Asset.id))
-        .filter(Asset.tenant_id == api_key.tenant_id, Asset.deleted_at == None)
-        .group_by(Asset.status_id)
-        .all()
-    )
-
-    # Count by business criticality
-    criticality_counts = (
-        db.query(Asset.business_criticality, func.count(Asset.id))
-        .filter(Asset.tenant_id == api_key.tenant_id, Asset.deleted_at == None)
-        .group_by(Asset.business_criticality)
-        .all()
-    )
+    stats = read_tenant_asset_stats(db, api_key.tenant_id)
 
     return {
-        "total_assets": total_assets,
-        "by_status": dict(status_counts),
-        "by_criticality": dict(criticality_counts),
+        "total_assets": stats["total"]["all"],
+        "by_status": {
+            (None if k == "None" else k): v for k, v in stats.get("status", {}).items()
+        },
+        "by_criticality": {
+            (None if k == "none" else k): v
+            for k, v in stats.get("criticality", {}).items()
+        },
         "tenant_id": str(api_key.tenant_id),
     }
 
@@ -198,6 +186,44 @@ async def get_high_risk_assets(
     ]
 
 
+# Endpoint to ingest live flow records from a monitoring sensor
+@router.post("/flows", status_code=202)
+async def ingest_flows(
+    site_id: uuid.UUID,
+    request: Request,
+    api_key=Depends(require_write_scope),
+    db: Session = Depends(get_db),
+):
+    """
+    Ingest a chunk of line-delimited JSON flow records (external API), e.g.
+    {"src_mac": "...", "dst_mac": "...", "src_ip": "...", "dst_ip": "...",
+     "proto": "modbus", "packets": 12, "bytes": 840}
+    Records are aggregated in memory and written every FLOW_WINDOW_SECONDS.
+    """
+    # Verify rate limit
+    if not check_rate_limit(request, api_key):
+        raise ErrorCodeException(
+            status_code=429, error_code=ErrorCode.RATE_LIMIT_EXCEEDED
+        )
+
+    site = db.query(Site.id).filter(Site.id == site_id, Site.tenant_id == api_key.tenant_id).first()
+    if not site:
+        raise ErrorCodeException(status_code=404, error_code=ErrorCode.SITE_NOT_FOUND)
+
+    body = await request.body()
+    if len(body) > settings.FLOW_MAX_CHUNK_MB * 1024 * 1024:
+        raise ErrorCodeException(status_code=413, error_code=ErrorCode.FILE_TOO_LARGE)
+    # Aggregation is CPU bound: keep it off the event loop
+    accepted, rejected = await run_in_threadpool(
+        flow_aggregator.add_lines, body.splitlines(), api_key.tenant_id, site_id
+    )
+    return {
+        "accepted": accepted,
+        "rejected": rejected,
+        "window_seconds": settings.FLOW_WINDOW_SECONDS,
+    }
+
+
 # Endpoint to check health
 @router.get("/health")
 async def health_check():
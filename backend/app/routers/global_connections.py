@@ -1,7 +1,7 @@
 # routers/global_connections.py
 
 import uuid
-from typing import List
+from typing import List, Literal, Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
@@ -12,6 +12,7 @@ from app.services.auth import get_current_user
 from app.models import User, AssetConnection
 from app.schemas import AssetConnection as AssetConnectionSchema
 from app.crud import asset_connections as crud_assetconnections
+from app.services.network_topology import TOPOLOGY_NODE_LIMIT, get_topology
 
 router = APIRouter(
     prefix="/asset-connections",
@@ -56,6 +57,39 @@ def get_network_topology(
     )
 
 
+@router.get("/network-topology/lod")
+def get_network_topology_lod(
+    group_by: Literal["site", "area", "location", "purdue", "asset_type"] = "site",
+    expand: List[str] = Query([], description="Cluster ids to show as their assets"),
+    max_nodes: Optional[int] = Query(None, ge=1, le=TOPOLOGY_NODE_LIMIT),
+    min_x: Optional[float] = Query(None, description="Viewport bounds (all four or none)"),
+    min_y: Optional[float] = None,
+    max_x: Optional[float] = None,
+    max_y: Optional[float] = None,
+    site_id: uuid.UUID = Query(None, description="Filter by site ID"),
+    asset_type_id: uuid.UUID = Query(None, description="Filter by asset type ID"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Network topology aggregated into clusters by group_by, with the
+    connections summed between them. Expanded clusters are replaced by
+    their assets within the max_nodes budget; with viewport bounds only
+    the nodes positioned inside are returned.
+    """
+    bounds = (min_x, min_y, max_x, max_y)
+    return get_topology(
+        db,
+        current_user.tenant_id,
+        group_by=group_by,
+        expand=expand,
+        max_nodes=max_nodes,
+        site_id=site_id,
+        asset_type_id=asset_type_id,
+        bounds=bounds if None not in bounds else None,
+    )
+
+
 @router.get("/statistics")
 def get_connection_statistics(
     site_id: uuid.UUID = Query(None, description="Filter by site ID"),
@@ -1,14 +1,12 @@
 import uuid
 from datetime import datetime
 from typing import List
-import csv
 from fastapi import UploadFile, File, Body
-from fastapi.responses import StreamingResponse
-from io import StringIO
 import pandas as pd
 from sqlalchemy.exc import IntegrityError
 
 from fastapi import APIRouter, Depends, status, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -23,6 +21,7 @@ from app.crud import manufacturers as crud_manufacturers
 from app.errors.exceptions import ErrorCodeException
 from app.errors.error_codes import ErrorCode
 from app.services.audit_decorator import audit_log_action
+from app.services.table_export import stream_export
 
 router = APIRouter(
     prefix="/manufacturers",
@@ -34,34 +33,11 @@ router = APIRouter(
 def export_manufacturers_csv(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    manufacturers = (
-        db.query(Manufacturer)
-        .filter(Manufacturer.tenant_id == current_user.tenant_id)
-        .all()
-    )
-
-    def iter_csv():
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["name", "description", "website", "email", "phone"])
-        for m in manufacturers:
-            writer.writerow(
-                [
-                    m.name or "",
-                    m.description or "",
-                    m.website or "",
-                    m.email or "",
-                    m.phone or "",
-                ]
-            )
-        output.seek(0)
-        yield output.read()
-
-    return StreamingResponse(
-        iter_csv(),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=manufacturers.csv"},
+    columns = ["name", "description", "website", "email", "phone"]
+    statement = select(*(getattr(Manufacturer, column) for column in columns)).where(
+        Manufacturer.tenant_id == current_user.tenant_id
     )
+    return stream_export(db, statement, columns, "csv", "manufacturers")
 
 
 @router.post("/import/xlsx/preview")
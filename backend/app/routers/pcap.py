@@ -1,15 +1,20 @@
+import hashlib
+import os
 import uuid
 from typing import List
 import tempfile
 from fastapi import APIRouter, Depends, UploadFile, File, Form
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.database import get_db
-from app.models import User
+from app.models import PcapImportJob, User
 from app.services.auth import get_current_user
 from app.errors.exceptions import ErrorCodeException
 from app.errors.error_codes import ErrorCode
-from app.services.pcap_parser import extract_assets_and_communications_from_pcap, normalize_protocol
-from app.services.asset_sync import sync_assets, sync_communications
+from app.services.pcap_parser import aggregate_pcap_files_cached, tenant_protocol_normalizer
+from app.services.pcap_reader import PcapFormatError, summarize
+from app.services.pcap_jobs import enqueue_pcap_job, pcap_job_status
+from app.services.oui_lookup import get_vendor_from_mac
 from app.crud.sites import get_site
 import app.models
 
@@ -18,6 +23,8 @@ router = APIRouter(
     tags=["pcap"],
 )
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 @router.get("/protocols")
 async def get_supported_protocols():
@@ -35,6 +42,7 @@ async def get_supported_protocols():
         "KNX",
         "M-Bus",
         "IEC 61850",
+        "IEC 60870-5-104",
         "S7",
         "MQTT",
         "Other"
@@ -87,155 +95,113 @@ async def get_interface_protocols():
     }
 
 
-@router.post("/upload")
-async def upload_pcap_files(
-    files: List[UploadFile] = File(...),
-    site_id: uuid.UUID = Form(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    # Validazione dimensione file PCAP (50MB)
-    PCAP_MAX_SIZE = 50 * 1024 * 1024  # 50MB in bytes
-    
+PCAP_EXTENSIONS = (".pcap", ".pcapng")
+
+
+def _validate_pcap_files(files: List[UploadFile]):
+    """Check extension and size of the uploaded captures"""
+    max_size = settings.PCAP_MAX_UPLOAD_MB * 1024 * 1024
     for file in files:
-        if not file.filename.lower().endswith('.pcap'):
-            raise ErrorCodeException(
-                status_code=400,
-                error_code=ErrorCode.INVALID_FILE_FORMAT,
-                detail=f"File {file.filename} is not a valid PCAP file"
-            )
-        
+        if not file.filename.lower().endswith(PCAP_EXTENSIONS):
+            raise ErrorCodeException(status_code=400, error_code=ErrorCode.INVALID_FILE_FORMAT)
+
         # Leggi dimensione file
         file.file.seek(0, 2)  # Vai alla fine
         file_size = file.file.tell()
         file.file.seek(0)  # Torna all'inizio
-        
-        if file_size > PCAP_MAX_SIZE:
-            raise ErrorCodeException(
-                status_code=400,
-                error_code=ErrorCode.FILE_TOO_LARGE,
-                detail=f"File {file.filename} exceeds maximum size of 50MB (current size: {file_size / 1024 / 1024:.1f}MB)"
-            )
 
-    site = get_site(db, site_id)
-    if not site:
-        raise ErrorCodeException(status_code=404, error_code=ErrorCode.SITE_NOT_FOUND)
+        if file_size > max_size:
+            raise ErrorCodeException(status_code=400, error_code=ErrorCode.FILE_TOO_LARGE)
 
-    all_devices = {}
-    all_communications = {}
 
-    for file in files:
-        suffix = ".pcap" if file.filename.endswith(".pcap") else ""
-        with tempfile.NamedTemporaryFile(delete=True, suffix=suffix) as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp.flush()
+def _parse_pcap_uploads(files: List[UploadFile], normalize):
+    """
+    Stream every upload to a temporary file (hashing it on the way) and
+    fold all captures into a single aggregate, so that devices and
+    communications seen in several files are merged. Captures already
+    parsed by a previous preview are not parsed again.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        digests = {}
+        for index, file in enumerate(files):
+            path = os.path.join(tmpdir, f"{index}{os.path.splitext(file.filename)[1].lower()}")
+            digest = hashlib.sha256()
+            with open(path, "wb") as out:
+                while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+            digests[path] = digest.hexdigest()
+        try:
+            counter = aggregate_pcap_files_cached(digests)
+        except PcapFormatError:
+            raise ErrorCodeException(status_code=400, error_code=ErrorCode.INVALID_FILE_FORMAT)
+    return summarize(counter, normalize)
 
-            # Now extract devices and communications
-            devices, communications = extract_assets_and_communications_from_pcap(
-                tmp.name
-            )
 
-            # Merge devices without duplicate MAC
-            for mac, data in devices.items():
-                if mac not in all_devices:
-                    all_devices[mac] = data
-                else:
-                    all_devices[mac]["ips"].update(data["ips"])
-                    all_devices[mac]["protocols"].update(data["protocols"])
+@router.post("/upload", status_code=202)
+def upload_pcap_files(
+    files: List[UploadFile] = File(...),
+    site_id: uuid.UUID = Form(...),
+    accumulate: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Spool the captures and queue an import job; parsing and sync run in the
+    background workers. Progress is available at GET /pcap/jobs/{job_id}.
+    """
+    _validate_pcap_files(files)
 
-            # Merge communications (incrementing counters)
-            for src_mac, dsts in communications.items():
-                if src_mac not in all_communications:
-                    all_communications[src_mac] = dsts.copy()
-                else:
-                    for dst_mac, count in dsts.items():
-                        all_communications[src_mac][dst_mac] = (
-                            all_communications[src_mac].get(dst_mac, 0) + count
-                        )
+    site = get_site(db, site_id)
+    if not site:
+        raise ErrorCodeException(status_code=404, error_code=ErrorCode.SITE_NOT_FOUND)
 
-    # Convert sets to list, like in the parser
-    for mac in all_devices:
-        all_devices[mac]["ips"] = list(all_devices[mac]["ips"])
-        all_devices[mac]["protocols"] = list(all_devices[mac]["protocols"])
+    job = enqueue_pcap_job(
+        db,
+        files,
+        current_user.tenant_id,
+        site.id,
+        created_by=current_user.id,
+        accumulate=accumulate,
+    )
+    return {"job_id": job.id, "status": job.status}
 
-    created, updated = sync_assets(db, all_devices, current_user.tenant_id, site.id)
-    sync_communications(db, all_communications, current_user.tenant_id, site.id)
 
-    return {
-        "created": len(created),
-        "updated": len(updated),
-        "total_devices_found": len(all_devices),
-    }
+@router.get("/jobs/{job_id}")
+def get_pcap_job(
+    job_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Phase, counters, ETA and (once completed) result of an import job"""
+    job = (
+        db.query(PcapImportJob)
+        .filter(PcapImportJob.id == job_id, PcapImportJob.tenant_id == current_user.tenant_id)
+        .first()
+    )
+    if not job:
+        raise ErrorCodeException(status_code=404, error_code=ErrorCode.PCAP_JOB_NOT_FOUND)
+    return pcap_job_status(job)
 
 
 @router.post("/preview")
-async def preview_pcap_files(
+def preview_pcap_files(
     files: List[UploadFile] = File(...),
     site_id: uuid.UUID = Form(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    # Validazione dimensione file PCAP (50MB)
-    PCAP_MAX_SIZE = 50 * 1024 * 1024  # 50MB in bytes
-    
-    for file in files:
-        if not file.filename.lower().endswith('.pcap'):
-            raise ErrorCodeException(
-                status_code=400,
-                error_code=ErrorCode.INVALID_FILE_FORMAT,
-                detail=f"File {file.filename} is not a valid PCAP file"
-            )
-        
-        # Leggi dimensione file
-        file.file.seek(0, 2)  # Vai alla fine
-        file_size = file.file.tell()
-        file.file.seek(0)  # Torna all'inizio
-        
-        if file_size > PCAP_MAX_SIZE:
-            raise ErrorCodeException(
-                status_code=400,
-                error_code=ErrorCode.FILE_TOO_LARGE,
-                detail=f"File {file.filename} exceeds maximum size of 50MB (current size: {file_size / 1024 / 1024:.1f}MB)"
-            )
+    _validate_pcap_files(files)
+
     site = get_site(db, site_id)
     if not site:
         raise ErrorCodeException(status_code=404, error_code=ErrorCode.SITE_NOT_FOUND)
 
-    all_devices = {}
-    all_communications = {}
-
-    for file in files:
-        suffix = ".pcap" if file.filename.endswith(".pcap") else ""
-        with tempfile.NamedTemporaryFile(delete=True, suffix=suffix) as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp.flush()
-            devices, communications = extract_assets_and_communications_from_pcap(
-                tmp.name
-            )
-            for mac, data in devices.items():
-                if mac not in all_devices:
-                    all_devices[mac] = data
-                else:
-                    all_devices[mac]["ips"].update(data["ips"])
-                    all_devices[mac]["protocols"].update(data["protocols"])
-            for src_mac, dsts in communications.items():
-                if src_mac not in all_communications:
-                    all_communications[src_mac] = dsts.copy()
-                else:
-                    for dst_mac, count in dsts.items():
-                        all_communications[src_mac][dst_mac] = (
-                            all_communications[src_mac].get(dst_mac, 0) + count
-                        )
-    for mac in all_devices:
-        all_devices[mac]["ips"] = list(all_devices[mac]["ips"])
-        all_devices[mac]["protocols"] = list(all_devices[mac]["protocols"])
+    all_devices, all_communications = _parse_pcap_uploads(
+        files, tenant_protocol_normalizer(db, current_user.tenant_id)
+    )
 
     # --- LOGICA PREVIEW ---
-    from app.services.oui_lookup import load_oui_map
-
-    OUI_MAP = load_oui_map()
     preview = {
         "to_create": [],
         "to_update": [],
@@ -277,9 +243,7 @@ async def preview_pcap_files(
             ip_to_ifaces.setdefault(str(iface.ip_address), []).append(iface)
 
     for mac, data in all_devices.items():
-        vendor = OUI_MAP.get(
-            mac.replace(":", "").replace("-", "")[:6].upper(), "Unknown Vendor"
-        )
+        vendor = get_vendor_from_mac(mac)
         manufacturer_new = vendor not in existing_manufacturers
         if manufacturer_new:
             preview["manufacturers_to_create"].add(vendor)
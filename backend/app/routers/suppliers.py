@@ -1,13 +1,9 @@
 import uuid
 from datetime import datetime
-from typing import List
-import csv
-from fastapi import APIRouter, Depends, status, Request, UploadFile, File
-from fastapi.responses import StreamingResponse
-from io import StringIO
-import pandas as pd
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, status, Request, UploadFile, File, Form
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
 from app.database import get_db
 from app.models import User, Supplier, SupplierDocument
@@ -18,19 +14,21 @@ from app.schemas import (
     SupplierDocument as SupplierDocumentSchema,
     SupplierDocumentCreate,
 )
-from app.schemas.validators import (
-    validate_vat_number,
-    validate_tax_code,
-    validate_email,
-    validate_phone,
-    validate_website,
-)
 from app.services.auth import get_current_user
 from app.crud import suppliers as crud_suppliers
 from app.crud import supplier_documents as crud_documents
 from app.errors.exceptions import ErrorCodeException
 from app.errors.error_codes import ErrorCode
 from app.services.audit_decorator import audit_log_action
+from app.services.import_engine import (
+    ImportFileError,
+    confirm_import,
+    preview_import,
+    stage_import,
+    staged_import_path,
+)
+from app.services.supplier_import import SupplierImport
+from app.services.table_export import stream_export
 from app.schemas.contact import Contact as ContactSchema, ContactCreate
 
 router = APIRouter(
@@ -56,60 +54,25 @@ def list_suppliers_trash(
 def export_suppliers_csv(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    suppliers = (
-        db.query(Supplier)
-        .filter(
-            Supplier.tenant_id == current_user.tenant_id, Supplier.deleted_at == None
-        )
-        .all()
-    )
-
-    def iter_csv():
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(
-            [
-                "name",
-                "description",
-                "vat_number",
-                "tax_code",
-                "address",
-                "city",
-                "zip_code",
-                "province",
-                "country",
-                "phone",
-                "email",
-                "website",
-                "notes",
-            ]
-        )
-        for s in suppliers:
-            writer.writerow(
-                [
-                    s.name or "",
-                    s.description or "",
-                    s.vat_number or "",
-                    s.tax_code or "",
-                    s.address or "",
-                    s.city or "",
-                    s.zip_code or "",
-                    s.province or "",
-                    s.country or "",
-                    s.phone or "",
-                    s.email or "",
-                    s.website or "",
-                    s.notes or "",
-                ]
-            )
-        output.seek(0)
-        yield output.read()
-
-    return StreamingResponse(
-        iter_csv(),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=suppliers.csv"},
+    columns = [
+        "name",
+        "description",
+        "vat_number",
+        "tax_code",
+        "address",
+        "city",
+        "zip_code",
+        "province",
+        "country",
+        "phone",
+        "email",
+        "website",
+        "notes",
+    ]
+    statement = select(*(getattr(Supplier, column) for column in columns)).where(
+        Supplier.tenant_id == current_user.tenant_id, Supplier.deleted_at == None
     )
+    return stream_export(db, statement, columns, "csv", "suppliers")
 
 
 @router.post("/import/xlsx/preview")
@@ -119,203 +82,26 @@ def import_suppliers_xlsx_preview(
     current_user: User = Depends(get_current_user),
 ):
     try:
-        if file.filename.endswith(".csv"):
-            # Read CSV with string dtype for all columns to avoid numeric interpretation
-            df = pd.read_csv(file.file, dtype=str)
-            # Replace NaN values with None
-            df = df.where(pd.notnull(df), None)
-        else:
-            df = pd.read_excel(file.file)
-    except Exception as e:
+        token = stage_import(file, SupplierImport.kind, current_user.tenant_id)
+    except ImportFileError as e:
         return {"error": f"Error reading file: {str(e)}"}
-    to_create, to_update, errors = [], [], []
-    for idx, row in df.iterrows():
-        name = row.get("name")
-        vat_number = row.get("vat_number")
-        email = row.get("email")
-        missing = []
-        if name is None or str(name).strip() == "":
-            missing.append("name")
-        if vat_number is None or str(vat_number).strip() == "":
-            missing.append("vat_number")
-        if missing:
-            errors.append(
-                {
-                    "row": int(idx) + 2,
-                    "error": f"Missing required fields: {', '.join(missing)}",
-                }
-            )
-            continue
-        
-        # Validate fields if they are provided
-        try:
-            if vat_number:
-                validate_vat_number(None, vat_number)
-            if row.get("tax_code"):
-                validate_tax_code(None, row.get("tax_code"))
-            if email:
-                validate_email(None, email)
-            if row.get("phone"):
-                validate_phone(None, row.get("phone"))
-            if row.get("website"):
-                validate_website(None, row.get("website"))
-        except Exception as e:
-            errors.append(
-                {
-                    "row": int(idx) + 2,
-                    "error": f"Validation error: {str(e)}",
-                }
-            )
-            continue
-            
-        supplier = (
-            db.query(Supplier)
-            .filter(
-                Supplier.tenant_id == current_user.tenant_id,
-                Supplier.vat_number == vat_number,
-            )
-            .first()
-        )
-        if supplier:
-            diff = {}
-            for field in ["name", "description", "vat_number", "tax_code", "address", "city", "zip_code", "province", "country", "phone", "email", "website", "notes"]:
-                new = row.get(field)
-                old = getattr(supplier, field)
-                if str(old) != str(new):
-                    diff[field] = {"old": old, "new": new}
-            if diff:
-                to_update.append({"vat_number": vat_number, "diff": diff})
-        else:
-            to_create.append(
-                {
-                    "name": name,
-                    "description": row.get("description"),
-                    "vat_number": vat_number,
-                    "tax_code": row.get("tax_code"),
-                    "address": row.get("address"),
-                    "city": row.get("city"),
-                    "zip_code": row.get("zip_code"),
-                    "province": row.get("province"),
-                    "country": row.get("country"),
-                    "phone": row.get("phone"),
-                    "email": email,
-                    "website": row.get("website"),
-                    "notes": row.get("notes"),
-                }
-            )
-    return {"to_create": to_create, "to_update": to_update, "errors": errors}
+    target = SupplierImport(db, current_user.tenant_id)
+    path = staged_import_path(token, target.kind, current_user.tenant_id)
+    return {"token": token, **preview_import(target, path)}
 
 
 @router.post("/import/xlsx/confirm")
 def import_suppliers_xlsx_confirm(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    token: Optional[str] = Form(None),
+    mode: Literal["per_batch", "all_or_nothing"] = Form("per_batch"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     try:
-        if file.filename.endswith(".csv"):
-            # Read CSV with string dtype for all columns to avoid numeric interpretation
-            df = pd.read_csv(file.file, dtype=str)
-            # Replace NaN values with None
-            df = df.where(pd.notnull(df), None)
-        else:
-            df = pd.read_excel(file.file)
-    except Exception as e:
+        return confirm_import(SupplierImport(db, current_user.tenant_id), file, token, mode)
+    except ImportFileError as e:
         return {"error": f"Errore nella lettura del file: {str(e)}"}
-    created, updated, errors = [], [], []
-    for idx, row in df.iterrows():
-        name = row.get("name")
-        vat_number = row.get("vat_number")
-        email = row.get("email")
-        missing = []
-        if name is None or str(name).strip() == "":
-            missing.append("name")
-        if vat_number is None or str(vat_number).strip() == "":
-            missing.append("vat_number")
-        if missing:
-            errors.append(
-                {
-                    "row": int(idx) + 2,
-                    "error": f"Missing required fields: {', '.join(missing)}",
-                }
-            )
-            continue
-        
-        # Validate fields if they are provided
-        try:
-            if vat_number:
-                validate_vat_number(None, vat_number)
-            if row.get("tax_code"):
-                validate_tax_code(None, row.get("tax_code"))
-            if email:
-                validate_email(None, email)
-            if row.get("phone"):
-                validate_phone(None, row.get("phone"))
-            if row.get("website"):
-                validate_website(None, row.get("website"))
-        except Exception as e:
-            errors.append(
-                {
-                    "row": int(idx) + 2,
-                    "error": f"Validation error: {str(e)}",
-                }
-            )
-            continue
-            
-        supplier = (
-            db.query(Supplier)
-            .filter(
-                Supplier.tenant_id == current_user.tenant_id,
-                Supplier.vat_number == vat_number,
-            )
-            .first()
-        )
-        try:
-            if supplier:
-                supplier.name = name
-                supplier.description = row.get("description")
-                supplier.vat_number = vat_number
-                supplier.tax_code = row.get("tax_code")
-                supplier.address = row.get("address")
-                supplier.city = row.get("city")
-                supplier.zip_code = row.get("zip_code")
-                supplier.province = row.get("province")
-                supplier.country = row.get("country")
-                supplier.phone = row.get("phone")
-                supplier.email = email
-                supplier.website = row.get("website")
-                supplier.notes = row.get("notes")
-                db.commit()
-                updated.append(vat_number)
-            else:
-                new_supplier = Supplier(
-                    name=name,
-                    description=row.get("description"),
-                    vat_number=vat_number,
-                    tax_code=row.get("tax_code"),
-                    address=row.get("address"),
-                    city=row.get("city"),
-                    zip_code=row.get("zip_code"),
-                    province=row.get("province"),
-                    country=row.get("country"),
-                    phone=row.get("phone"),
-                    email=email,
-                    website=row.get("website"),
-                    notes=row.get("notes"),
-                    tenant_id=current_user.tenant_id,
-                )
-                db.add(new_supplier)
-                db.commit()
-                created.append(vat_number)
-        except IntegrityError as e:
-            db.rollback()
-            errors.append(
-                {"row": int(idx) + 2, "error": f"Integrity error: {str(e)}"}
-            )
-        except Exception as e:
-            db.rollback()
-            errors.append({"row": int(idx) + 2, "error": str(e)})
-    return {"created": created, "updated": updated, "errors": errors}
 
 
 @router.post("", response_model=SupplierSchema)
@@ -21,6 +21,7 @@ from .location import (
     LocationFloorplanCreate,
     LocationFloorplanRead,
     PositionUpdate,
+    AssetPositionUpdate,
 )
 
 # Asset related schemas
@@ -94,6 +95,7 @@ __all__ = [
     "LocationFloorplanCreate",
     "LocationFloorplanRead",
     "PositionUpdate",
+    "AssetPositionUpdate",
     # Asset
     "AssetType",
     "AssetTypeBase",
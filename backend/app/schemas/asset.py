@@ -1,7 +1,7 @@
 # backend/schemas/asset.py
 
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime, date
 import uuid
 from app.schemas.validators import *
@@ -46,6 +46,7 @@ class AssetBase(BaseModel):
     custom_fields: Dict[str, Any]
     map_x: Optional[float] = None
     map_y: Optional[float] = None
+    position_version: int = 0
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
     status_id: Optional[uuid.UUID] = None
@@ -185,6 +186,8 @@ class AssetRead(AssetBase):
 class AssetBulkUpdateRequest(BaseModel):
     ids: List[uuid.UUID]
     fields: Dict[str, Any]
+    # per_asset: update the assets found, all_or_nothing: none unless all are found
+    mode: Literal["per_asset", "all_or_nothing"] = "per_asset"
 
 
 class AssetBulkSoftDeleteRequest(BaseModel):
@@ -210,3 +213,7 @@ class RiskOverviewResponse(BaseModel):
     total_assets: int
     average_risk_score: float
     top_risk_assets: List[Dict[str, Any]]
+    # Oldest / newest persisted assessment: scores are refreshed by
+    # POST /assets/recalculate-all-risk-scores, not by this read
+    oldest_risk_assessment: Optional[datetime] = None
+    last_risk_assessment: Optional[datetime] = None
@@ -30,6 +30,13 @@ class PositionUpdate(BaseModel):
     map_y: float
 
 
+class AssetPositionUpdate(PositionUpdate):
+    id: uuid.UUID
+    # position_version read with the asset: the move is rejected if the
+    # position was saved since; None saves unconditionally
+    version: Optional[int] = None
+
+
 class LocationCreate(BaseModel):
     site_id: uuid.UUID
     area_id: Optional[uuid.UUID] = None
@@ -0,0 +1,263 @@
+# backend/services/asset_bulk.py
+"""
+Set-based bulk operations on the assets of a tenant.
+
+Each operation is one statement per table over all the selected rows
+instead of an ORM load and flush per asset. Statements bypass the flush
+hooks, so they keep the rollup (apply_asset_stats_delta) and the
+rescoring flags (mark_assets_risk_dirty) current themselves.
+"""
+
+import logging
+import os
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import any_, cast, delete, func, inspect, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.errors.error_codes import ErrorCode
+from app.errors.exceptions import ErrorCodeException
+from app.config import settings
+from app.models import (
+    Asset,
+    AssetCommunication,
+    AssetConnection,
+    AssetDocument,
+    AssetInterface,
+    AssetPhoto,
+    PrintHistory,
+)
+from app.models.asset import asset_contacts, asset_suppliers
+from app.services.asset_graph import neighbour_ids_select
+from app.services.asset_stats import TRACKED_FIELDS, add_asset_update_delta, apply_asset_stats_delta
+from app.services.audit_log import create_audit_logs
+from app.services.network_topology import invalidate_topology_cache
+from app.services.risk_scoring import (
+    NEIGHBOUR_INPUT_FIELDS,
+    RISK_INPUT_FIELDS,
+    mark_assets_risk_dirty,
+)
+
+logger = logging.getLogger(__name__)
+
+BULK_UPDATE_MODES = ("per_asset", "all_or_nothing")
+# Columns a bulk update never writes
+PROTECTED_FIELDS = ("id", "tenant_id", "created_at", "updated_at", "risk_score_dirty")
+# Field names of the audit description
+FIELD_LABELS = {
+    "manufacturer_id": "produttore",
+    "asset_status_id": "stato",
+    "site_id": "sito",
+    "area_id": "area",
+    "location_id": "posizione",
+    "asset_type_id": "tipo",
+    "risk_score": "risk score",
+    "purdue_level": "livello Purdue",
+    "impact_value": "valore impatto",
+    "access_ease": "facilità accesso",
+    "exposure_level": "livello esposizione",
+    "update_status": "stato aggiornamento",
+}
+
+
+def asset_ids_param(ids: Sequence[uuid.UUID]):
+    """The ids as a single uuid[] parameter, for "id = ANY(...)" """
+    return cast(literal(list(ids), ARRAY(UUID(as_uuid=True))), ARRAY(UUID(as_uuid=True)))
+
+
+def bulk_update_fields(fields: dict) -> dict:
+    """The fields of a request that are asset columns a bulk update may set"""
+    columns = {attr.key for attr in inspect(Asset).column_attrs}
+    return {
+        field: value
+        for field, value in fields.items()
+        if field in columns and field not in PROTECTED_FIELDS
+    }
+
+
+def bulk_update_statement(tenant_id: uuid.UUID, ids: Sequence[uuid.UUID], fields: dict):
+    """
+    UPDATE of fields on the assets ids of the tenant. The rows are locked
+    and read by a FROM sub-select, so RETURNING gives the old ("old_<field>")
+    and new ("new_<field>") values of the tracked and updated fields.
+    """
+    captured = list(dict.fromkeys([*TRACKED_FIELDS, *fields]))
+    old = (
+        select(Asset.id, *(getattr(Asset, field) for field in captured))
+        .where(Asset.id == any_(asset_ids_param(ids)), Asset.tenant_id == tenant_id)
+        .with_for_update()
+        .subquery("old")
+    )
+    values = dict(fields)
+    if set(fields) & set(RISK_INPUT_FIELDS):
+        values["risk_score_dirty"] = True
+    return (
+        update(Asset)
+        .where(Asset.id == old.c.id)
+        .values(**values)
+        .returning(
+            Asset.id,
+            Asset.name,
+            *(old.c[field].label(f"old_{field}") for field in captured),
+            *(getattr(Asset, field).label(f"new_{field}") for field in TRACKED_FIELDS),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bulk_update_assets(
+    db: Session,
+    tenant_id: uuid.UUID,
+    user_id: uuid.UUID,
+    ids: Sequence[uuid.UUID],
+    fields: dict,
+    mode: str = "per_asset",
+    ip_address: Optional[str] = None,
+) -> Dict[str, List]:
+    """
+    Set fields on the assets ids with one UPDATE ... RETURNING and write
+    their audit rows with one INSERT, then commit. Return {"updated",
+    "errors"}, errors being {"id", "error"} of the ids not updated.
+    "per_asset" updates the assets found; "all_or_nothing" updates nothing
+    unless every id is found.
+    """
+    if mode not in BULK_UPDATE_MODES:
+        raise ValueError(f"Unknown bulk update mode: {mode}")
+    fields = bulk_update_fields(fields)
+    if not fields:
+        raise ErrorCodeException(status_code=400, error_code=ErrorCode.INVALID_ASSET_UPDATE)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {"updated": [], "errors": []}
+
+    try:
+        rows = db.execute(bulk_update_statement(tenant_id, ids, fields)).mappings().all()
+        found = {row["id"] for row in rows}
+        errors = [
+            {"id": str(asset_id), "error": "Asset non trovato"}
+            for asset_id in ids
+            if asset_id not in found
+        ]
+        if errors and mode == "all_or_nothing":
+            db.rollback()
+            return {"updated": [], "errors": errors}
+
+        if set(fields) & set(TRACKED_FIELDS):
+            delta = Counter()
+            for row in rows:
+                add_asset_update_delta(
+                    delta,
+                    {field: row[f"old_{field}"] for field in TRACKED_FIELDS},
+                    {field: row[f"new_{field}"] for field in TRACKED_FIELDS},
+                )
+            apply_asset_stats_delta(db.connection(), delta)
+        if rows and set(fields) & set(NEIGHBOUR_INPUT_FIELDS):
+            mark_assets_risk_dirty(db.connection(), neighbour_ids_select(found))
+
+        fields_text = ", ".join(FIELD_LABELS.get(field, field) for field in fields)
+        create_audit_logs(
+            db,
+            user_id=user_id,
+            tenant_id=tenant_id,
+            action="bulk_update",
+            entity="Asset",
+            entries=[
+                {
+                    "entity_id": row["id"],
+                    "old_data": {field: row[f"old_{field}"] for field in fields},
+                    "new_data": fields,
+                    "description": f"Aggiornamento massivo: modificati {fields_text} per '{row['name'] or row['id']}'",
+                }
+                for row in rows
+            ],
+            ip_address=ip_address,
+        )
+        db.commit()
+        invalidate_topology_cache(tenant_id)
+    except SQLAlchemyError as exc:
+        db.rollback()
+        # The same values go to every row: the error is the one of each id
+        message = str(getattr(exc, "orig", None) or exc)
+        return {"updated": [], "errors": [{"id": str(asset_id), "error": message} for asset_id in ids]}
+    return {
+        "updated": [str(asset_id) for asset_id in ids if asset_id in found],
+        "errors": errors,
+    }
+
+
+def empty_assets_trash(db: Session, tenant_id: uuid.UUID) -> Tuple[int, List[str]]:
+    """
+    Delete the trashed assets of the tenant with everything referencing
+    them, one DELETE per table, then commit. Return (assets deleted, file
+    paths of their photos and documents) so the caller can remove the
+    files once the transaction is committed.
+    """
+    # Lock the trash first: an asset restored meanwhile waits for the
+    # commit, one trashed meanwhile stays for the next run
+    ids = db.execute(
+        select(Asset.id)
+        .where(Asset.tenant_id == tenant_id, Asset.deleted_at != None)
+        .with_for_update()
+    ).scalars().all()
+    if not ids:
+        return 0, []
+    trashed = asset_ids_param(ids)
+    interface_ids = select(AssetInterface.id).where(AssetInterface.asset_id == any_(trashed))
+
+    # Assets linked to the trash lose a neighbour and need rescoring
+    mark_assets_risk_dirty(db.connection(), neighbour_ids_select(select(func.unnest(trashed))))
+    db.execute(
+        delete(AssetCommunication).where(
+            or_(
+                AssetCommunication.src_interface_id.in_(interface_ids),
+                AssetCommunication.dst_interface_id.in_(interface_ids),
+            )
+        )
+    )
+    db.execute(
+        delete(AssetConnection).where(
+            or_(
+                AssetConnection.parent_asset_id == any_(trashed),
+                AssetConnection.child_asset_id == any_(trashed),
+            )
+        )
+    )
+    # Connections of the remaining assets may still name a trashed interface
+    for column in (AssetConnection.local_interface_id, AssetConnection.remote_interface_id):
+        db.execute(
+            update(AssetConnection)
+            .where(column.in_(interface_ids))
+            .values({column: None})
+            .execution_options(synchronize_session=False)
+        )
+    files = []
+    for model in (AssetDocument, AssetPhoto):
+        files += db.execute(
+            delete(model).where(model.asset_id == any_(trashed)).returning(model.file_path)
+        ).scalars().all()
+    db.execute(delete(AssetInterface).where(AssetInterface.asset_id == any_(trashed)))
+    db.execute(delete(PrintHistory).where(PrintHistory.asset_id == any_(trashed)))
+    for table in (asset_contacts, asset_suppliers):
+        db.execute(delete(table).where(table.c.asset_id == any_(trashed)))
+    # Trashed assets are not counted in tenant_asset_stats: no delta
+    db.execute(delete(Asset).where(Asset.id == any_(trashed)))
+    db.commit()
+    invalidate_topology_cache(tenant_id)
+    # The session may still hold the deleted rows
+    db.expire_all()
+    return len(ids), files
+
+
+def remove_upload_files(paths: Sequence[str]) -> None:
+    """Remove photo/document files (relative to UPLOAD_DIR), missing ones are skipped"""
+    for path in paths:
+        try:
+            os.remove(os.path.join(settings.UPLOAD_DIR, path))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Could not remove upload %s", path, exc_info=True)
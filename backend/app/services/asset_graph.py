@@ -0,0 +1,184 @@
+# backend/services/asset_graph.py
+from typing import Dict, List, Optional, Sequence
+import uuid
+
+import numpy as np
+from sqlalchemy import or_, select, union
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql.expression import Selectable
+
+from app.models import Asset, AssetCommunication, AssetConnection, AssetInterface
+
+# Purdue levels from which a link to a level 0/1 asset crosses the OT boundary
+HIGH_PURDUE_LEVEL = 3
+# Business criticality values a neighbour must have to count as "critical"
+CRITICAL_NEIGHBOUR_LEVELS = ("critical", "critica")
+
+
+class AssetAdjacency:
+    """
+    Undirected adjacency of the active assets of a tenant, built from
+    AssetConnection (documented links) and AssetCommunication (observed
+    traffic). Assets are renumbered 0..n-1 and the graph is kept in CSR form
+    (indptr/indices integer arrays), so per-asset features are computed for
+    the whole tenant with a few numpy operations.
+    """
+
+    def __init__(
+        self,
+        asset_ids: List[uuid.UUID],
+        purdue_level: np.ndarray,
+        critical: np.ndarray,
+        src: np.ndarray,
+        dst: np.ndarray,
+    ):
+        n = len(asset_ids)
+        self.asset_ids = asset_ids
+        self.index = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+        self.purdue_level = purdue_level
+        self.critical = critical
+
+        # Symmetrize, drop self loops and duplicates (a link documented and
+        # also observed in traffic counts once)
+        keep = src != dst
+        rows = np.concatenate([src[keep], dst[keep]])
+        cols = np.concatenate([dst[keep], src[keep]])
+        edges = np.unique(rows * n + cols)
+        rows, cols = edges // max(n, 1), edges % max(n, 1)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.indptr[1:])
+        self.indices = cols.astype(np.int32)
+
+    @classmethod
+    def load(
+        cls,
+        db: Session,
+        tenant_id: uuid.UUID,
+        asset_ids: Optional[Sequence[uuid.UUID]] = None,
+    ) -> "AssetAdjacency":
+        """
+        Build the adjacency of a tenant with three column-only queries.
+        With asset_ids, only the links touching those assets and the assets
+        at either end are read: the features of asset_ids are exact, those
+        of their neighbours are not.
+        """
+        src_iface = aliased(AssetInterface)
+        dst_iface = aliased(AssetInterface)
+        connections = select(AssetConnection.parent_asset_id, AssetConnection.child_asset_id).where(
+            AssetConnection.tenant_id == tenant_id
+        )
+        communications = (
+            select(src_iface.asset_id, dst_iface.asset_id)
+            .select_from(AssetCommunication)
+            .join(src_iface, src_iface.id == AssetCommunication.src_interface_id)
+            .join(dst_iface, dst_iface.id == AssetCommunication.dst_interface_id)
+            .where(AssetCommunication.tenant_id == tenant_id)
+        )
+        if asset_ids is not None:
+            asset_ids = list(asset_ids)
+            connections = connections.where(
+                or_(
+                    AssetConnection.parent_asset_id.in_(asset_ids),
+                    AssetConnection.child_asset_id.in_(asset_ids),
+                )
+            )
+            communications = communications.where(
+                or_(src_iface.asset_id.in_(asset_ids), dst_iface.asset_id.in_(asset_ids))
+            )
+        links = db.execute(union(connections, communications)).all()
+
+        query = db.query(Asset.id, Asset.purdue_level, Asset.business_criticality).filter(
+            Asset.tenant_id == tenant_id, Asset.deleted_at == None
+        )
+        if asset_ids is not None:
+            query = query.filter(
+                Asset.id.in_(set(asset_ids) | {asset_id for link in links for asset_id in link})
+            )
+        assets = query.all()
+        asset_ids = [a.id for a in assets]
+        purdue = np.array(
+            [np.nan if a.purdue_level is None else a.purdue_level for a in assets],
+            dtype=float,
+        )
+        critical = np.array(
+            [str(a.business_criticality).lower() in CRITICAL_NEIGHBOUR_LEVELS for a in assets],
+            dtype=bool,
+        )
+
+        index = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+        pairs = [
+            (index[a], index[b])
+            for a, b in links
+            if a in index and b in index
+        ]
+        src = np.array([a for a, _ in pairs], dtype=np.int64)
+        dst = np.array([b for _, b in pairs], dtype=np.int64)
+        return cls(asset_ids, purdue, critical, src, dst)
+
+    def degree(self) -> np.ndarray:
+        """Number of distinct neighbours of every asset (fan-out)"""
+        return np.diff(self.indptr)
+
+    def any_neighbour(self, mask: np.ndarray) -> np.ndarray:
+        """For every asset, whether at least one neighbour satisfies mask"""
+        owner = np.repeat(np.arange(len(self.asset_ids)), self.degree())
+        hits = np.bincount(owner, weights=mask[self.indices], minlength=len(self.asset_ids))
+        return hits > 0
+
+    def neighbours(self, asset_id: uuid.UUID) -> List[uuid.UUID]:
+        i = self.index[asset_id]
+        return [self.asset_ids[j] for j in self.indices[self.indptr[i] : self.indptr[i + 1]]]
+
+    def features(self, asset_ids: Optional[Sequence[uuid.UUID]] = None) -> Dict[str, np.ndarray]:
+        """
+        Graph features used by CompositeRiskScoringEngine, aligned with
+        asset_ids (all assets of the index if None):
+        - connection_count: distinct neighbours
+        - high_level_connection: a neighbour sits at Purdue level >= HIGH_PURDUE_LEVEL
+        - connected_to_critical: a neighbour has critical business criticality
+        """
+        features = {
+            "connection_count": self.degree(),
+            "high_level_connection": self.any_neighbour(self.purdue_level >= HIGH_PURDUE_LEVEL),
+            "connected_to_critical": self.any_neighbour(self.critical),
+        }
+        if asset_ids is None:
+            return features
+        # Assets not in the index (trashed) have no neighbours
+        positions = np.array([self.index.get(a, -1) for a in asset_ids], dtype=np.int64)
+        found = positions >= 0
+        aligned = {}
+        for name, column in features.items():
+            out = np.zeros(len(positions), dtype=column.dtype)
+            out[found] = column[positions[found]]
+            aligned[name] = out
+        return aligned
+
+    def features_of(self, asset_id: uuid.UUID) -> Dict[str, object]:
+        """Graph features of a single asset, as plain Python values"""
+        return {name: column[0].item() for name, column in self.features([asset_id]).items()}
+
+
+def neighbour_ids_select(asset_ids):
+    """
+    SELECT of the assets linked to asset_ids (ids, or a SELECT of ids) by a
+    connection or a communication
+    """
+    if not isinstance(asset_ids, Selectable):
+        asset_ids = list(asset_ids)
+    src_iface = aliased(AssetInterface)
+    dst_iface = aliased(AssetInterface)
+    return union(
+        select(AssetConnection.child_asset_id).where(AssetConnection.parent_asset_id.in_(asset_ids)),
+        select(AssetConnection.parent_asset_id).where(AssetConnection.child_asset_id.in_(asset_ids)),
+        select(dst_iface.asset_id)
+        .select_from(AssetCommunication)
+        .join(src_iface, src_iface.id == AssetCommunication.src_interface_id)
+        .join(dst_iface, dst_iface.id == AssetCommunication.dst_interface_id)
+        .where(src_iface.asset_id.in_(asset_ids)),
+        select(src_iface.asset_id)
+        .select_from(AssetCommunication)
+        .join(src_iface, src_iface.id == AssetCommunication.src_interface_id)
+        .join(dst_iface, dst_iface.id == AssetCommunication.dst_interface_id)
+        .where(dst_iface.asset_id.in_(asset_ids)),
+    )
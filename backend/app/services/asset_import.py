@@ -0,0 +1,302 @@
+# backend/services/asset_import.py
+"""
+XLSX/CSV asset import, an ImportTarget of services/import_engine.py.
+
+Sites, asset types, the default status and the tenant manufacturers are
+loaded once per import; every batch prefetches the assets matched by tag
+(with their LAN interfaces) in one query, creates its missing manufacturers
+with one INSERT ... ON CONFLICT and adds the new assets and interfaces in
+bulk.
+"""
+
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
+
+from app.models import Asset, AssetType, Site
+from app.models.asset_interface import AssetInterface
+from app.models.asset_status import AssetStatus
+from app.models.manufacturer import Manufacturer
+from app.services.import_engine import ImportColumn, ImportRow, ImportSchema, ImportTarget
+
+BUSINESS_CRITICALITIES = ("low", "medium", "high", "critical")
+# Sheet columns copied as they are on the asset
+TEXT_FIELDS = (
+    "serial_number",
+    "model",
+    "firmware_version",
+    "description",
+    "physical_access_ease",
+)
+
+
+def _business_criticality(text: Optional[str]) -> Optional[str]:
+    value = (text or "").lower()
+    return value if value in BUSINESS_CRITICALITIES else None
+
+
+def _purdue_level(text: Optional[str]) -> float:
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _installation_date(text: Optional[str]):
+    try:
+        return datetime.fromisoformat(text).date()
+    except (TypeError, ValueError):
+        return None
+
+
+ASSET_SCHEMA = ImportSchema(
+    [
+        ImportColumn("name", required=True, headers=("nome", "name")),
+        ImportColumn("tag"),
+        ImportColumn("site_code", required=True),
+        ImportColumn("asset_type", required=True, headers=("asset_type", "asset_type_name")),
+        ImportColumn("ip_address"),
+        ImportColumn("manufacturer"),
+        *(ImportColumn(field) for field in TEXT_FIELDS),
+        ImportColumn("business_criticality", parse=_business_criticality),
+        ImportColumn("purdue_level", parse=_purdue_level),
+        ImportColumn("installation_date", parse=_installation_date),
+    ],
+    missing_message="Campi obbligatori mancanti: {}",
+)
+# Fields compared by the preview of an update, besides the interfaces
+DIFF_FIELDS = (
+    "name",
+    *TEXT_FIELDS,
+    "business_criticality",
+    "purdue_level",
+    "installation_date",
+)
+
+
+class AssetImport(ImportTarget):
+    """Assets created, or updated when the tag matches, with a LAN interface for ip_address"""
+
+    kind = "assets"
+    schema = ASSET_SCHEMA
+    integrity_message = "Errore di integrità: {}"
+
+    def reset(self) -> None:
+        db, tenant_id = self.db, self.tenant_id
+        self.sites = dict(db.query(Site.code, Site.id).filter(Site.tenant_id == tenant_id).all())
+        self.asset_types = {}
+        # Tenant types first: they win over the global type with the same name
+        for name, type_id in (
+            db.query(AssetType.name, AssetType.id)
+            .filter(or_(AssetType.tenant_id == tenant_id, AssetType.tenant_id.is_(None)))
+            .order_by(AssetType.tenant_id.is_(None))
+            .all()
+        ):
+            self.asset_types.setdefault(name.lower(), type_id)
+        # 'Active' status of the tenant, otherwise its first status
+        self.status_id = (
+            db.query(AssetStatus.id)
+            .filter(AssetStatus.tenant_id == tenant_id)
+            .order_by(AssetStatus.name != "Active")
+            .limit(1)
+            .scalar()
+        )
+        self.manufacturer_ids = {
+            name.lower(): manufacturer_id
+            for name, manufacturer_id in db.query(Manufacturer.name, Manufacturer.id)
+            .filter(Manufacturer.tenant_id == tenant_id)
+            .all()
+        }
+
+    def check(self, values: dict) -> List[str]:
+        errors = []
+        values["site_id"] = self.sites.get(values["site_code"])
+        if values["site_id"] is None:
+            errors.append(f"Site con code '{values['site_code']}' non trovato")
+        values["asset_type_id"] = self.asset_types.get(values["asset_type"].lower())
+        if values["asset_type_id"] is None:
+            errors.append(f"AssetType con name '{values['asset_type']}' non trovato")
+        if self.status_id is None:
+            errors.append("No asset status available")
+        return errors
+
+    def _assets_by_tag(self, rows: List[ImportRow], *options) -> dict:
+        by_tag = {}
+        tags = {row.values["tag"] for row in rows if row.values["tag"] is not None}
+        if tags:
+            for asset in (
+                self.db.query(Asset)
+                .options(*options)
+                .filter(Asset.tenant_id == self.tenant_id, Asset.tag.in_(tags))
+                .all()
+            ):
+                by_tag.setdefault(asset.tag, asset)
+        return by_tag
+
+    def _lan_ips(self, assets) -> set:
+        # (asset id, ip) of the LAN interfaces the import would create again
+        if not assets:
+            return set()
+        return set(
+            self.db.query(AssetInterface.asset_id, AssetInterface.ip_address)
+            .filter(
+                AssetInterface.asset_id.in_([asset.id for asset in assets]),
+                func.lower(AssetInterface.name) == "lan",
+                AssetInterface.type == "ethernet",
+            )
+            .all()
+        )
+
+    def preview(self, rows: List[ImportRow]) -> Tuple[list, list]:
+        by_tag = self._assets_by_tag(
+            rows,
+            selectinload(Asset.manufacturer),
+            selectinload(Asset.site),
+            selectinload(Asset.asset_type),
+        )
+        to_create, to_update = [], []
+        for row in rows:
+            values = row.values
+            manufacturer = values["manufacturer"]
+            manufacturer_action = None
+            if manufacturer:
+                manufacturer_action = (
+                    "use_existing" if manufacturer.lower() in self.manufacturer_ids else "create"
+                )
+            interfaces = []
+            if values["ip_address"]:
+                interfaces.append({"name": "LAN", "type": "ethernet", "ip_address": values["ip_address"]})
+            asset = by_tag.get(values["tag"]) if values["tag"] is not None else None
+            if asset is None:
+                to_create.append(
+                    {
+                        **{field: values[field] for field in ASSET_SCHEMA.names},
+                        "manufacturer_action": manufacturer_action,
+                        "interfaces": interfaces,
+                    }
+                )
+                continue
+            diff = {}
+            old_manufacturer = asset.manufacturer.name if asset.manufacturer else None
+            if str(old_manufacturer).lower() != str(manufacturer).lower():
+                diff["manufacturer"] = {"old": old_manufacturer, "new": manufacturer}
+            old_site_code = asset.site.code if asset.site else None
+            if str(old_site_code) != str(values["site_code"]):
+                diff["site_code"] = {"old": old_site_code, "new": values["site_code"]}
+            old_asset_type = asset.asset_type.name if asset.asset_type else None
+            if str(old_asset_type) != str(values["asset_type"]):
+                diff["asset_type"] = {"old": old_asset_type, "new": values["asset_type"]}
+            for field in DIFF_FIELDS:
+                old = getattr(asset, field)
+                if str(old) != str(values[field]):
+                    diff[field] = {"old": old, "new": values[field]}
+            if diff or interfaces:
+                to_update.append(
+                    {
+                        "tag": values["tag"],
+                        "diff": diff,
+                        "interfaces": interfaces,
+                        "manufacturer_action": manufacturer_action,
+                    }
+                )
+        return to_create, to_update
+
+    def _ensure_manufacturers(self, rows: List[ImportRow]) -> None:
+        # Manufacturer names are globally unique: a name already used by
+        # another tenant is not inserted and stays unresolved
+        missing = {}
+        for row in rows:
+            name = row.values["manufacturer"]
+            if name and name.lower() not in self.manufacturer_ids:
+                missing.setdefault(name.lower(), name)
+        if missing:
+            inserted = self.db.execute(
+                pg_insert(Manufacturer)
+                .values(
+                    [
+                        {"id": uuid.uuid4(), "name": name, "tenant_id": self.tenant_id}
+                        for name in missing.values()
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=["name"])
+                .returning(Manufacturer.name, Manufacturer.id)
+            )
+            self.manufacturer_ids.update(
+                {name.lower(): manufacturer_id for name, manufacturer_id in inserted.all()}
+            )
+
+    def write(self, rows: List[ImportRow]) -> Tuple[list, list, list]:
+        self._ensure_manufacturers(rows)
+        by_tag = self._assets_by_tag(rows)
+        lan_ips = self._lan_ips(by_tag.values())
+
+        created, updated, errors = [], [], []
+        new_assets, new_interfaces = [], []
+        for row in rows:
+            values = row.values
+            tag = values["tag"]
+            manufacturer_id = None
+            if values["manufacturer"]:
+                manufacturer_id = self.manufacturer_ids.get(values["manufacturer"].lower())
+                if manufacturer_id is None:
+                    errors.append(
+                        {
+                            "row": row.row,
+                            "error": f"Errore creazione manufacturer: '{values['manufacturer']}' già usato da un altro tenant",
+                        }
+                    )
+                    continue
+            fields = {
+                "name": values["name"],
+                "site_id": values["site_id"],
+                "asset_type_id": values["asset_type_id"],
+                "business_criticality": values["business_criticality"],
+                "purdue_level": values["purdue_level"],
+                "installation_date": values["installation_date"],
+                **{field: values[field] for field in TEXT_FIELDS},
+            }
+            asset = by_tag.get(tag) if tag is not None else None
+            if asset is not None:
+                for field, value in fields.items():
+                    setattr(asset, field, value)
+                if manufacturer_id:
+                    asset.manufacturer_id = manufacturer_id
+                updated.append(tag)
+            else:
+                asset = Asset(
+                    id=uuid.uuid4(),
+                    tenant_id=self.tenant_id,
+                    tag=tag,
+                    status_id=self.status_id,
+                    manufacturer_id=manufacturer_id,
+                    **fields,
+                )
+                new_assets.append(asset)
+                if tag is not None:
+                    by_tag[tag] = asset
+                created.append(tag)
+            # LAN interface for the ip_address, unless the asset already has it
+            ip = values["ip_address"]
+            if ip is not None and (asset.id, ip) not in lan_ips:
+                lan_ips.add((asset.id, ip))
+                new_interfaces.append(
+                    AssetInterface(
+                        asset_id=asset.id,
+                        name="LAN",
+                        type="ethernet",
+                        ip_address=ip,
+                        tenant_id=self.tenant_id,
+                    )
+                )
+        # Primary keys are assigned here, so the ORM batches the INSERTs
+        # (and the asset stats / risk flush hooks still see every row)
+        self.db.add_all(new_assets)
+        self.db.flush()
+        self.db.add_all(new_interfaces)
+        self.db.flush()
+        return created, updated, errors
+
@@ -0,0 +1,477 @@
+# backend/services/asset_stats.py
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+import logging
+import threading
+import uuid
+
+from sqlalchemy import Integer, String, and_, column, event, func, inspect, select, values
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models import Asset, AssetStatus, AssetType, Site, Tenant, TenantAssetStat
+
+logger = logging.getLogger(__name__)
+
+# Business criticality values counted as "critical" on the dashboard
+CRITICAL_LEVELS = ("critical", "high")
+# Risk score from which an asset is considered "at risk"
+AT_RISK_SCORE = 5
+# Asset columns that affect the tenant_asset_stats rollup
+TRACKED_FIELDS = (
+    "tenant_id",
+    "site_id",
+    "status_id",
+    "asset_type_id",
+    "business_criticality",
+    "risk_score",
+    "deleted_at",
+)
+# First key of the per-tenant advisory lock of the rollup (the second is
+# hashtext(tenant_id)): deltas take it shared, the reconciler exclusive
+ASSET_STATS_LOCK_CLASS = 7301
+
+
+def aggregate_asset_stats(
+    db: Session, tenant_id: uuid.UUID, site_id: Optional[uuid.UUID] = None
+) -> dict:
+    """
+    Compute every dashboard counter with a single GROUP BY over the assets of
+    a tenant (trashed assets excluded). Rows are grouped by site, status and
+    type; the totals are summed in Python over the (small) set of groups.
+    """
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    count = func.count(Asset.id)
+    query = (
+        db.query(
+            Asset.site_id,
+            Site.name,
+            Asset.status_id,
+            AssetStatus.name,
+            Asset.asset_type_id,
+            count,
+            count.filter(Asset.business_criticality.in_(CRITICAL_LEVELS)),
+            count.filter(Asset.risk_score >= AT_RISK_SCORE),
+            count.filter(Asset.updated_at >= yesterday),
+        )
+        .outerjoin(Site, Site.id == Asset.site_id)
+        .outerjoin(AssetStatus, AssetStatus.id == Asset.status_id)
+        .filter(and_(Asset.tenant_id == tenant_id, Asset.deleted_at == None))
+        .group_by(
+            Asset.site_id, Site.name, Asset.status_id, AssetStatus.name, Asset.asset_type_id
+        )
+    )
+    if site_id:
+        query = query.filter(Asset.site_id == site_id)
+
+    totals = {
+        "total_assets": 0,
+        "critical_assets": 0,
+        "assets_at_risk": 0,
+        "recent_changes": 0,
+        "active_assets": 0,
+    }
+    by_status, by_type, by_site = {}, {}, {}
+    for (
+        row_site_id,
+        site_name,
+        status_id,
+        status_name,
+        type_id,
+        total,
+        critical,
+        at_risk,
+        recent,
+    ) in query.all():
+        totals["total_assets"] += total
+        totals["critical_assets"] += critical
+        totals["assets_at_risk"] += at_risk
+        totals["recent_changes"] += recent
+        if status_name == "Active":
+            totals["active_assets"] += total
+        by_status[status_id] = by_status.get(status_id, 0) + total
+        by_type[type_id] = by_type.get(type_id, 0) + total
+        site = by_site.setdefault(
+            row_site_id,
+            {"site_id": str(row_site_id), "name": site_name, "asset_count": 0},
+        )
+        site["asset_count"] += total
+
+    totals["inactive_assets"] = totals["total_assets"] - totals["active_assets"]
+    return {
+        **totals,
+        "by_status": by_status,
+        "by_type": by_type,
+        "site_stats": sorted(by_site.values(), key=lambda s: s["name"] or ""),
+    }
+
+
+def rollup_dashboard_counters(db: Session, tenant_id: uuid.UUID) -> dict:
+    """
+    Dashboard counters read from the tenant_asset_stats rollup, so the cost
+    does not depend on the inventory size. Only recent_changes is counted
+    live, through the (tenant_id, updated_at) index.
+    """
+    rollup = read_tenant_asset_stats(db, tenant_id)
+    by_status = {uuid.UUID(k): v for k, v in rollup.get("status", {}).items() if k != "None"}
+    active_status_ids = {
+        s.id
+        for s in db.query(AssetStatus.id)
+        .filter(AssetStatus.id.in_(by_status.keys()), AssetStatus.name == "Active")
+        .all()
+    }
+    site_counts = {uuid.UUID(k): v for k, v in rollup.get("site", {}).items() if k != "None"}
+    site_names = dict(
+        db.query(Site.id, Site.name).filter(Site.id.in_(site_counts.keys())).all()
+    )
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    recent_changes = (
+        db.query(func.count(Asset.id))
+        .filter(
+            Asset.tenant_id == tenant_id,
+            Asset.updated_at >= yesterday,
+            Asset.deleted_at == None,
+        )
+        .scalar()
+    )
+
+    total = rollup["total"]["all"]
+    active = sum(v for k, v in by_status.items() if k in active_status_ids)
+    return {
+        "total_assets": total,
+        "critical_assets": sum(rollup.get("criticality", {}).get(c, 0) for c in CRITICAL_LEVELS),
+        "assets_at_risk": sum(
+            v for k, v in rollup.get("risk_band", {}).items()
+            if k != "none" and int(k) >= AT_RISK_SCORE
+        ),
+        "recent_changes": recent_changes,
+        "active_assets": active,
+        "inactive_assets": total - active,
+        "by_status": by_status,
+        "by_type": {uuid.UUID(k): v for k, v in rollup.get("type", {}).items() if k != "None"},
+        "by_criticality": rollup.get("criticality", {}),
+        "site_stats": sorted(
+            (
+                {"site_id": str(k), "name": site_names.get(k), "asset_count": v}
+                for k, v in site_counts.items()
+            ),
+            key=lambda s: s["name"] or "",
+        ),
+    }
+
+
+def build_dashboard_stats(
+    db: Session, tenant_id: uuid.UUID, site_id: Optional[uuid.UUID] = None
+) -> dict:
+    """
+    Shape counters into the /dashboard/stats response. Tenant-wide stats come
+    from the rollup; a site breakdown falls back to the live aggregate query.
+    """
+    if site_id:
+        stats = aggregate_asset_stats(db, tenant_id, site_id)
+    else:
+        stats = rollup_dashboard_counters(db, tenant_id)
+
+    statuses = db.query(AssetStatus).filter(AssetStatus.tenant_id == tenant_id).all()
+    asset_types = db.query(AssetType).filter(AssetType.tenant_id == tenant_id).all()
+
+    return {
+        "total_assets": stats["total_assets"],
+        "critical_assets": stats["critical_assets"],
+        "assets_at_risk": stats["assets_at_risk"],
+        "recent_changes": stats["recent_changes"],
+        "active_assets": stats["active_assets"],
+        "inactive_assets": stats["inactive_assets"],
+        "status_stats": [
+            {
+                "status_id": str(status.id),
+                "name": status.name,
+                "color": status.color,
+                "count": stats["by_status"].get(status.id, 0),
+            }
+            for status in statuses
+        ],
+        "type_stats": [
+            {
+                "type_id": str(asset_type.id),
+                "name": asset_type.name,
+                "asset_count": stats["by_type"].get(asset_type.id, 0),
+            }
+            for asset_type in asset_types
+        ],
+        "site_stats": stats["site_stats"],
+    }
+
+
+# --- tenant_asset_stats rollup ---
+
+
+def risk_band(score: Optional[float]) -> str:
+    """Integer bucket 0-10 of a risk score ("none" if not calculated)"""
+    if score is None:
+        return "none"
+    return str(max(0, min(10, int(score))))
+
+
+def _stat_keys(values: dict) -> list:
+    """Rollup rows an asset contributes to (none if it is in the trash)"""
+    if values["deleted_at"] is not None:
+        return []
+    criticality = values["business_criticality"]
+    return [
+        ("total", "all"),
+        ("site", str(values["site_id"])),
+        ("status", str(values["status_id"])),
+        ("type", str(values["asset_type_id"])),
+        ("criticality", str(criticality).lower()[:64] if criticality else "none"),
+        ("risk_band", risk_band(values["risk_score"])),
+    ]
+
+
+def _column_default(field: str):
+    default = Asset.__table__.c[field].default
+    return default.arg if default is not None and default.is_scalar else None
+
+
+def _current_values(asset: Asset, pending: bool) -> dict:
+    values = {}
+    for field in TRACKED_FIELDS:
+        value = getattr(asset, field)
+        if value is None and pending:
+            value = _column_default(field)
+        values[field] = value
+    return values
+
+
+def _committed_values(asset: Asset) -> dict:
+    state = inspect(asset)
+    values = {}
+    for field in TRACKED_FIELDS:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.added:
+            values[field] = None
+        else:
+            values[field] = getattr(asset, field)
+    return values
+
+
+def _add_delta(delta: Counter, values: dict, sign: int):
+    for dimension, key in _stat_keys(values):
+        delta[(values["tenant_id"], dimension, key)] += sign
+
+
+def add_asset_update_delta(delta: Counter, old: dict, new: dict):
+    """
+    Move an asset updated by a bulk statement from the rollup rows of its
+    old TRACKED_FIELDS values to those of the new ones.
+    """
+    _add_delta(delta, old, -1)
+    _add_delta(delta, new, 1)
+
+
+def _collect_asset_stats_delta(session, flush_context, instances):
+    delta = session.info.setdefault("asset_stats_delta", Counter())
+    for obj in session.new:
+        if isinstance(obj, Asset):
+            _add_delta(delta, _current_values(obj, pending=True), 1)
+    for obj in session.dirty:
+        if isinstance(obj, Asset) and session.is_modified(obj, include_collections=False):
+            _add_delta(delta, _committed_values(obj), -1)
+            _add_delta(delta, _current_values(obj, pending=False), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Asset):
+            _add_delta(delta, _committed_values(obj), -1)
+
+
+def _write_asset_stats_delta(session, flush_context):
+    delta = session.info.pop("asset_stats_delta", None)
+    if delta:
+        apply_asset_stats_delta(session.connection(), delta)
+
+
+def _lock_tenant_asset_stats(connection, tenant_ids, shared: bool) -> None:
+    """
+    Transaction-level advisory lock on the rollup of tenant_ids (sorted, so
+    concurrent writers take them in the same order)
+    """
+    lock = func.pg_advisory_xact_lock_shared if shared else func.pg_advisory_xact_lock
+    connection.execute(
+        select(
+            *(
+                lock(ASSET_STATS_LOCK_CLASS, func.hashtext(str(tenant_id)))
+                for tenant_id in sorted(tenant_ids, key=str)
+            )
+        )
+    )
+
+
+def apply_asset_stats_delta(connection, delta: Counter):
+    """
+    Add the (tenant_id, dimension, key) -> count delta to the rollup.
+    Tenants whose rollup was never built are skipped: their first read
+    reconciles them from scratch. The shared tenant lock, held until the
+    transaction ends, keeps a reconcile from running before the assets
+    behind the delta are committed.
+    """
+    rows = [
+        (tenant_id, dimension, key, count)
+        for (tenant_id, dimension, key), count in delta.items()
+        if count and tenant_id is not None
+    ]
+    if not rows:
+        return
+    _lock_tenant_asset_stats(connection, {tenant_id for tenant_id, *_ in rows}, shared=True)
+    table = TenantAssetStat.__table__
+    delta_rows = values(
+        column("tenant_id", UUID(as_uuid=True)),
+        column("dimension", String),
+        column("key", String),
+        column("asset_count", Integer),
+        name="delta",
+    ).data(rows)
+    initialized = (
+        select(table.c.tenant_id)
+        .where(table.c.tenant_id == delta_rows.c.tenant_id, table.c.dimension == "total")
+        .exists()
+    )
+    stmt = pg_insert(table).from_select(
+        ["tenant_id", "dimension", "key", "asset_count"],
+        select(delta_rows).where(initialized),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tenant_id", "dimension", "key"],
+        set_={
+            "asset_count": table.c.asset_count + stmt.excluded.asset_count,
+            "updated_at": func.now(),
+        },
+    )
+    connection.execute(stmt)
+
+
+_listeners_registered = False
+
+
+def register_asset_stats_listeners():
+    """
+    Keep tenant_asset_stats current from every ORM flush that creates,
+    updates, soft-deletes, restores or deletes assets. Bulk statements that
+    bypass the ORM must call apply_asset_stats_delta themselves.
+    """
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    # Load the previous value on assignment, so that the delta is exact
+    # even for attributes expired by a commit
+    for field in TRACKED_FIELDS:
+        event.listen(getattr(Asset, field), "set", lambda *args: None, active_history=True)
+    event.listen(Session, "before_flush", _collect_asset_stats_delta)
+    event.listen(Session, "after_flush", _write_asset_stats_delta)
+    event.listen(Session, "after_rollback", lambda session: session.info.pop("asset_stats_delta", None))
+    _listeners_registered = True
+
+
+def reconcile_tenant_asset_stats(db: Session, tenant_id: uuid.UUID) -> int:
+    """
+    Rebuild the rollup of a tenant from the assets table. Return the asset
+    total. The exclusive tenant lock waits for the transactions that applied
+    a delta, and delays new deltas until the rebuilt rollup is committed.
+    """
+    _lock_tenant_asset_stats(db.connection(), [tenant_id], shared=False)
+    groups = (
+        db.query(
+            Asset.site_id,
+            Asset.status_id,
+            Asset.asset_type_id,
+            Asset.business_criticality,
+            func.floor(Asset.risk_score),
+            func.count(Asset.id),
+        )
+        .filter(Asset.tenant_id == tenant_id, Asset.deleted_at == None)
+        .group_by(
+            Asset.site_id,
+            Asset.status_id,
+            Asset.asset_type_id,
+            Asset.business_criticality,
+            func.floor(Asset.risk_score),
+        )
+        .all()
+    )
+    delta = Counter({(tenant_id, "total", "all"): 0})
+    for site_id, status_id, asset_type_id, criticality, score, count in groups:
+        values = {
+            "tenant_id": tenant_id,
+            "site_id": site_id,
+            "status_id": status_id,
+            "asset_type_id": asset_type_id,
+            "business_criticality": criticality,
+            "risk_score": score,
+            "deleted_at": None,
+        }
+        _add_delta(delta, values, count)
+
+    db.query(TenantAssetStat).filter(TenantAssetStat.tenant_id == tenant_id).delete(
+        synchronize_session=False
+    )
+    db.bulk_insert_mappings(
+        TenantAssetStat,
+        [
+            {"tenant_id": t, "dimension": dimension, "key": key, "asset_count": count}
+            for (t, dimension, key), count in delta.items()
+        ],
+    )
+    db.commit()
+    return delta[(tenant_id, "total", "all")]
+
+
+def read_tenant_asset_stats(db: Session, tenant_id: uuid.UUID) -> dict:
+    """Rollup of a tenant as {dimension: {key: count}}, reconciling it if missing"""
+    rows = (
+        db.query(TenantAssetStat.dimension, TenantAssetStat.key, TenantAssetStat.asset_count)
+        .filter(TenantAssetStat.tenant_id == tenant_id)
+        .all()
+    )
+    if not any(dimension == "total" for dimension, _, _ in rows):
+        reconcile_tenant_asset_stats(db, tenant_id)
+        return read_tenant_asset_stats(db, tenant_id)
+    stats = {}
+    for dimension, key, count in rows:
+        if count:
+            stats.setdefault(dimension, {})[key] = count
+    stats.setdefault("total", {}).setdefault("all", 0)
+    return stats
+
+
+def reconcile_all_asset_stats(session_factory):
+    """Full reconcile of every tenant, each in its own session"""
+    db = session_factory()
+    try:
+        tenant_ids = [t.id for t in db.query(Tenant.id).all()]
+    finally:
+        db.close()
+    for tenant_id in tenant_ids:
+        db = session_factory()
+        try:
+            reconcile_tenant_asset_stats(db, tenant_id)
+        except Exception:
+            db.rollback()
+            logger.exception("Asset stats reconcile failed for tenant %s", tenant_id)
+        finally:
+            db.close()
+
+
+def start_asset_stats_reconciler(session_factory, interval_seconds: int):
+    """Run reconcile_all_asset_stats every interval_seconds in a daemon thread"""
+    if interval_seconds <= 0:
+        return None
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(interval_seconds):
+            reconcile_all_asset_stats(session_factory)
+
+    thread = threading.Thread(target=_loop, name="asset-stats-reconciler", daemon=True)
+    thread.start()
+    return stop
@@ -1,31 +1,52 @@
 # backend/services/asset_sync.py
 
+import logging
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.models import Asset, AssetType, AssetCommunication
 from uuid import UUID
-from app.services.oui_lookup import load_oui_map
+from app.services.oui_lookup import get_vendor_from_mac
 from app.models.asset_interface import AssetInterface
-from app.crud.asset_interface import create_interface
-from app.schemas.asset_interface import AssetInterfaceCreate
 from app.models.manufacturer import Manufacturer
-from app.crud.manufacturers import create_manufacturer
-from app.schemas.manufacturer import ManufacturerCreate
 from app.models.asset_status import AssetStatus
+from app.services.risk_scoring import mark_assets_risk_dirty
 
-OUI_MAP = load_oui_map()
-
-
-def get_vendor_from_mac(mac: str) -> str:
-    prefix = mac.replace(":", "").replace("-", "")[:6].upper()
-    return OUI_MAP.get(prefix, "Unknown Vendor")
+logger = logging.getLogger(__name__)
 
 
-def sync_assets(session: Session, devices: dict, tenant_id: UUID, site_id: UUID):
+def sync_assets(
+    session: Session,
+    devices: dict,
+    tenant_id: UUID,
+    site_id: UUID,
+    timings: Optional[dict] = None,
+    merge_protocols: bool = False,
+    commit: bool = True,
+):
     """
     Sync assets from devices dict (key=mac) to DB.
-    Update or create Asset.
+    Update or create Asset, set-based: interfaces, assets and manufacturers
+    are prefetched with a few IN queries, new rows are inserted in bulk and
+    everything is committed in a single transaction (only flushed if not
+    commit, for callers writing more in the same transaction).
+    Per-phase durations (seconds) are stored in timings, if given.
+    With merge_protocols the protocols of existing assets are extended
+    instead of replaced (live flows only carry those of the last window).
     """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+
+    def lap(phase):
+        nonlocal started
+        now = time.perf_counter()
+        timings[phase] = round(now - started, 4)
+        started = now
+
     # Retrieve or create AssetType for network devices
     asset_type = (
         session.query(AssetType).filter(AssetType.name == "Network Device").first()
@@ -33,207 +54,264 @@ def sync_assets(session: Session, devices: dict, tenant_id: UUID, site_id: UUID)
     if not asset_type:
         asset_type = AssetType(name="Network Device")
         session.add(asset_type)
-        session.commit()
-
-    created_assets = []
-    updated_assets = []
+        session.flush()
+    # Retrieve the 'Active' status if it exists, otherwise the first available
+    status_active = (
+        session.query(AssetStatus).filter(AssetStatus.name == "Attivo").first()
+    )
+    if not status_active:
+        status_active = session.query(AssetStatus).first()
+    status_id = status_active.id if status_active else None
 
-    for mac, data in devices.items():
-        # Search interface with that MAC
-        iface = (
-            session.query(AssetInterface)
-            .filter(AssetInterface.mac_address == mac)
-            .first()
+    # --- Prefetch ---
+    macs = list(devices)
+    first_ips = {
+        mac: data["ips"][0] for mac, data in devices.items() if data["ips"]
+    }
+    mac_to_iface = {}
+    for iface in (
+        session.query(AssetInterface)
+        .filter(AssetInterface.tenant_id == tenant_id, AssetInterface.mac_address.in_(macs))
+        .all()
+    ):
+        mac_to_iface.setdefault(iface.mac_address, iface)
+    ip_to_ifaces = {}
+    for iface in (
+        session.query(AssetInterface)
+        .filter(
+            AssetInterface.tenant_id == tenant_id,
+            AssetInterface.ip_address.in_(set(first_ips.values())),
         )
-        asset = None
+        .all()
+    ):
+        ip_to_ifaces.setdefault(iface.ip_address, []).append(iface)
+
+    # Interface matching each device: by MAC, else by IP (only if there is
+    # a single match; with more than one, nothing is associated)
+    matched_iface = {}
+    for mac in macs:
+        iface = mac_to_iface.get(mac)
+        if not iface:
+            ifaces_by_ip = ip_to_ifaces.get(first_ips.get(mac), [])
+            iface = ifaces_by_ip[0] if len(ifaces_by_ip) == 1 else None
         if iface:
-            asset = session.query(Asset).filter(Asset.id == iface.asset_id).first()
-        else:
-            # If not found, search by IP (only if there is a single match)
-            ip = data["ips"][0] if data["ips"] else None
-            iface_by_ip = None
-            if ip:
-                interfaces_by_ip = (
-                    session.query(AssetInterface)
-                    .filter(AssetInterface.ip_address == ip)
-                    .all()
-                )
-                if len(interfaces_by_ip) == 1:
-                    iface_by_ip = interfaces_by_ip[0]
-                    asset = (
-                        session.query(Asset)
-                        .filter(Asset.id == iface_by_ip.asset_id)
-                        .first()
-                    )
-                # If more than one interface with that IP, don't associate anything (asset remains None)
+            matched_iface[mac] = iface
+    assets_by_id = {
+        asset.id: asset
+        for asset in session.query(Asset)
+        .filter(Asset.id.in_({iface.asset_id for iface in matched_iface.values()}))
+        .all()
+    }
 
-        vendor = get_vendor_from_mac(mac)
-        protocols_list = list(data["protocols"])
+    vendors = {mac: get_vendor_from_mac(mac) for mac in macs}
+    manufacturer_ids = _ensure_manufacturers(session, set(vendors.values()), tenant_id)
+    lap("prefetch")
 
-        # Search or create manufacturer
-        manufacturer = (
-            session.query(Manufacturer)
-            .filter(Manufacturer.name == vendor, Manufacturer.tenant_id == tenant_id)
-            .first()
-        )
-        if not manufacturer:
-            manufacturer_in = ManufacturerCreate(name=vendor, description=None)
-            manufacturer = create_manufacturer(session, manufacturer_in, tenant_id)
+    # --- Update existing assets ---
+    created_assets = []
+    updated_assets = []
+    new_interfaces = []
+    for mac, data in devices.items():
+        vendor = vendors[mac]
+        protocols_list = list(data["protocols"])
+        iface = matched_iface.get(mac)
+        asset = assets_by_id.get(iface.asset_id) if iface else None
 
         if asset:
+            if merge_protocols:
+                protocols_list = sorted(set(asset.protocols or []) | set(protocols_list))
             # update fields if necessary
             asset.site_id = site_id
-            asset.custom_fields["mac_address"] = mac
-            asset.custom_fields["vendor"] = vendor
+            asset.custom_fields = {
+                **(asset.custom_fields or {}),
+                "mac_address": mac,
+                "vendor": vendor,
+            }
             asset.protocols = protocols_list
-            asset.manufacturer_id = manufacturer.id
-            
+            asset.manufacturer_id = manufacturer_ids.get(vendor)
             # Aggiorna i protocolli dell'interfaccia corrispondente
-            if iface:
-                iface.protocols = protocols_list
-            elif iface_by_ip:
-                iface_by_ip.protocols = protocols_list
-                
+            iface.protocols = protocols_list
             updated_assets.append(asset)
         else:
-            # Retrieve the 'Active' status if it exists, otherwise the first available
-            status_active = (
-                session.query(AssetStatus).filter(AssetStatus.name == "Attivo").first()
-            )
-            if not status_active:
-                status_active = session.query(AssetStatus).first()
-            status_id = status_active.id if status_active else None
-            asset_name = (
-                f"imported - {data['ips'][0]}" if data["ips"] else "imported - unknown"
-            )
+            ip = first_ips.get(mac)
             new_asset = Asset(
+                id=uuid.uuid4(),
                 tenant_id=tenant_id,
                 site_id=site_id,
                 asset_type_id=asset_type.id,
-                name=asset_name,
+                name=f"imported - {ip}" if ip else "imported - unknown",
                 custom_fields={"mac_address": mac, "vendor": vendor},
                 status_id=status_id,
-                manufacturer_id=manufacturer.id,
+                manufacturer_id=manufacturer_ids.get(vendor),
                 protocols=protocols_list,
             )
-            session.add(new_asset)
-            session.commit()  # To get the ID
+            created_assets.append(new_asset)
             # Create the associated interface immediately
-            ip = data["ips"][0] if data["ips"] else None
             if ip:
-                new_interface = AssetInterface(
-                    asset_id=new_asset.id,
-                    tenant_id=tenant_id,
-                    name=f"eth0",
-                    type="ethernet",
-                    ip_address=ip,
-                    mac_address=mac,
-                    protocols=protocols_list,  # Associa i protocolli all'interfaccia
+                new_interfaces.append(
+                    AssetInterface(
+                        asset_id=new_asset.id,
+                        tenant_id=tenant_id,
+                        name="eth0",
+                        type="ethernet",
+                        ip_address=ip,
+                        mac_address=mac,
+                        protocols=protocols_list,  # Associa i protocolli all'interfaccia
+                    )
                 )
-                session.add(new_interface)
-            session.commit()
-            created_assets.append(new_asset)
+    session.flush()
+    lap("update")
 
+    # --- Bulk insert new assets and interfaces ---
+    # Primary keys are assigned here, so the ORM batches the INSERTs
+    # (and the asset stats / risk flush hooks still see every row)
+    session.add_all(created_assets)
+    session.flush()
+    session.add_all(new_interfaces)
+    session.flush()
+    lap("insert")
+
+    if commit:
+        session.commit()
+        lap("commit")
+    logger.info(
+        "PCAP asset sync: %d created, %d updated, timings %s",
+        len(created_assets),
+        len(updated_assets),
+        timings,
+    )
     return created_assets, updated_assets
 
 
+def _ensure_manufacturers(session: Session, names: set, tenant_id: UUID) -> dict:
+    """
+    Manufacturer id by name for the tenant, inserting the missing ones in
+    one statement. Manufacturer names are globally unique: a name already
+    used by another tenant is skipped (no manufacturer for those assets).
+    """
+    existing = dict(
+        session.query(Manufacturer.name, Manufacturer.id)
+        .filter(Manufacturer.tenant_id == tenant_id, Manufacturer.name.in_(names))
+        .all()
+    )
+    missing = names - existing.keys()
+    if missing:
+        inserted = session.execute(
+            pg_insert(Manufacturer)
+            .values([{"id": uuid.uuid4(), "name": name, "tenant_id": tenant_id} for name in missing])
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(Manufacturer.name, Manufacturer.id)
+        )
+        existing.update(dict(inserted.all()))
+    return existing
+
+
+COMMUNICATION_KEY = ("tenant_id", "site_id", "src_interface_id", "dst_interface_id")
+
+
 def sync_communications(
-    session: Session, communications: dict, tenant_id: UUID, site_id: UUID
+    session: Session,
+    communications: dict,
+    tenant_id: UUID,
+    site_id: UUID,
+    accumulate: bool = False,
+    commit: bool = True,
 ):
     """
     Sync communications between assets, based on the dict
     communications[src_mac][dst_mac] = count packets
-    Now works at interface level: src_interface_id, dst_interface_id
+    Now works at interface level: src_interface_id, dst_interface_id.
+    Missing interfaces are created in one batch, and the communications are
+    written with INSERT ... ON CONFLICT DO UPDATE on the communication key:
+    packet_count is overwritten, or summed to the stored one if accumulate.
+    Commits, unless commit is False.
     """
-    # First retrieve all assets involved by MAC address
-    mac_to_asset = {}
     macs = list(
         set(communications.keys())
         | set(dst for src in communications for dst in communications[src])
     )
 
-    assets = (
-        session.query(Asset)
-        .filter(Asset.custom_fields["mac_address"].astext.in_(macs))
-        .all()
-    )
-    for asset in assets:
-        mac = asset.custom_fields.get("mac_address")
-        if mac:
-            mac_to_asset[mac] = asset
-
     # Retrieve all interfaces involved by MAC address
     mac_to_interface = {}
-    interfaces = (
-        session.query(AssetInterface).filter(AssetInterface.mac_address.in_(macs)).all()
-    )
-    for iface in interfaces:
-        mac_to_interface[iface.mac_address] = iface
+    for iface in (
+        session.query(AssetInterface)
+        .filter(AssetInterface.tenant_id == tenant_id, AssetInterface.mac_address.in_(macs))
+        .all()
+    ):
+        mac_to_interface.setdefault(iface.mac_address, iface)
 
-    # Iterate communications
-    for src_mac, dsts in communications.items():
-        # Search or create source interface
-        src_iface = mac_to_interface.get(src_mac)
-        if not src_iface:
-            src_asset = mac_to_asset.get(src_mac)
-            if src_asset:
-                src_iface_data = AssetInterfaceCreate(
-                    asset_id=src_asset.id,
+    # Assets (by MAC address) of the MACs without an interface
+    missing_macs = [mac for mac in macs if mac not in mac_to_interface]
+    new_interfaces = []
+    if missing_macs:
+        for asset in (
+            session.query(Asset)
+            .filter(
+                Asset.tenant_id == tenant_id,
+                Asset.custom_fields["mac_address"].astext.in_(missing_macs),
+            )
+            .all()
+        ):
+            mac = asset.custom_fields.get("mac_address")
+            if mac and mac not in mac_to_interface:
+                iface = AssetInterface(
+                    id=uuid.uuid4(),
+                    asset_id=asset.id,
                     tenant_id=tenant_id,
                     name="Auto-imported",
                     type="ethernet",
-                    mac_address=src_mac,
-                    vlan=None,
-                    logical_port=None,
-                    physical_plug_label=None,
+                    mac_address=mac,
                 )
-                src_iface = create_interface(session, src_iface_data)
-                mac_to_interface[src_mac] = src_iface
-            else:
-                continue  # Can't create interface without asset
+                mac_to_interface[mac] = iface
+                new_interfaces.append(iface)
+        session.add_all(new_interfaces)
+        session.flush()
+
+    # Communication rows, skipping MACs without asset
+    packet_counts = {}
+    for src_mac, dsts in communications.items():
+        src_iface = mac_to_interface.get(src_mac)
+        if not src_iface:
+            continue  # Can't create interface without asset
         for dst_mac, count in dsts.items():
-            # Search or create destination interface
             dst_iface = mac_to_interface.get(dst_mac)
             if not dst_iface:
-                dst_asset = mac_to_asset.get(dst_mac)
-                if dst_asset:
-                    dst_iface_data = AssetInterfaceCreate(
-                        asset_id=dst_asset.id,
-                        tenant_id=tenant_id,
-                        name="Auto-imported",
-                        type="ethernet",
-                        mac_address=dst_mac,
-                        vlan=None,
-                        logical_port=None,
-                        physical_plug_label=None,
-                    )
-                    dst_iface = create_interface(session, dst_iface_data)
-                    mac_to_interface[dst_mac] = dst_iface
-                else:
-                    continue  # Can't create interface without asset
-
-            # Search existing record
-            comm = (
-                session.query(AssetCommunication)
-                .filter_by(
-                    src_interface_id=src_iface.id,
-                    dst_interface_id=dst_iface.id,
-                    tenant_id=tenant_id,
-                    site_id=site_id,
-                )
-                .first()
-            )
+                continue
+            key = (src_iface.id, dst_iface.id)
+            packet_counts[key] = packet_counts.get(key, 0) + count
 
-            if comm:
-                comm.packet_count = count  # or += count if you want to accumulate
-            else:
-                comm = AssetCommunication(
-                    src_interface_id=src_iface.id,
-                    dst_interface_id=dst_iface.id,
-                    packet_count=count,
-                    tenant_id=tenant_id,
-                    site_id=site_id,
-                )
-                session.add(comm)
+    if packet_counts:
+        stmt = pg_insert(AssetCommunication)
+        packet_count = (
+            AssetCommunication.packet_count + stmt.excluded.packet_count
+            if accumulate
+            else stmt.excluded.packet_count
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(COMMUNICATION_KEY),
+            set_={"packet_count": packet_count},
+        )
+        # executemany: batched into multi-row INSERTs by the driver
+        session.execute(
+            stmt,
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "tenant_id": tenant_id,
+                    "site_id": site_id,
+                    "src_interface_id": src_id,
+                    "dst_interface_id": dst_id,
+                    "packet_count": count,
+                }
+                for (src_id, dst_id), count in packet_counts.items()
+            ],
+        )
+        # Bypasses the ORM flush hooks: rescore the assets that communicate
+        linked = {iface_id for key in packet_counts for iface_id in key}
+        mark_assets_risk_dirty(
+            session.connection(),
+            {iface.asset_id for iface in mac_to_interface.values() if iface.id in linked},
+        )
 
-    session.commit()
+    if commit:
+        session.commit()
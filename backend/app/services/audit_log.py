@@ -1,8 +1,9 @@
 # backend/services/audit_log.py
 import json
 from app.models.audit_log import AuditLog
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 import uuid
 import datetime
 
@@ -268,6 +269,25 @@ def create_readable_description(
         )
 
 
+def serialize(data):
+    """old_data/new_data of an audit row, as JSON text"""
+    if data is None:
+        return None
+
+    def default(o):
+        return str(o)
+
+    try:
+        if isinstance(data, dict):
+            return json.dumps(data, indent=2, default=default)
+        if hasattr(data, "__dict__"):
+            clean = clean_dict(data.__dict__)
+            return json.dumps(clean, indent=2, default=default)
+        return json.dumps(str(data), indent=2, default=default)
+    except Exception:
+        return str(data)
+
+
 def create_audit_log(
     db: Session,
     user_id: uuid.UUID,
@@ -282,28 +302,6 @@ def create_audit_log(
     commit: bool = True,  # Commit di default a True per sicurezza
     language: str = "en",  # Nuovo parametro lingua
 ):
-
-    def serialize(data):
-        import datetime
-
-        if data is None:
-            return None
-
-        def default(o):
-            if isinstance(o, (uuid.UUID, datetime.datetime, datetime.date)):
-                return str(o)
-            return str(o)
-
-        try:
-            if isinstance(data, dict):
-                return json.dumps(data, indent=2, default=default)
-            if hasattr(data, "__dict__"):
-                clean = clean_dict(data.__dict__)
-                return json.dumps(clean, indent=2, default=default)
-            return json.dumps(str(data), indent=2, default=default)
-        except Exception:
-            return str(data)
-
             # Translate IDs in data to make them more readable
     old_data_with_names = translate_ids_in_data(db, old_data, tenant_id)
     new_data_with_names = translate_ids_in_data(db, new_data, tenant_id)
@@ -339,3 +337,49 @@ def create_audit_log(
     if commit:
         db.commit()
     return audit_entry
+
+
+def create_audit_logs(
+    db: Session,
+    user_id: uuid.UUID,
+    tenant_id: uuid.UUID,
+    action: str,
+    entity: str,
+    entries: List[dict],
+    ip_address: Optional[str] = None,
+):
+    """
+    Audit rows of a bulk operation in one multi-row INSERT (no commit).
+    entries: dicts with entity_id, old_data, new_data and description. The
+    ids in the data are translated as by create_audit_log, once per distinct
+    value instead of once per row.
+    """
+    if not entries:
+        return
+    translated = {}
+
+    def with_names(data):
+        if not data:
+            return data
+        key = serialize(data)
+        if key not in translated:
+            translated[key] = translate_ids_in_data(db, data, tenant_id)
+        return translated[key]
+
+    db.execute(
+        insert(AuditLog),
+        [
+            {
+                "user_id": user_id,
+                "tenant_id": tenant_id,
+                "action": action,
+                "entity": entity,
+                "entity_id": entry["entity_id"],
+                "old_data": serialize(with_names(entry.get("old_data"))),
+                "new_data": serialize(with_names(entry.get("new_data"))),
+                "description": (entry.get("description") or "")[:255] or None,
+                "ip_address": ip_address,
+            }
+            for entry in entries
+        ],
+    )
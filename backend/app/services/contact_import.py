@@ -0,0 +1,94 @@
+# backend/services/contact_import.py
+"""XLSX/CSV contact import, an ImportTarget of services/import_engine.py"""
+
+from typing import List, Tuple
+
+from sqlalchemy import tuple_
+
+from app.models import Contact
+from app.services.import_engine import ImportColumn, ImportRow, ImportSchema, ImportTarget
+
+CONTACT_SCHEMA = ImportSchema(
+    [
+        ImportColumn("first_name", required=True),
+        ImportColumn("last_name", required=True),
+        ImportColumn("email"),
+        ImportColumn("phone1"),
+        ImportColumn("phone2"),
+        ImportColumn("type"),
+        ImportColumn("notes"),
+    ]
+)
+# Fields written on the contact matched by first and last name
+UPDATE_FIELDS = ("phone1", "phone2", "type", "notes")
+
+
+def _label(values: dict) -> str:
+    email = f" <{values['email']}>" if values["email"] else ""
+    return f"{values['first_name']} {values['last_name']}{email}"
+
+
+class ContactImport(ImportTarget):
+    """Contacts created, or updated when first and last name match"""
+
+    kind = "contacts"
+    schema = CONTACT_SCHEMA
+
+    def _contacts_by_name(self, rows: List[ImportRow]) -> dict:
+        by_name = {}
+        names = {(row.values["first_name"], row.values["last_name"]) for row in rows}
+        for contact in (
+            self.db.query(Contact)
+            .filter(
+                Contact.tenant_id == self.tenant_id,
+                tuple_(Contact.first_name, Contact.last_name).in_(names),
+            )
+            .all()
+        ):
+            by_name.setdefault((contact.first_name, contact.last_name), contact)
+        return by_name
+
+    def preview(self, rows: List[ImportRow]) -> Tuple[list, list]:
+        by_name = self._contacts_by_name(rows)
+        to_create, to_update = [], []
+        for row in rows:
+            values = row.values
+            contact = by_name.get((values["first_name"], values["last_name"]))
+            if contact is None:
+                to_create.append(values)
+                continue
+            diff = {}
+            for field in UPDATE_FIELDS:
+                old = getattr(contact, field)
+                if str(old) != str(values[field]):
+                    diff[field] = {"old": old, "new": values[field]}
+            if diff:
+                to_update.append(
+                    {
+                        "first_name": values["first_name"],
+                        "last_name": values["last_name"],
+                        "email": values["email"],
+                        "diff": diff,
+                    }
+                )
+        return to_create, to_update
+
+    def write(self, rows: List[ImportRow]) -> Tuple[list, list, list]:
+        by_name = self._contacts_by_name(rows)
+        created, updated = [], []
+        new_contacts = []
+        for row in rows:
+            values = row.values
+            key = (values["first_name"], values["last_name"])
+            contact = by_name.get(key)
+            if contact is not None:
+                for field in UPDATE_FIELDS:
+                    setattr(contact, field, values[field])
+                updated.append(_label(values))
+            else:
+                by_name[key] = Contact(**values, tenant_id=self.tenant_id)
+                new_contacts.append(by_name[key])
+                created.append(_label(values))
+        self.db.add_all(new_contacts)
+        self.db.flush()
+        return created, updated, []
@@ -0,0 +1,243 @@
+# backend/services/flow_ingest.py
+"""
+Live flow ingestion for passive monitoring sensors.
+
+Sensors post line-delimited JSON flow records; they are folded in memory
+into the same (src MAC, dst MAC, src IP, protocol) -> packets aggregate
+used by the PCAP import, per tenant and site. Every window the aggregate
+is swapped out and written through sync_assets / sync_communications
+(accumulating packet counts) and Asset.last_seen is refreshed, in one
+transaction per site. A window whose transaction fails is merged back
+into the current one and retried at the next flush.
+"""
+
+import ipaddress
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+import uuid
+
+from sqlalchemy import DateTime, String, column, update, values
+from sqlalchemy.orm import Session
+
+from app.models import Asset, AssetInterface
+from app.services.asset_sync import sync_assets, sync_communications
+from app.services.pcap_parser import normalize_protocol, tenant_protocol_normalizer
+
+logger = logging.getLogger(__name__)
+
+_MAC_DIGITS = re.compile(r"^[0-9A-F]{12}$")
+LAST_SEEN_BATCH_SIZE = 5000
+
+
+def _normalize_mac(value, cache: dict) -> Optional[str]:
+    """'00:1b:1b:00:00:01', '00-1B-1B-00-00-01', '001b1b000001' -> '00:1B:1B:00:00:01'"""
+    mac = cache.get(value)
+    if mac is None and value not in cache:
+        digits = str(value).upper().replace(":", "").replace("-", "").replace(".", "")
+        mac = ":".join(digits[i : i + 2] for i in range(0, 12, 2)) if _MAC_DIGITS.match(digits) else None
+        cache[value] = mac
+    return mac
+
+
+def _normalize_ip(value, cache: dict) -> Optional[str]:
+    ip = cache.get(value)
+    if ip is None and value not in cache:
+        try:
+            ip = str(ipaddress.ip_address(value)) if value else None
+        except ValueError:
+            ip = None
+        cache[value] = ip
+    return ip
+
+
+class _Window:
+    """Aggregate of one tenant/site since the last flush"""
+
+    __slots__ = ("flows", "last_seen")
+
+    def __init__(self):
+        self.flows: Counter = Counter()
+        self.last_seen: Dict[str, datetime] = {}
+
+
+class FlowAggregator:
+    """
+    In-memory, thread-safe aggregate of flow records, one window per
+    (tenant, site). add_lines() is the hot path: one json.loads and a
+    Counter increment per record, MAC/IP normalization is memoized.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[uuid.UUID, uuid.UUID], _Window] = {}
+        self._mac_cache: dict = {}
+        self._ip_cache: dict = {}
+
+    def add_lines(self, lines: Iterable[bytes], tenant_id: uuid.UUID, site_id: uuid.UUID) -> Tuple[int, int]:
+        """
+        Aggregate NDJSON records {src_mac, dst_mac, src_ip, dst_ip, proto,
+        packets, bytes}. Return (accepted, rejected) record counts.
+        """
+        flows = Counter()
+        seen = set()
+        accepted = rejected = 0
+        macs, ips = self._mac_cache, self._ip_cache
+        loads = json.loads
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = loads(line)
+                src_mac = _normalize_mac(record["src_mac"], macs)
+                dst_mac = _normalize_mac(record["dst_mac"], macs)
+                src_ip = _normalize_ip(record.get("src_ip"), ips)
+                protocol = record.get("proto") or None
+                packets = record.get("packets")
+                packets = 1 if packets is None else int(packets)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                rejected += 1
+                continue
+            if src_mac is None or dst_mac is None or packets <= 0 or not isinstance(protocol, (str, type(None))):
+                rejected += 1
+                continue
+            flows[(src_mac, dst_mac, src_ip, protocol)] += packets
+            seen.add(src_mac)
+            seen.add(dst_mac)
+            accepted += 1
+
+        # Memo caches only grow with distinct MACs/IPs seen by the sensors
+        if len(macs) > 100_000:
+            macs.clear()
+        if len(ips) > 100_000:
+            ips.clear()
+
+        now = datetime.utcnow()
+        with self._lock:
+            window = self._windows.get((tenant_id, site_id))
+            if window is None:
+                window = self._windows[(tenant_id, site_id)] = _Window()
+            window.flows.update(flows)
+            for mac in seen:
+                window.last_seen[mac] = now
+        return accepted, rejected
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(window.flows) for window in self._windows.values())
+
+    def _restore(self, key: Tuple[uuid.UUID, uuid.UUID], failed: _Window) -> None:
+        # Merge a window that could not be written into the current one
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = _Window()
+            window.flows.update(failed.flows)
+            for mac, seen in failed.last_seen.items():
+                window.last_seen[mac] = max(seen, window.last_seen.get(mac, seen))
+
+    def flush(self, session_factory) -> int:
+        """
+        Write every window through the bulk sync paths, one transaction per
+        site, and start new ones. Windows that fail are kept for the next
+        flush. Return the number of aggregated flows written.
+        """
+        with self._lock:
+            windows, self._windows = self._windows, {}
+
+        written = 0
+        for (tenant_id, site_id), window in windows.items():
+            db = session_factory()
+            try:
+                devices, communications = summarize_flows(
+                    window.flows, tenant_protocol_normalizer(db, tenant_id)
+                )
+                sync_assets(db, devices, tenant_id, site_id, merge_protocols=True, commit=False)
+                sync_communications(
+                    db, communications, tenant_id, site_id, accumulate=True, commit=False
+                )
+                update_last_seen(db, tenant_id, window.last_seen)
+                db.commit()
+                written += len(window.flows)
+            except Exception:
+                db.rollback()
+                self._restore((tenant_id, site_id), window)
+                logger.exception("Flush of live flows for site %s failed, retrying next window", site_id)
+            finally:
+                db.close()
+        return written
+
+
+def summarize_flows(flows: Counter, normalize=normalize_protocol) -> Tuple[dict, dict]:
+    """Aggregate -> (devices, communications) in the PCAP import format"""
+    devices = {}
+    communications = {}
+    protocol_names = {}
+    for (src_mac, dst_mac, src_ip, protocol), count in flows.items():
+        dsts = communications.setdefault(src_mac, {})
+        dsts[dst_mac] = dsts.get(dst_mac, 0) + count
+
+        if protocol is not None:
+            if protocol not in protocol_names:
+                protocol_names[protocol] = normalize(protocol)
+            protocol = protocol_names[protocol]
+        if src_ip is None and protocol is None:
+            continue
+        device = devices.setdefault(src_mac, {"ips": set(), "protocols": set()})
+        if src_ip is not None:
+            device["ips"].add(src_ip)
+        if protocol is not None:
+            device["protocols"].add(protocol)
+
+    for device in devices.values():
+        device["ips"] = sorted(device["ips"])
+        device["protocols"] = sorted(device["protocols"])
+    return devices, communications
+
+
+def update_last_seen(db: Session, tenant_id: uuid.UUID, last_seen: Dict[str, datetime]) -> None:
+    """
+    Set Asset.last_seen from {mac: timestamp}, matching assets through their
+    interfaces, with chunked UPDATE ... FROM (VALUES ...). Does not commit.
+    """
+    rows = list(last_seen.items())
+    for start in range(0, len(rows), LAST_SEEN_BATCH_SIZE):
+        batch = values(
+            column("mac", String), column("seen", DateTime), name="seen_macs"
+        ).data(rows[start : start + LAST_SEEN_BATCH_SIZE])
+        db.execute(
+            update(Asset)
+            .where(
+                Asset.id == AssetInterface.asset_id,
+                AssetInterface.tenant_id == tenant_id,
+                AssetInterface.mac_address == batch.c.mac,
+            )
+            # Being seen on the network is not an edit of the asset
+            .values(last_seen=batch.c.seen, updated_at=Asset.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+flow_aggregator = FlowAggregator()
+
+
+def start_flow_flusher(session_factory, window_seconds: int):
+    """Every window_seconds, flush the live flow aggregate. Runs in a daemon thread."""
+    if window_seconds <= 0:
+        return None
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(window_seconds):
+            try:
+                flow_aggregator.flush(session_factory)
+            except Exception:
+                logger.exception("Live flow flush failed")
+
+    thread = threading.Thread(target=_loop, name="flow-flusher", daemon=True)
+    thread.start()
+    return stop
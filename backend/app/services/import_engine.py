@@ -0,0 +1,352 @@
+# backend/services/import_engine.py
+"""
+Streaming XLSX/CSV import shared by assets, contacts and suppliers.
+
+The upload is read row by row (csv reader, openpyxl read-only mode) and
+staged as cleaned text cells in UPLOAD_DIR/imports/<token>.jsonl. The
+preview returns the token and the confirm step reads the staged rows back,
+so a sheet is uploaded and parsed once. Every row is checked against the
+declarative ImportSchema of an ImportTarget, which then previews or writes
+the valid rows in batches of IMPORT_BATCH_SIZE (one prefetch per batch,
+bulk inserts).
+
+Confirm modes: "per_batch" skips (and reports) the invalid rows and commits
+every batch on its own, a failing batch is rolled back and all its rows
+reported; "all_or_nothing" writes nothing if any row is invalid or any
+batch fails. Errors keep the row-level format {"row": <sheet row>,
+"error": <message>}.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import openpyxl
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.errors.error_codes import ErrorCode
+from app.errors.exceptions import ErrorCodeException
+from app.errors.validation_errors import ValidationError
+
+IMPORT_MODES = ("per_batch", "all_or_nothing")
+_TOKEN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ImportFileError(Exception):
+    """The upload is not a readable CSV/XLSX sheet"""
+
+
+class ImportRow(NamedTuple):
+    row: int  # sheet row number, the header is row 1
+    cells: dict  # column -> text, as read from the sheet
+    values: dict  # schema column -> parsed value
+
+
+@dataclass(frozen=True)
+class ImportColumn:
+    """
+    A schema column, read from the first non-blank of headers (default: its
+    name) and converted by parse, which also receives None for blank cells
+    and raises ValueError/ValidationError for invalid values.
+    """
+
+    name: str
+    required: bool = False
+    headers: Tuple[str, ...] = ()
+    parse: Optional[Callable[[Optional[str]], Any]] = None
+
+
+class ImportSchema:
+    """Columns of an import, with the messages of its row-level errors"""
+
+    def __init__(
+        self,
+        columns: Iterable[ImportColumn],
+        missing_message: str = "Missing required fields: {}",
+        invalid_message: str = "Validation error: {}",
+    ):
+        self.columns = [
+            (column, column.headers or (column.name,)) for column in columns
+        ]
+        self.names = [column.name for column, _ in self.columns]
+        self.missing_message = missing_message
+        self.invalid_message = invalid_message
+
+    def parse(self, cells: dict) -> Tuple[dict, Optional[str]]:
+        """(values by column name, error message or None) of a staged row"""
+        values = {}
+        missing = []
+        for column, headers in self.columns:
+            text = None
+            for header in headers:
+                text = cells.get(header)
+                if text is not None:
+                    break
+            if text is None and column.required:
+                missing.append(column.name)
+            values[column.name] = text
+        if missing:
+            return values, self.missing_message.format(", ".join(missing))
+        try:
+            for column, _ in self.columns:
+                if column.parse is not None:
+                    values[column.name] = column.parse(values[column.name])
+        except (ValueError, ValidationError) as exc:
+            return values, self.invalid_message.format(exc)
+        return values, None
+
+
+class ImportTarget:
+    """
+    What an import writes. Subclasses set kind and schema and implement
+    preview() and write(); check() adds the row checks needing the lookups
+    loaded by reset() (called again after a rolled back batch).
+    """
+
+    kind: str
+    schema: ImportSchema
+    integrity_message = "Integrity error: {}"
+
+    def __init__(self, db: Session, tenant_id: uuid.UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.reset()
+
+    def reset(self) -> None:
+        pass
+
+    def check(self, values: dict) -> List[str]:
+        """Error messages of a row that passed the schema (may resolve ids in values)"""
+        return []
+
+    def preview(self, rows: List[ImportRow]) -> Tuple[list, list]:
+        """(to_create, to_update) entries of a batch, without writing"""
+        raise NotImplementedError
+
+    def write(self, rows: List[ImportRow]) -> Tuple[list, list, list]:
+        """Write a batch and flush. Return (created, updated, errors of skipped rows)."""
+        raise NotImplementedError
+
+
+def _cell_text(value) -> Optional[str]:
+    # Sheet cell -> stripped text, None when blank. Whole floats lose the
+    # ".0" openpyxl gives to numeric cells, midnight datetimes their time.
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        text = str(int(value))
+    elif isinstance(value, datetime):
+        text = value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=" ")
+    elif isinstance(value, date):
+        text = value.isoformat()
+    else:
+        text = str(value).strip()
+    return text or None
+
+
+def iter_sheet_rows(file, filename: str) -> Iterator[Tuple[int, dict]]:
+    """
+    (sheet row number, {column: text}) of the non-blank rows of a CSV or
+    XLSX (first sheet) file, whose first row holds the column names.
+    """
+    workbook = None
+    if filename.lower().endswith(".csv"):
+        rows = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    else:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+    try:
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_cell_text(name) for name in header]
+        for number, values in enumerate(rows, start=2):
+            cells = {}
+            for column, value in zip(columns, values):
+                text = _cell_text(value)
+                if column is not None and text is not None:
+                    cells[column] = text
+            if cells:
+                yield number, cells
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def _import_dir() -> str:
+    return os.path.join(settings.UPLOAD_DIR, "imports")
+
+
+def _remove_expired_imports(directory: str) -> None:
+    cutoff = time.time() - settings.IMPORT_TOKEN_TTL_MINUTES * 60
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def stage_import(file: UploadFile, kind: str, tenant_id: uuid.UUID) -> str:
+    """Parse an upload into the staging area, return its import token"""
+    directory = _import_dir()
+    os.makedirs(directory, exist_ok=True)
+    _remove_expired_imports(directory)
+    token = uuid.uuid4().hex
+    path = os.path.join(directory, f"{token}.jsonl")
+    try:
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(json.dumps({"kind": kind, "tenant_id": str(tenant_id)}) + "\n")
+            for number, cells in iter_sheet_rows(file.file, file.filename):
+                out.write(json.dumps([number, cells]) + "\n")
+    except Exception as exc:
+        os.remove(path)
+        raise ImportFileError(str(exc)) from exc
+    return token
+
+
+def staged_import_path(token: str, kind: str, tenant_id: uuid.UUID) -> str:
+    """Staged rows of a token of this tenant and kind, if not expired"""
+    path = os.path.join(_import_dir(), f"{token}.jsonl")
+    try:
+        if not _TOKEN.match(token or ""):
+            raise FileNotFoundError(token)
+        if os.path.getmtime(path) < time.time() - settings.IMPORT_TOKEN_TTL_MINUTES * 60:
+            raise FileNotFoundError(token)
+        with open(path, encoding="utf-8") as staged:
+            header = json.loads(staged.readline())
+    except (OSError, ValueError):
+        raise ErrorCodeException(status_code=404, error_code=ErrorCode.IMPORT_NOT_FOUND)
+    if header != {"kind": kind, "tenant_id": str(tenant_id)}:
+        raise ErrorCodeException(status_code=404, error_code=ErrorCode.IMPORT_NOT_FOUND)
+    return path
+
+
+def iter_staged_rows(path: str) -> Iterator[Tuple[int, dict]]:
+    with open(path, encoding="utf-8") as staged:
+        staged.readline()
+        for line in staged:
+            number, cells = json.loads(line)
+            yield number, cells
+
+
+def _valid_rows(target: ImportTarget, path: str, errors: list) -> Iterator[ImportRow]:
+    # Rows passing the schema and the target checks, the others go to errors
+    for number, cells in iter_staged_rows(path):
+        values, error = target.schema.parse(cells)
+        messages = [error] if error else target.check(values)
+        if messages:
+            errors.extend({"row": number, "error": message} for message in messages)
+            continue
+        yield ImportRow(number, cells, values)
+
+
+def _batches(rows: Iterator[ImportRow], size: int) -> Iterator[List[ImportRow]]:
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _sorted(errors: list) -> list:
+    # Stable: the errors of a row keep the order of the checks
+    return sorted(errors, key=lambda error: error["row"])
+
+
+def preview_import(target: ImportTarget, path: str, batch_size: Optional[int] = None) -> dict:
+    """{"to_create", "to_update", "errors"} of the staged rows"""
+    batch_size = max(1, batch_size or settings.IMPORT_BATCH_SIZE)
+    to_create, to_update, errors = [], [], []
+    for batch in _batches(_valid_rows(target, path, errors), batch_size):
+        batch_create, batch_update = target.preview(batch)
+        to_create += batch_create
+        to_update += batch_update
+    return {"to_create": to_create, "to_update": to_update, "errors": _sorted(errors)}
+
+
+def _batch_errors(target: ImportTarget, batch: List[ImportRow], exc: SQLAlchemyError) -> list:
+    # The driver message: str(exc) would also carry the batch parameters
+    message = str(getattr(exc, "orig", None) or exc)
+    if isinstance(exc, IntegrityError):
+        message = target.integrity_message.format(message)
+    return [{"row": row.row, "error": message} for row in batch]
+
+
+def run_import(
+    target: ImportTarget,
+    path: str,
+    mode: str = "per_batch",
+    batch_size: Optional[int] = None,
+) -> dict:
+    """Write the staged rows, see the module docstring. Return {"created", "updated", "errors"}."""
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode: {mode}")
+    batch_size = max(1, batch_size or settings.IMPORT_BATCH_SIZE)
+    atomic = mode == "all_or_nothing"
+    db = target.db
+    errors = []
+    if atomic:
+        # Validation pass: nothing is written unless every row is valid
+        for _ in _valid_rows(target, path, errors):
+            pass
+        if errors:
+            return {"created": [], "updated": [], "errors": _sorted(errors)}
+
+    created, updated = [], []
+    for batch in _batches(_valid_rows(target, path, errors), batch_size):
+        try:
+            batch_created, batch_updated, batch_errors = target.write(batch)
+            if atomic and batch_errors:
+                db.rollback()
+                return {"created": [], "updated": [], "errors": _sorted(batch_errors)}
+            if not atomic:
+                db.commit()
+        except SQLAlchemyError as exc:
+            db.rollback()
+            errors += _batch_errors(target, batch, exc)
+            if atomic:
+                return {"created": [], "updated": [], "errors": _sorted(errors)}
+            target.reset()
+            continue
+        created += batch_created
+        updated += batch_updated
+        errors += batch_errors
+    if atomic:
+        db.commit()
+    return {"created": created, "updated": updated, "errors": _sorted(errors)}
+
+
+def confirm_import(
+    target: ImportTarget,
+    file: Optional[UploadFile],
+    token: Optional[str],
+    mode: str = "per_batch",
+) -> dict:
+    """
+    Run an import from the token of its preview or, without one, from a
+    new upload (ImportFileError if unreadable). The staged rows are removed.
+    """
+    if token:
+        path = staged_import_path(token, target.kind, target.tenant_id)
+    elif file is not None:
+        path = staged_import_path(
+            stage_import(file, target.kind, target.tenant_id), target.kind, target.tenant_id
+        )
+    else:
+        raise ErrorCodeException(status_code=400, error_code=ErrorCode.IMPORT_NOT_FOUND)
+    try:
+        return run_import(target, path, mode)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,321 @@
+# backend/services/network_topology.py
+"""
+Level-of-detail network topology for the network map.
+
+The assets of a tenant are aggregated in SQL into cluster nodes by site,
+area, location, Purdue level or asset type, with the connections summed
+into edges between clusters. Clusters listed in expand are replaced by
+their assets (and the edges split accordingly) as long as the node budget
+allows it. The viewport only filters the nodes of a computed topology.
+
+Topologies are cached per tenant for TOPOLOGY_CACHE_TTL_SECONDS. The ORM
+flush hooks drop the tenant cache when a transaction writing its assets
+or connections commits; bulk statements call invalidate_topology_cache
+themselves. Other processes, and the scores rewritten by the risk rescore
+worker, show up when the entry expires.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, case, cast, event, func, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.models import Area, Asset, AssetConnection, AssetStatus, AssetType, Location, Site
+
+# Hard cap of the node budget of a request
+TOPOLOGY_NODE_LIMIT = 5000
+# Topologies kept per tenant (distinct group_by / filters / expansions)
+TOPOLOGY_CACHE_ENTRIES = 64
+NO_GROUP = "none"
+
+
+def _group_key(alias, group_by: str):
+    # Cluster key of an asset row, as text ("none" when not assigned)
+    column = {
+        "site": alias.site_id,
+        "area": alias.area_id,
+        "location": alias.location_id,
+        "purdue": alias.purdue_level,
+        "asset_type": alias.asset_type_id,
+    }[group_by]
+    return func.coalesce(cast(column, String), NO_GROUP)
+
+
+GROUP_LABELS = {
+    "site": (Site, Asset.site_id, Site.name),
+    "area": (Area, Asset.area_id, Area.name),
+    "location": (Location, Asset.location_id, Location.name),
+    "asset_type": (AssetType, Asset.asset_type_id, AssetType.name),
+}
+
+
+def cluster_id(group_by: str, key: str) -> str:
+    return f"{group_by}:{key}"
+
+
+def _scope(alias, tenant_id, site_id=None, asset_type_id=None) -> list:
+    criteria = [alias.tenant_id == tenant_id, alias.deleted_at == None]
+    if site_id:
+        criteria.append(alias.site_id == site_id)
+    if asset_type_id:
+        criteria.append(alias.asset_type_id == asset_type_id)
+    return criteria
+
+
+def _clusters(db: Session, tenant_id, group_by: str, site_id, asset_type_id) -> List[dict]:
+    key = _group_key(Asset, group_by)
+    if group_by == "purdue":
+        label = func.concat("Purdue ", key)
+    else:
+        table, foreign_key, name = GROUP_LABELS[group_by]
+        label = func.min(name)
+    query = (
+        select(
+            key.label("key"),
+            label.label("label"),
+            func.count().label("asset_count"),
+            func.max(Asset.risk_score).label("risk_score_max"),
+            func.avg(Asset.risk_score).label("risk_score_avg"),
+            func.avg(Asset.map_x).label("x"),
+            func.avg(Asset.map_y).label("y"),
+        )
+        .select_from(Asset)
+        .where(*_scope(Asset, tenant_id, site_id, asset_type_id))
+        .group_by(key)
+    )
+    if group_by != "purdue":
+        query = query.outerjoin(table, table.id == foreign_key)
+    clusters = []
+    for row in db.execute(query):
+        clusters.append(
+            {
+                "id": cluster_id(group_by, row.key),
+                "kind": "cluster",
+                "group_by": group_by,
+                "key": row.key,
+                "label": row.label if row.key != NO_GROUP else None,
+                "asset_count": row.asset_count,
+                "risk_score_max": row.risk_score_max,
+                "risk_score_avg": float(row.risk_score_avg) if row.risk_score_avg is not None else None,
+                "x": row.x,
+                "y": row.y,
+            }
+        )
+    return clusters
+
+
+def _assets(db: Session, tenant_id, group_by: str, keys, site_id, asset_type_id) -> List[dict]:
+    key = _group_key(Asset, group_by)
+    query = (
+        select(
+            Asset.id,
+            Asset.name,
+            AssetType.name.label("type"),
+            Site.name.label("site"),
+            AssetStatus.name.label("status"),
+            Asset.risk_score,
+            Asset.map_x,
+            Asset.map_y,
+            key.label("key"),
+        )
+        .join(AssetType, AssetType.id == Asset.asset_type_id)
+        .join(Site, Site.id == Asset.site_id)
+        .outerjoin(AssetStatus, AssetStatus.id == Asset.status_id)
+        .where(*_scope(Asset, tenant_id, site_id, asset_type_id), key.in_(keys))
+        .order_by(Asset.name, Asset.id)
+    )
+    return [
+        {
+            "id": str(row.id),
+            "kind": "asset",
+            "label": row.name,
+            "type": row.type,
+            "site": row.site,
+            "status": row.status,
+            "risk_score": row.risk_score,
+            "cluster": cluster_id(group_by, row.key),
+            "x": row.map_x,
+            "y": row.map_y,
+        }
+        for row in db.execute(query)
+    ]
+
+
+def _edges(db: Session, tenant_id, group_by: str, expanded, site_id, asset_type_id) -> List[dict]:
+    parent = aliased(Asset)
+    child = aliased(Asset)
+
+    def node(alias):
+        # Display node of an endpoint: the asset in an expanded cluster,
+        # otherwise its cluster
+        key = _group_key(alias, group_by)
+        clustered = literal(f"{group_by}:") + key
+        if not expanded:
+            return clustered
+        return case((key.in_(expanded), cast(alias.id, String)), else_=clustered)
+
+    source, target = node(parent).label("source"), node(child).label("target")
+    query = (
+        select(source, target, func.count().label("count"))
+        .select_from(AssetConnection)
+        .join(parent, parent.id == AssetConnection.parent_asset_id)
+        .join(child, child.id == AssetConnection.child_asset_id)
+        .where(
+            AssetConnection.tenant_id == tenant_id,
+            *_scope(parent, tenant_id, site_id, asset_type_id),
+            *_scope(child, tenant_id, site_id, asset_type_id),
+        )
+        .group_by(source, target)
+    )
+    # Undirected: a -> b and b -> a are one edge, links inside a cluster are not drawn
+    counts = Counter()
+    for row in db.execute(query):
+        if row.source != row.target:
+            counts[tuple(sorted((row.source, row.target)))] += row.count
+    return [{"from": a, "to": b, "count": count} for (a, b), count in sorted(counts.items())]
+
+
+def build_topology(
+    db: Session,
+    tenant_id: uuid.UUID,
+    group_by: str = "site",
+    expand: Sequence[str] = (),
+    max_nodes: Optional[int] = None,
+    site_id: Optional[uuid.UUID] = None,
+    asset_type_id: Optional[uuid.UUID] = None,
+) -> dict:
+    """
+    Topology of clusters (and of the assets of the expanded ones) within
+    max_nodes nodes. Expansions that would exceed the budget are skipped
+    and listed in not_expanded; beyond the budget, the clusters holding
+    the fewest assets are left out (truncated).
+    """
+    max_nodes = min(max_nodes or settings.TOPOLOGY_MAX_NODES, TOPOLOGY_NODE_LIMIT)
+    clusters = _clusters(db, tenant_id, group_by, site_id, asset_type_id)
+    # Assets of every cluster, including those truncated below
+    total_assets = sum(cluster["asset_count"] for cluster in clusters)
+    truncated = len(clusters) > max_nodes
+    if truncated:
+        clusters.sort(key=lambda cluster: (-cluster["asset_count"], cluster["id"]))
+        clusters = clusters[:max_nodes]
+    by_id = {cluster["id"]: cluster for cluster in clusters}
+
+    budget = max_nodes - len(clusters)
+    expanded, not_expanded = [], []
+    for requested in dict.fromkeys(expand):
+        cluster = by_id.get(requested)
+        if cluster is None:
+            continue
+        # An expanded cluster gives up its own node for its assets
+        if cluster["asset_count"] - 1 <= budget:
+            budget -= cluster["asset_count"] - 1
+            expanded.append(cluster["key"])
+        else:
+            not_expanded.append(requested)
+
+    nodes = [cluster for cluster in clusters if cluster["key"] not in expanded]
+    if expanded:
+        nodes += _assets(db, tenant_id, group_by, expanded, site_id, asset_type_id)
+    node_ids = {node["id"] for node in nodes}
+    edges = [
+        edge
+        for edge in _edges(db, tenant_id, group_by, expanded, site_id, asset_type_id)
+        if edge["from"] in node_ids and edge["to"] in node_ids
+    ]
+    return {
+        "group_by": group_by,
+        "nodes": nodes,
+        "edges": edges,
+        "expanded": [cluster_id(group_by, key) for key in expanded],
+        "not_expanded": not_expanded,
+        "truncated": truncated,
+        "total_assets": total_assets,
+    }
+
+
+def in_viewport(topology: dict, bounds: Tuple[float, float, float, float]) -> dict:
+    """The nodes positioned inside (min_x, min_y, max_x, max_y), with the edges between them"""
+    min_x, min_y, max_x, max_y = bounds
+    nodes = [
+        node
+        for node in topology["nodes"]
+        if node["x"] is not None
+        and node["y"] is not None
+        and min_x <= node["x"] <= max_x
+        and min_y <= node["y"] <= max_y
+    ]
+    node_ids = {node["id"] for node in nodes}
+    edges = [
+        edge for edge in topology["edges"] if edge["from"] in node_ids and edge["to"] in node_ids
+    ]
+    return {**topology, "nodes": nodes, "edges": edges}
+
+
+# --- per-tenant cache ---
+
+_cache: Dict[uuid.UUID, Dict[tuple, Tuple[float, dict]]] = {}
+_cache_lock = threading.Lock()
+
+
+def invalidate_topology_cache(tenant_id: uuid.UUID) -> None:
+    with _cache_lock:
+        _cache.pop(tenant_id, None)
+
+
+def get_topology(
+    db: Session,
+    tenant_id: uuid.UUID,
+    group_by: str = "site",
+    expand: Sequence[str] = (),
+    max_nodes: Optional[int] = None,
+    site_id: Optional[uuid.UUID] = None,
+    asset_type_id: Optional[uuid.UUID] = None,
+    bounds: Optional[Tuple[float, float, float, float]] = None,
+) -> dict:
+    """build_topology through the tenant cache, then in_viewport(bounds)"""
+    key = (group_by, tuple(sorted(set(expand))), max_nodes, site_id, asset_type_id)
+    now = time.monotonic()
+    with _cache_lock:
+        expires, topology = _cache.get(tenant_id, {}).get(key, (0, None))
+    if topology is None or expires < now:
+        topology = build_topology(db, tenant_id, group_by, expand, max_nodes, site_id, asset_type_id)
+        with _cache_lock:
+            entries = _cache.setdefault(tenant_id, {})
+            if len(entries) >= TOPOLOGY_CACHE_ENTRIES:
+                entries.clear()
+            entries[key] = (now + settings.TOPOLOGY_CACHE_TTL_SECONDS, topology)
+    return in_viewport(topology, bounds) if bounds else topology
+
+
+def _collect_topology_tenants(session, flush_context, instances):
+    tenants = session.info.setdefault("topology_tenants", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Asset, AssetConnection)):
+            tenants.add(obj.tenant_id)
+
+
+def _invalidate_committed(session):
+    for tenant_id in session.info.pop("topology_tenants", ()):
+        invalidate_topology_cache(tenant_id)
+
+
+_listeners_registered = False
+
+
+def register_topology_cache_listeners():
+    """
+    Drop the cached topologies of a tenant when a transaction that flushed
+    assets or connections of the tenant commits.
+    """
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, "before_flush", _collect_topology_tenants)
+    event.listen(Session, "after_commit", _invalidate_committed)
+    event.listen(Session, "after_rollback", lambda session: session.info.pop("topology_tenants", None))
+    _listeners_registered = True
@@ -1,37 +1,219 @@
 # backend/services/oui_lookup.py
+"""
+Offline MAC vendor lookup.
 
+The IEEE registries (MA-L oui.txt, MA-M mam.txt, MA-S oui36.txt and the
+legacy iab.txt) are compiled into a versioned binary table shipped with the
+backend (app/data/oui.bin). The table is memory-mapped on the first lookup
+and searched with bisect, so importing this module costs nothing and all
+workers share the same pages.
+
+File layout (little endian, every section aligned to 8 bytes):
+    header        magic, format version, table count, vendor count, data version
+    descriptors   (prefix bits, entry count) per table, longest prefix first
+    tables        sorted uint64 prefixes followed by uint32 vendor indexes
+    vendors       uint32 offsets (vendor count + 1) followed by the UTF-8 blob
+
+Refresh from locally downloaded registry files with:
+    python -m app.services.oui_lookup build oui.txt mam.txt oui36.txt iab.txt --version=2024-05-20
+"""
+
+import mmap
+import os
 import re
-import requests
+import struct
+import sys
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-OUI_URL = "https://standards-oui.ieee.org/oui.txt"
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0"
-}
+OUI_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "oui.bin")
+UNKNOWN_VENDOR = "Unknown Vendor"
 
+MAGIC = b"OUIB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHI32s")
+DESCRIPTOR = struct.Struct("<I4xQ")
 
-def download_oui():
-    r = requests.get(OUI_URL, headers=headers)
-    r.raise_for_status()
-    return r.text
+_HEX_LINE = re.compile(r"^([0-9A-F]{2})-([0-9A-F]{2})-([0-9A-F]{2})\s+\(hex\)\s*(.*)$", re.MULTILINE)
+_BASE16_LINE = re.compile(r"^([0-9A-F]{6})(?:-([0-9A-F]{6}))?\s+\(base 16\)\s*(.*)$", re.MULTILINE)
 
 
-def parse_oui(raw_text):
+def _align(offset: int) -> int:
+    return offset + (-offset % 8)
+
+
+def parse_oui(raw_text: str) -> Iterator[Tuple[int, int, str]]:
     """
-    Parse IEEE oui.txt format and return dict {mac_prefix: vendor_name}
+    Parse an IEEE registry text file and yield (prefix, prefix_bits, vendor).
+    MA-L entries give a 24 bit prefix; MA-M/MA-S/IAB entries give a 24 bit
+    base plus a range ("0D7000-0D7FFF") whose size sets the prefix length.
     """
-    oui_map = {}
-    pattern = re.compile(r"^([0-9A-F]{6})\s+\(base 16\)\s+(.+)$", re.MULTILINE)
-    matches = pattern.findall(raw_text)
-    for mac, vendor in matches:
-        oui_map[mac.upper()] = vendor.strip()
-    return oui_map
+    base = None
+    hex_vendor = ""
+    for line in raw_text.splitlines():
+        line = line.strip()
+        match = _HEX_LINE.match(line)
+        if match:
+            base = int("".join(match.group(1, 2, 3)), 16)
+            hex_vendor = match.group(4).strip()
+            continue
+        match = _BASE16_LINE.match(line)
+        if not match or base is None:
+            continue
+        start, end, vendor = match.groups()
+        vendor = vendor.strip() or hex_vendor
+        if end is None:
+            yield int(start, 16), 24, vendor
+        else:
+            size = int(end, 16) - int(start, 16) + 1
+            if size <= 0 or size & (size - 1):
+                continue
+            bits = 48 - (size.bit_length() - 1)
+            yield ((base << 24) | int(start, 16)) >> (48 - bits), bits, vendor
+        base = None
+
+
+def compile_oui(entries: Iterable[Tuple[int, int, str]], data_version: str) -> bytes:
+    """Build the binary table from (prefix, prefix_bits, vendor) entries"""
+    vendors: Dict[str, int] = {}
+    tables: Dict[int, Dict[int, int]] = {}
+    for prefix, bits, vendor in entries:
+        index = vendors.setdefault(vendor, len(vendors))
+        tables.setdefault(bits, {})[prefix] = index
+
+    names = [name.encode("utf-8") for name in vendors]
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(tables), len(names), data_version.encode("ascii")[:32])
+    out = bytearray(header)
+    for bits in sorted(tables, reverse=True):
+        out += DESCRIPTOR.pack(bits, len(tables[bits]))
+    for bits in sorted(tables, reverse=True):
+        prefixes = sorted(tables[bits])
+        out += b"\0" * (_align(len(out)) - len(out))
+        out += struct.pack(f"<{len(prefixes)}Q", *prefixes)
+        out += struct.pack(f"<{len(prefixes)}I", *(tables[bits][p] for p in prefixes))
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    out += b"\0" * (_align(len(out)) - len(out))
+    out += struct.pack(f"<{len(offsets)}I", *offsets)
+    out += b"".join(names)
+    return bytes(out)
+
+
+class OUIDatabase:
+    """Read-only view over a compiled OUI table (memory-mapped file or bytes)"""
+
+    def __init__(self, buf):
+        self._buf = buf
+        view = memoryview(buf)
+        magic, fmt, table_count, vendor_count, version = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError("Not a compiled OUI table")
+        self.version = version.rstrip(b"\0").decode("ascii")
+
+        self._tables: List[Tuple[int, memoryview, memoryview]] = []
+        offset = HEADER.size
+        descriptors = []
+        for _ in range(table_count):
+            descriptors.append(DESCRIPTOR.unpack_from(view, offset))
+            offset += DESCRIPTOR.size
+        for bits, count in descriptors:
+            offset = _align(offset)
+            prefixes = view[offset : offset + 8 * count].cast("Q")
+            offset += 8 * count
+            indexes = view[offset : offset + 4 * count].cast("I")
+            offset += 4 * count
+            self._tables.append((bits, prefixes, indexes))
+        offset = _align(offset)
+        self._offsets = view[offset : offset + 4 * (vendor_count + 1)].cast("I")
+        self._names = view[offset + 4 * (vendor_count + 1) :]
+
+    @classmethod
+    def open(cls, path: str = OUI_DB_PATH) -> "OUIDatabase":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return sum(len(prefixes) for _, prefixes, _ in self._tables)
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Vendor of mac (any separator), longest registered prefix first"""
+        digits = re.sub(r"[^0-9A-Fa-f]", "", mac or "")[:12]
+        if len(digits) < 6:
+            return None
+        value = int(digits.ljust(12, "0"), 16)
+        for bits, prefixes, indexes in self._tables:
+            if len(digits) * 4 < bits:
+                continue
+            key = value >> (48 - bits)
+            position = bisect_left(prefixes, key)
+            if position < len(prefixes) and prefixes[position] == key:
+                index = indexes[position]
+                return bytes(self._names[self._offsets[index] : self._offsets[index + 1]]).decode("utf-8")
+        return None
+
+
+_database: Optional[OUIDatabase] = None
+_database_lock = threading.Lock()
+
+
+def get_oui_database() -> OUIDatabase:
+    """The shared OUI table, mapped on first use"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = OUIDatabase.open()
+    return _database
+
+
+def get_vendor_from_mac(mac: str) -> str:
+    return get_oui_database().lookup(mac) or UNKNOWN_VENDOR
+
+
+def _build(argv: List[str]) -> None:
+    sources = [a for a in argv if not a.startswith("--")]
+    options = dict(a[2:].split("=", 1) for a in argv if a.startswith("--") and "=" in a)
+    if not sources:
+        print("❌ Please provide at least one registry file (oui.txt, mam.txt, oui36.txt, iab.txt)")
+        sys.exit(1)
+
+    entries = []
+    for source in sources:
+        with open(source, encoding="utf-8", errors="replace") as f:
+            parsed = list(parse_oui(f.read()))
+        print(f"📄 {source}: {len(parsed)} entries")
+        entries.extend(parsed)
 
+    output = options.get("output", OUI_DB_PATH)
+    data = compile_oui(entries, options.get("version", "unversioned"))
+    tmp = output + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, output)
+    database = OUIDatabase(data)
+    print(f"✅ {output}: {len(database)} prefixes, version {database.version}, {len(data)} bytes")
 
-def load_oui_map():
-    raw = download_oui()
-    return parse_oui(raw)
 
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "info", "lookup"):
+        print("Usage:")
+        print("  python -m app.services.oui_lookup build <registry.txt>... [--version=YYYY-MM-DD] [--output=path]")
+        print("  python -m app.services.oui_lookup info")
+        print("  python -m app.services.oui_lookup lookup <mac>")
+        print("")
+        print("Examples:")
+        print("  python -m app.services.oui_lookup build oui.txt mam.txt oui36.txt iab.txt --version=2024-05-20")
+        print("  python -m app.services.oui_lookup lookup 00:1B:1B:00:00:01")
+        sys.exit(1)
 
-# Usage example:
-# OUI_MAP = load_oui_map()
-# vendor = OUI_MAP.get(mac[:6].upper())
+    command = sys.argv[1]
+    if command == "build":
+        _build(sys.argv[2:])
+    elif command == "info":
+        database = get_oui_database()
+        print(f"{OUI_DB_PATH}: {len(database)} prefixes, version {database.version}")
+    elif command == "lookup":
+        for mac in sys.argv[2:]:
+            print(f"{mac}: {get_vendor_from_mac(mac)}")
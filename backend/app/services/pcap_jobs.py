@@ -0,0 +1,380 @@
+# backend/services/pcap_jobs.py
+"""
+Background PCAP imports.
+
+Uploads are spooled to UPLOAD_DIR/pcap_jobs/<job id>/ and recorded as a
+queued PcapImportJob; worker threads claim jobs from the table with
+FOR UPDATE SKIP LOCKED (no external broker), parse the captures in the
+process pool of pcap_parser and sync assets and communications, writing
+phase and counters back on the row for GET /pcap/jobs/{id}.
+
+A claimed job carries the id of its worker and a lease, renewed by a
+heartbeat thread while the job runs. Only jobs whose lease expired (their
+worker died) are put back in the queue, so several processes can share it.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.errors.error_codes import ErrorCode
+from app.models import PcapImportJob
+from app.services.asset_sync import sync_assets, sync_communications
+from app.services.pcap_parser import aggregate_pcap_files_cached, tenant_protocol_normalizer
+from app.services.pcap_reader import PcapFormatError, summarize
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Minimum interval between two progress writes on the job row
+PROGRESS_WRITE_SECONDS = 1.0
+# Identifies the jobs claimed by this process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _lease_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.PCAP_JOB_LEASE_SECONDS)
+
+
+def _spool_dir(job_id: uuid.UUID) -> str:
+    return os.path.join(settings.UPLOAD_DIR, "pcap_jobs", str(job_id))
+
+
+def enqueue_pcap_job(
+    db: Session,
+    files: List[UploadFile],
+    tenant_id: uuid.UUID,
+    site_id: uuid.UUID,
+    created_by: Optional[uuid.UUID] = None,
+    accumulate: bool = False,
+) -> PcapImportJob:
+    """Spool the uploads to disk (hashing them on the way) and queue a job"""
+    job_id = uuid.uuid4()
+    spool_dir = _spool_dir(job_id)
+    os.makedirs(spool_dir, exist_ok=True)
+    spooled = []
+    try:
+        for index, file in enumerate(files):
+            path = os.path.join(spool_dir, f"{index}{os.path.splitext(file.filename)[1].lower()}")
+            digest = hashlib.sha256()
+            with open(path, "wb") as out:
+                while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+            spooled.append({
+                "name": file.filename,
+                "path": path,
+                "digest": digest.hexdigest(),
+                "size": os.path.getsize(path),
+            })
+
+        job = PcapImportJob(
+            id=job_id,
+            tenant_id=tenant_id,
+            site_id=site_id,
+            created_by=created_by,
+            accumulate=accumulate,
+            status="queued",
+            phase="queued",
+            files=spooled,
+            total_bytes=sum(f["size"] for f in spooled),
+        )
+        db.add(job)
+        db.commit()
+    except Exception:
+        db.rollback()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        raise
+    db.refresh(job)
+    return job
+
+
+def claim_pcap_job(db: Session) -> Optional[PcapImportJob]:
+    """Take the oldest queued job, if any, and mark it running under a lease"""
+    job = (
+        db.query(PcapImportJob)
+        .filter(PcapImportJob.status == "queued")
+        .order_by(PcapImportJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+    job.status = "running"
+    job.phase = "parsing"
+    job.worker_id = WORKER_ID
+    job.lease_expires_at = _lease_expiry()
+    job.started_at = datetime.now(timezone.utc)
+    job.bytes_processed = 0
+    job.packets_processed = 0
+    db.commit()
+    return job
+
+
+def requeue_stale_pcap_jobs(db: Session) -> int:
+    """
+    Put back in the queue the running jobs whose lease expired: their worker
+    died mid-import. Jobs claimed before leases existed have none.
+    """
+    count = (
+        db.query(PcapImportJob)
+        .filter(
+            PcapImportJob.status == "running",
+            or_(
+                PcapImportJob.lease_expires_at < datetime.now(timezone.utc),
+                PcapImportJob.lease_expires_at == None,
+            ),
+        )
+        .update(
+            {"status": "queued", "phase": "queued", "worker_id": None, "lease_expires_at": None},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return count
+
+
+def _set_progress(session_factory, job_id: uuid.UUID, **values) -> None:
+    # Own short transaction, so progress is visible while the import runs
+    db = session_factory()
+    try:
+        db.query(PcapImportJob).filter(PcapImportJob.id == job_id).update(
+            values, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _renew_lease(session_factory, job_id: uuid.UUID) -> bool:
+    """Extend the lease of a job still owned by this worker"""
+    db = session_factory()
+    try:
+        renewed = (
+            db.query(PcapImportJob)
+            .filter(
+                PcapImportJob.id == job_id,
+                PcapImportJob.status == "running",
+                PcapImportJob.worker_id == WORKER_ID,
+            )
+            .update({"lease_expires_at": _lease_expiry()}, synchronize_session=False)
+        )
+        db.commit()
+        return bool(renewed)
+    finally:
+        db.close()
+
+
+def _start_heartbeat(session_factory, job_id: uuid.UUID) -> threading.Event:
+    """Renew the lease of a job every third of its duration until the event is set"""
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(settings.PCAP_JOB_LEASE_SECONDS / 3):
+            try:
+                if not _renew_lease(session_factory, job_id):
+                    logger.warning("PCAP import job %s lost its lease", job_id)
+                    return
+            except Exception:
+                logger.exception("Could not renew the lease of PCAP import job %s", job_id)
+
+    threading.Thread(target=_loop, name=f"pcap-job-heartbeat-{job_id}", daemon=True).start()
+    return stop
+
+
+def run_pcap_job(db: Session, session_factory, job: PcapImportJob) -> None:
+    """Parse and sync a claimed job, recording phase, counters and result"""
+    job_id = job.id
+    heartbeat = _start_heartbeat(session_factory, job_id)
+    try:
+        _run_pcap_job(db, session_factory, job)
+    finally:
+        heartbeat.set()
+
+
+def _run_pcap_job(db: Session, session_factory, job: PcapImportJob) -> None:
+    job_id = job.id
+    totals = {"bytes": 0, "packets": 0, "written": 0.0}
+
+    def progress(size: int, packets: int):
+        totals["bytes"] += size
+        totals["packets"] += packets
+        now = time.monotonic()
+        if now - totals["written"] >= PROGRESS_WRITE_SECONDS:
+            totals["written"] = now
+            _set_progress(
+                session_factory, job_id,
+                bytes_processed=totals["bytes"], packets_processed=totals["packets"],
+            )
+
+    try:
+        started = time.perf_counter()
+        counter = aggregate_pcap_files_cached(
+            {f["path"]: f["digest"] for f in job.files}, progress=progress
+        )
+        devices, communications = summarize(
+            counter, tenant_protocol_normalizer(db, job.tenant_id)
+        )
+        timings = {"parse": round(time.perf_counter() - started, 4)}
+
+        job.phase = "syncing_assets"
+        job.bytes_processed = job.total_bytes
+        job.packets_processed = sum(counter.values())
+        job.devices_found = len(devices)
+        db.commit()
+        created, updated = sync_assets(db, devices, job.tenant_id, job.site_id, timings=timings)
+
+        job.phase = "syncing_communications"
+        db.commit()
+        started = time.perf_counter()
+        sync_communications(
+            db, communications, job.tenant_id, job.site_id, accumulate=job.accumulate
+        )
+        timings["communications"] = round(time.perf_counter() - started, 4)
+
+        final = {
+            "status": "completed",
+            "phase": "done",
+            "result": {
+                "created": len(created),
+                "updated": len(updated),
+                "total_devices_found": len(devices),
+                "timings": timings,
+            },
+        }
+    except Exception as exc:
+        db.rollback()
+        if isinstance(exc, PcapFormatError):
+            error_code = ErrorCode.INVALID_FILE_FORMAT.value
+        else:
+            logger.exception("PCAP import job %s failed", job_id)
+            error_code = ErrorCode.PCAP_UPLOAD_FAILED.value
+        final = {"status": "failed", "error_code": error_code}
+    final["finished_at"] = datetime.now(timezone.utc)
+    try:
+        owned = _finish_job(db, job_id, final)
+    except Exception:
+        db.rollback()
+        logger.exception("Could not record the result of PCAP import job %s", job_id)
+        # Not left running: the job would be requeued and imported again
+        retry = session_factory()
+        try:
+            owned = _finish_job(retry, job_id, {
+                "status": "failed",
+                "error_code": ErrorCode.PCAP_UPLOAD_FAILED.value,
+                "finished_at": datetime.now(timezone.utc),
+            })
+        finally:
+            retry.close()
+    if not owned:
+        # Requeued and claimed again: the spool belongs to the new run
+        logger.warning("PCAP import job %s lost its lease, result discarded", job_id)
+        return
+    shutil.rmtree(_spool_dir(job_id), ignore_errors=True)
+
+
+def _finish_job(db: Session, job_id: uuid.UUID, values: dict) -> bool:
+    """Record the outcome of a job still running under this worker and commit"""
+    finished = (
+        db.query(PcapImportJob)
+        .filter(
+            PcapImportJob.id == job_id,
+            PcapImportJob.status == "running",
+            PcapImportJob.worker_id == WORKER_ID,
+        )
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return bool(finished)
+
+
+def start_pcap_job_workers(session_factory, workers: int, poll_seconds: float):
+    """
+    Start workers daemon threads that run queued PCAP import jobs, polling
+    the queue every poll_seconds when it is empty. Jobs whose lease expired
+    are requeued at startup, then at most once per lease duration.
+    """
+    if workers <= 0:
+        return None
+    stop = threading.Event()
+    requeued_at = [float("-inf")]
+    requeue_lock = threading.Lock()
+
+    def _requeue_expired():
+        # At most once per lease duration across the worker threads
+        with requeue_lock:
+            if time.monotonic() - requeued_at[0] < settings.PCAP_JOB_LEASE_SECONDS:
+                return
+            requeued_at[0] = time.monotonic()
+        db = session_factory()
+        try:
+            requeued = requeue_stale_pcap_jobs(db)
+            if requeued:
+                logger.warning("Requeued %s PCAP import jobs with an expired lease", requeued)
+        except Exception:
+            db.rollback()
+            logger.exception("Could not requeue stale PCAP import jobs")
+        finally:
+            db.close()
+
+    def _loop():
+        while not stop.is_set():
+            _requeue_expired()
+            db = session_factory()
+            try:
+                job = claim_pcap_job(db)
+                if job is not None:
+                    run_pcap_job(db, session_factory, job)
+            except Exception:
+                db.rollback()
+                job = None
+                logger.exception("PCAP import worker failed")
+            finally:
+                db.close()
+            if job is None:
+                stop.wait(poll_seconds)
+
+    for index in range(workers):
+        threading.Thread(target=_loop, name=f"pcap-job-worker-{index}", daemon=True).start()
+    return stop
+
+
+def pcap_job_status(job: PcapImportJob) -> dict:
+    """Public view of a job, with completion ratio and ETA of the parse phase"""
+    progress = job.bytes_processed / job.total_bytes if job.total_bytes else 0.0
+    eta_seconds = None
+    if job.status == "running" and job.phase == "parsing" and job.started_at and 0 < progress < 1:
+        elapsed = (datetime.now(timezone.utc) - job.started_at).total_seconds()
+        eta_seconds = round(elapsed * (1 - progress) / progress, 1)
+    return {
+        "id": job.id,
+        "status": job.status,
+        "phase": job.phase,
+        "site_id": job.site_id,
+        "files": [f["name"] for f in job.files],
+        "total_bytes": job.total_bytes,
+        "bytes_processed": job.bytes_processed,
+        "packets_processed": job.packets_processed,
+        "devices_found": job.devices_found,
+        "progress": round(min(progress, 1.0), 4),
+        "eta_seconds": eta_seconds,
+        "result": job.result,
+        "error_code": job.error_code,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
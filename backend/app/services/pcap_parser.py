@@ -1,8 +1,171 @@
 # backend/services/pcap_parser.py
 
-from multiprocessing import Process, Queue
-from collections import defaultdict
-import pyshark
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+import multiprocessing
+import os
+import re
+import threading
+
+from app.services.pcap_reader import aggregate_pcap_file, split_pcap_file, summarize
+
+
+# Mappa dei protocolli industriali comuni (nome rilevato -> opzione del form
+# asset, None = protocollo di base da ignorare). L'ordine conta: nel match
+# per sottostringa vince la prima chiave presente.
+PROTOCOL_MAPPING = {
+    # Protocolli Modbus
+    'MODBUS': 'Modbus',
+    'MODBUS-TCP': 'Modbus',
+    'MODBUS-RTU': 'Modbus',
+    'MODBUS-ASCII': 'Modbus',
+    
+    # Protocolli Profinet
+    'PROFINET': 'Profinet',
+    'PN': 'Profinet',
+    'PROFINET-IO': 'Profinet',
+    
+    # Protocolli OPC
+    'OPC-UA': 'OPC-UA',
+    'OPCUA': 'OPC-UA',
+    'OPC': 'OPC-UA',
+    
+    # Protocolli EtherNet/IP
+    'ETHERNET/IP': 'EtherNet/IP',
+    'ETHERNETIP': 'EtherNet/IP',
+    'ENIP': 'EtherNet/IP',
+    'CIP': 'EtherNet/IP',
+    
+    # Protocolli BACnet
+    'BACNET': 'BACnet',
+    'BACNET-IP': 'BACnet',
+    'BACNET-MSTP': 'BACnet',
+    
+    # Protocolli DNP3
+    'DNP3': 'DNP3',
+    'DNP': 'DNP3',
+    
+    # Protocolli KNX
+    'KNX': 'KNX',
+    'KNXNET': 'KNX',
+    
+    # Protocolli M-Bus
+    'M-BUS': 'M-Bus',
+    'MBUS': 'M-Bus',
+    
+    # Protocolli IEC 61850
+    'IEC61850': 'IEC 61850',
+    'IEC-61850': 'IEC 61850',
+    'MMS': 'IEC 61850',  # Manufacturing Message Specification
+    
+    # Protocolli IEC 60870-5-104
+    'IEC104': 'IEC 60870-5-104',
+    'IEC-104': 'IEC 60870-5-104',
+    'IEC60870-5-104': 'IEC 60870-5-104',
+    'IEC-60870-5-104': 'IEC 60870-5-104',
+    
+    # Protocolli S7
+    'S7': 'S7',
+    'S7COMM': 'S7',
+    'S7-PROTOCOL': 'S7',
+    
+    # Protocolli MQTT
+    'MQTT': 'MQTT',
+    'MQTT-SN': 'MQTT',
+    
+    # Protocolli HTTP/HTTPS (per sistemi SCADA web)
+    'HTTP': 'Other',
+    'HTTPS': 'Other',
+    
+    # Protocolli FTP
+    'FTP': 'Other',
+    'FTPS': 'Other',
+    'SFTP': 'Other',
+    
+    # Protocolli SSH/Telnet
+    'SSH': 'Other',
+    'TELNET': 'Other',
+    
+    # Protocolli SNMP
+    'SNMP': 'Other',
+    'SNMPV1': 'Other',
+    'SNMPV2': 'Other',
+    'SNMPV3': 'Other',
+    
+    # Protocolli DNS/DHCP
+    'DNS': 'Other',
+    'DHCP': 'Other',
+    
+    # Protocolli di base (non industriali)
+    'TCP': None,
+    'UDP': None,
+    'IP': None,
+    'ARP': None,
+    'ICMP': None,
+    'ICMPV6': None,
+    'IPV6': None,
+}
+
+BASE_PROTOCOLS = frozenset({'TCP', 'UDP', 'IP', 'ARP', 'ICMP', 'ICMPV6', 'IPV6'})
+
+# Distinct names memoized by each normalizer (captures carry a few dozen)
+NORMALIZE_CACHE_SIZE = 4096
+
+
+class ProtocolNormalizer:
+    """
+    PROTOCOL_MAPPING (optionally extended) compiled once: exact names are a
+    dict lookup, the substring fallback is a single regex and results are
+    memoized per distinct input name.
+    """
+
+    def __init__(self, extra_mapping: Optional[Dict[str, Optional[str]]] = None):
+        self.mapping = dict(PROTOCOL_MAPPING)
+        for key, value in (extra_mapping or {}).items():
+            self.mapping[key.upper().strip()] = value
+        # Tenant entries take priority over the built-in ones in the
+        # substring match, like in the exact one
+        keys = [key.upper().strip() for key in (extra_mapping or {})]
+        keys += [key for key in PROTOCOL_MAPPING if key not in keys]
+        self._priority = {key: index for index, key in enumerate(keys) if self.mapping[key]}
+        # A lookahead finds the keys at every position (also overlapping);
+        # at a position the alternation picks the key that comes first
+        alternatives = "|".join(re.escape(key) for key in self._priority)
+        self._substring = re.compile(f"(?=({alternatives}))") if alternatives else None
+        self._cache: Dict[str, Optional[str]] = {}
+
+    def _normalize(self, protocol_name: str) -> Optional[str]:
+        protocol_name = protocol_name.upper().strip()
+        # Controlla prima la mappa esatta
+        if protocol_name in self.mapping:
+            return self.mapping[protocol_name]
+        # Controlla se contiene uno dei protocolli industriali come substring
+        if self._substring is not None:
+            found = [match.group(1) for match in self._substring.finditer(protocol_name)]
+            if found:
+                return self.mapping[min(found, key=self._priority.__getitem__)]
+        # Se non trova corrispondenze, restituisce il nome originale
+        # (se non e' un protocollo di base)
+        if protocol_name not in BASE_PROTOCOLS:
+            return protocol_name
+        return None
+
+    def __call__(self, protocol_name) -> Optional[str]:
+        if not protocol_name:
+            return None
+        try:
+            return self._cache[protocol_name]
+        except KeyError:
+            pass
+        result = self._normalize(protocol_name)
+        if len(self._cache) >= NORMALIZE_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[protocol_name] = result
+        return result
+
+
+_default_normalizer = ProtocolNormalizer()
 
 
 def normalize_protocol(protocol_name):
@@ -10,171 +173,136 @@ def normalize_protocol(protocol_name):
     Normalizza i nomi dei protocolli estratti dal PCAP per corrispondere
     alle opzioni standard del form di modifica asset.
     """
-    if not protocol_name:
-        return None
-    
-    protocol_name = protocol_name.upper().strip()
-    
-    # Mappa dei protocolli industriali comuni
-    protocol_mapping = {
-        # Protocolli Modbus
-        'MODBUS': 'Modbus',
-        'MODBUS-TCP': 'Modbus',
-        'MODBUS-RTU': 'Modbus',
-        'MODBUS-ASCII': 'Modbus',
-        
-        # Protocolli Profinet
-        'PROFINET': 'Profinet',
-        'PN': 'Profinet',
-        'PROFINET-IO': 'Profinet',
-        
-        # Protocolli OPC
-        'OPC-UA': 'OPC-UA',
-        'OPCUA': 'OPC-UA',
-        'OPC': 'OPC-UA',
-        
-        # Protocolli EtherNet/IP
-        'ETHERNET/IP': 'EtherNet/IP',
-        'ETHERNETIP': 'EtherNet/IP',
-        'ENIP': 'EtherNet/IP',
-        'CIP': 'EtherNet/IP',
-        
-        # Protocolli BACnet
-        'BACNET': 'BACnet',
-        'BACNET-IP': 'BACnet',
-        'BACNET-MSTP': 'BACnet',
-        
-        # Protocolli DNP3
-        'DNP3': 'DNP3',
-        'DNP': 'DNP3',
-        
-        # Protocolli KNX
-        'KNX': 'KNX',
-        'KNXNET': 'KNX',
-        
-        # Protocolli M-Bus
-        'M-BUS': 'M-Bus',
-        'MBUS': 'M-Bus',
-        
-        # Protocolli IEC 61850
-        'IEC61850': 'IEC 61850',
-        'IEC-61850': 'IEC 61850',
-        'MMS': 'IEC 61850',  # Manufacturing Message Specification
-        
-        # Protocolli S7
-        'S7': 'S7',
-        'S7COMM': 'S7',
-        'S7-PROTOCOL': 'S7',
-        
-        # Protocolli MQTT
-        'MQTT': 'MQTT',
-        'MQTT-SN': 'MQTT',
-        
-        # Protocolli HTTP/HTTPS (per sistemi SCADA web)
-        'HTTP': 'Other',
-        'HTTPS': 'Other',
-        
-        # Protocolli FTP
-        'FTP': 'Other',
-        'FTPS': 'Other',
-        'SFTP': 'Other',
-        
-        # Protocolli SSH/Telnet
-        'SSH': 'Other',
-        'TELNET': 'Other',
-        
-        # Protocolli SNMP
-        'SNMP': 'Other',
-        'SNMPV1': 'Other',
-        'SNMPV2': 'Other',
-        'SNMPV3': 'Other',
-        
-        # Protocolli DNS/DHCP
-        'DNS': 'Other',
-        'DHCP': 'Other',
-        
-        # Protocolli di base (non industriali)
-        'TCP': None,
-        'UDP': None,
-        'IP': None,
-        'ARP': None,
-        'ICMP': None,
-        'ICMPV6': None,
-        'IPV6': None,
-    }
-    
-    # Controlla prima la mappa esatta
-    if protocol_name in protocol_mapping:
-        return protocol_mapping[protocol_name]
-    
-    # Controlla se contiene uno dei protocolli industriali come substring
-    for key, value in protocol_mapping.items():
-        if key in protocol_name and value:
-            return value
-    
-    # Se non trova corrispondenze, restituisce il nome originale
-                    # but only if it's not a base protocol (TCP, UDP, etc.)
-    if protocol_name not in ['TCP', 'UDP', 'IP', 'ARP', 'ICMP', 'ICMPV6', 'IPV6']:
-        return protocol_name
-    
-    return None
-
-
-def _parse_pcap_worker(pcap_path, queue):
-    cap = pyshark.FileCapture(pcap_path, keep_packets=False)
-    cap.load_packets()
-
-    devices = defaultdict(lambda: {"ips": set(), "protocols": set()})
-    communications = defaultdict(
-        lambda: defaultdict(int)
-    )  # src_mac -> dst_mac -> count
-
-    for pkt in cap:
-        try:
-            eth = pkt.eth
-            src_mac = eth.src.upper()
-            dst_mac = eth.dst.upper()
-            ip = None
-            if hasattr(pkt, "ip"):
-                ip = pkt.ip.src
-
-            # aggiorna devices
-            if ip:
-                devices[src_mac]["ips"].add(ip)
-            
-            # Normalizza il protocollo prima di aggiungerlo
-            proto = pkt.highest_layer
-            normalized_proto = normalize_protocol(proto)
-            if normalized_proto:
-                devices[src_mac]["protocols"].add(normalized_proto)
-
-            # traccia comunicazione tra src e dst MAC
-            communications[src_mac][dst_mac] += 1
-        except AttributeError:
-            continue
-
-    cap.close()
-
-    # Converti set in lista prima di restituire
-    for mac in devices:
-        devices[mac]["ips"] = list(devices[mac]["ips"])
-        devices[mac]["protocols"] = list(devices[mac]["protocols"])
-
-    queue.put((dict(devices), dict(communications)))
+    return _default_normalizer(protocol_name)
+
+
+_tenant_normalizers: Dict[tuple, ProtocolNormalizer] = {}
+
+
+def get_protocol_normalizer(extra_mapping: Optional[Dict[str, Optional[str]]] = None) -> ProtocolNormalizer:
+    """
+    Normalizer with the tenant entries (Tenant.settings["protocol_mapping"])
+    on top of PROTOCOL_MAPPING, compiled once per distinct extension.
+    """
+    if not extra_mapping:
+        return _default_normalizer
+    key = tuple(sorted(extra_mapping.items(), key=lambda item: item[0]))
+    normalizer = _tenant_normalizers.get(key)
+    if normalizer is None:
+        if len(_tenant_normalizers) >= 256:
+            _tenant_normalizers.clear()
+        normalizer = _tenant_normalizers[key] = ProtocolNormalizer(extra_mapping)
+    return normalizer
+
+
+def tenant_protocol_normalizer(db, tenant_id) -> ProtocolNormalizer:
+    """Normalizer of a tenant, from its settings"""
+    from app.models import Tenant
+
+    settings_ = db.query(Tenant.settings).filter(Tenant.id == tenant_id).scalar() or {}
+    return get_protocol_normalizer(settings_.get("protocol_mapping"))
 
 
 def extract_assets_and_communications_from_pcap(pcap_path):
     """
-    Estrae da un file pcap la lista di dispositivi rilevati.
-    Restituisce un dizionario con MAC address come chiavi.
+    Estrae da un file pcap / pcapng la lista di dispositivi rilevati.
+    Restituisce (devices, communications) con MAC address come chiavi.
+    Il file viene letto in streaming (vedi services/pcap_reader.py).
+    """
+    return summarize(aggregate_pcap_file(pcap_path), normalize_protocol)
+
+
+# progress(bytes, packets) is called after every parsed file / byte range
+ProgressCallback = Callable[[int, int], None]
+
+
+def aggregate_pcap_files(
+    paths: List[str],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> List[Counter]:
     """
-    queue = Queue()
-    proc = Process(target=_parse_pcap_worker, args=(pcap_path, queue))
-    proc.start()
-    proc.join()
-
-    if not queue.empty():
-        devices, communications = queue.get()
-        return devices, communications
-    else:
-        return {}, {}
+    Aggregate several captures in a process pool: every file, and every
+    chunk_size byte range of the large ones, is a separate task. The
+    per-range counters are reduced here into one counter per path.
+    """
+    from app.config import settings
+
+    workers = workers or settings.PCAP_PARSE_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or settings.PCAP_CHUNK_MB * 1024 * 1024
+    tasks = []
+    for index, path in enumerate(paths):
+        size = os.path.getsize(path)
+        if size <= chunk_size:
+            tasks.append((index, path, None, None, size))
+        else:
+            tasks.extend(
+                (index, path, state, end, end - state[3])
+                for end, state in split_pcap_file(path, chunk_size)
+            )
+
+    results = [Counter() for _ in paths]
+    if workers <= 1 or len(tasks) <= 1:
+        for index, path, state, end, size in tasks:
+            partial = aggregate_pcap_file(path, None, state, end)
+            results[index].update(partial)
+            if progress:
+                progress(size, sum(partial.values()))
+        return results
+
+    # spawn: the workers only import the reader, never the app state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as pool:
+        futures = {
+            pool.submit(aggregate_pcap_file, path, None, state, end): (index, size)
+            for index, path, state, end, size in tasks
+        }
+        for future in as_completed(futures):
+            index, size = futures[future]
+            partial = future.result()
+            results[index].update(partial)
+            if progress:
+                progress(size, sum(partial.values()))
+    return results
+
+
+# Aggregates of recently parsed captures by content digest: the preview and
+# the upload of the same files parse them only once
+_aggregate_cache: "OrderedDict[str, Counter]" = OrderedDict()
+_aggregate_cache_lock = threading.Lock()
+AGGREGATE_CACHE_SIZE = 32
+
+
+def aggregate_pcap_files_cached(
+    files: Dict[str, str], progress: Optional[ProgressCallback] = None
+) -> Counter:
+    """
+    Merged aggregate of {path: content digest}, parsing only the captures
+    whose digest is not cached (cached ones are reported to progress at once).
+    """
+    with _aggregate_cache_lock:
+        cached = {digest: _aggregate_cache.get(digest) for digest in files.values()}
+    missing = {}
+    for path, digest in files.items():
+        if cached[digest] is None and digest not in missing.values():
+            missing[path] = digest
+    if progress:
+        for path, digest in files.items():
+            if path not in missing and cached[digest] is not None:
+                progress(os.path.getsize(path), sum(cached[digest].values()))
+    if missing:
+        counters = aggregate_pcap_files(list(missing), progress=progress)
+        for digest, counter in zip(missing.values(), counters):
+            cached[digest] = counter
+    with _aggregate_cache_lock:
+        for digest in files.values():
+            _aggregate_cache[digest] = cached[digest]
+            _aggregate_cache.move_to_end(digest)
+        while len(_aggregate_cache) > AGGREGATE_CACHE_SIZE:
+            _aggregate_cache.popitem(last=False)
+
+    total = Counter()
+    for digest in files.values():
+        total.update(cached[digest])
+    return total
@@ -0,0 +1,289 @@
+# backend/services/pcap_reader.py
+"""
+Streaming pcap / pcapng reader.
+
+The capture is mmap-ed and walked record by record with precompiled
+struct formats: only the Ethernet, VLAN, IPv4 and TCP/UDP header fields
+needed by the PCAP import are decoded, and packets are folded into a
+small counter as they are read, so memory does not grow with the capture.
+"""
+from collections import Counter
+from typing import Iterator, List, Tuple
+import mmap
+import socket
+import struct
+
+from app.services.protocol_classifier import FlowMemo, classify_ethertype, classify_tcp, classify_udp
+
+# Link type of the captures we can decode (pyshark exposes pkt.eth only for these)
+LINKTYPE_ETHERNET = 1
+
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_INTERFACE_DESCRIPTION = 1
+PCAPNG_PACKET = 2
+PCAPNG_SIMPLE_PACKET = 3
+PCAPNG_ENHANCED_PACKET = 6
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+
+class PcapFormatError(ValueError):
+    """The file is not a pcap / pcapng capture"""
+
+
+def capture_state(buf) -> tuple:
+    """
+    Decoding state at the first record of a capture:
+    ("pcap", endian, linktype, offset) or ("pcapng", endian, linktypes, offset)
+    """
+    if len(buf) >= 4 and struct.unpack_from("<I", buf, 0)[0] == PCAPNG_SECTION_HEADER:
+        return ("pcapng", "<", (), 0)
+    if len(buf) < 24:
+        raise PcapFormatError("truncated pcap header")
+    magic = struct.unpack_from("<I", buf, 0)[0]
+    if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        endian = "<"
+    elif struct.unpack_from(">I", buf, 0)[0] in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        endian = ">"
+    else:
+        raise PcapFormatError("unknown capture format")
+    linktype = struct.unpack_from(endian + "I", buf, 20)[0] & 0x0FFFFFFF
+    return ("pcap", endian, linktype, 24)
+
+
+def split_capture(buf, chunk_size: int) -> List[Tuple[int, tuple]]:
+    """
+    Cut a capture into ranges of about chunk_size bytes, on record / block
+    boundaries. Only the record headers are read. Return (end, state) pairs:
+    each range starts at state[3] and can be decoded on its own with
+    iter_frames(buf, state, end).
+    """
+    state = capture_state(buf)
+    kind, endian, link, offset = state
+    end = len(buf)
+    ranges = []
+    start_state = state
+    next_cut = offset + chunk_size
+    if kind == "pcap":
+        record = struct.Struct(endian + "8xI").unpack_from
+        while offset + 16 <= end:
+            offset += 16 + record(buf, offset)[0]
+            if offset >= next_cut and offset < end:
+                ranges.append((offset, start_state))
+                start_state = (kind, endian, link, offset)
+                next_cut = offset + chunk_size
+    else:
+        linktypes = list(link)
+        while offset + 12 <= end:
+            block_type = struct.unpack_from(endian + "I", buf, offset)[0]
+            if block_type == PCAPNG_SECTION_HEADER:
+                bom = struct.unpack_from("<I", buf, offset + 8)[0]
+                endian = "<" if bom == PCAPNG_BYTE_ORDER_MAGIC else ">"
+                linktypes = []
+            block_len = struct.unpack_from(endian + "I", buf, offset + 4)[0]
+            if block_len < 12:
+                break
+            if block_type == PCAPNG_INTERFACE_DESCRIPTION:
+                linktypes.append(struct.unpack_from(endian + "H", buf, offset + 8)[0])
+            offset += block_len
+            if offset >= next_cut and offset < end:
+                ranges.append((offset, start_state))
+                start_state = (kind, endian, tuple(linktypes), offset)
+                next_cut = offset + chunk_size
+    ranges.append((end, start_state))
+    return ranges
+
+
+def iter_frames(buf, state: tuple = None, end: int = None) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yield (linktype, offset, caplen) for every packet of a pcap or pcapng
+    capture held in buf (bytes or mmap), optionally only of the range
+    [state[3], end) produced by split_capture. Truncated trailing records
+    are ignored.
+    """
+    if state is None:
+        if len(buf) < 4:
+            return
+        state = capture_state(buf)
+    end = len(buf) if end is None else end
+    kind, endian, link, offset = state
+    if kind == "pcap":
+        yield from _iter_pcap(buf, endian, link, offset, end)
+    else:
+        yield from _iter_pcapng(buf, endian, list(link), offset, end)
+
+
+def _iter_pcap(buf, endian, linktype, offset, end) -> Iterator[Tuple[int, int, int]]:
+    record = struct.Struct(endian + "8xI4x").unpack_from
+    while offset + 16 <= end:
+        (caplen,) = record(buf, offset)
+        offset += 16
+        if offset + caplen > end:
+            return
+        yield linktype, offset, caplen
+        offset += caplen
+
+
+def _iter_pcapng(buf, endian, linktypes, offset, end) -> Iterator[Tuple[int, int, int]]:
+    while offset + 12 <= end:
+        block_type = struct.unpack_from(endian + "I", buf, offset)[0]
+        if block_type == PCAPNG_SECTION_HEADER:
+            # Each section declares its own byte order and interfaces
+            bom = struct.unpack_from("<I", buf, offset + 8)[0]
+            endian = "<" if bom == PCAPNG_BYTE_ORDER_MAGIC else ">"
+            linktypes = []
+        block_len = struct.unpack_from(endian + "I", buf, offset + 4)[0]
+        if block_len < 12 or offset + block_len > end:
+            return
+        body = offset + 8
+        if block_type == PCAPNG_ENHANCED_PACKET:
+            interface_id, caplen = struct.unpack_from(endian + "I8xI", buf, body)
+            if interface_id < len(linktypes):
+                yield linktypes[interface_id], body + 20, caplen
+        elif block_type == PCAPNG_SIMPLE_PACKET:
+            (orig_len,) = struct.unpack_from(endian + "I", buf, body)
+            if linktypes:
+                yield linktypes[0], body + 4, min(orig_len, block_len - 16)
+        elif block_type == PCAPNG_PACKET:
+            interface_id, caplen = struct.unpack_from(endian + "H10xI", buf, body)
+            if interface_id < len(linktypes):
+                yield linktypes[interface_id], body + 20, caplen
+        elif block_type == PCAPNG_INTERFACE_DESCRIPTION:
+            linktypes.append(struct.unpack_from(endian + "H", buf, body)[0])
+        offset += block_len
+
+
+_ETH_TYPE = struct.Struct("!H").unpack_from
+_IPV4_HEADER = struct.Struct("!BxH2xHxB2x4s").unpack_from  # ihl, total length, frag, proto, src
+_PORTS = struct.Struct("!HH").unpack_from
+
+
+def aggregate_frames(
+    buf, counter: Counter = None, state: tuple = None, end: int = None
+) -> Counter:
+    """
+    Fold the Ethernet frames of a capture (or of a split_capture range)
+    into a Counter keyed by
+    (dst_mac + src_mac bytes, src IPv4 bytes or None, protocol or None).
+    The counter is small (one key per distinct tuple) and can be summed
+    with the counters of other captures or ranges.
+    """
+    counter = Counter() if counter is None else counter
+    # Protocol of the TCP/UDP flows already classified from their payload
+    tcp_flows = FlowMemo()
+    udp_flows = FlowMemo()
+    for linktype, offset, caplen in iter_frames(buf, state, end):
+        if linktype != LINKTYPE_ETHERNET or caplen < 14:
+            continue
+        macs = buf[offset : offset + 12]
+        ethertype = _ETH_TYPE(buf, offset + 12)[0]
+        l3 = offset + 14
+        limit = offset + caplen
+        while ethertype in ETHERTYPE_VLAN and l3 + 4 <= limit:
+            ethertype = _ETH_TYPE(buf, l3 + 2)[0]
+            l3 += 4
+        src_ip = None
+        protocol = None
+        if ethertype == ETHERTYPE_IPV4:
+            if l3 + 20 <= limit:
+                version_ihl, total_length, frag, ip_proto, src_ip = _IPV4_HEADER(buf, l3)
+                l4 = l3 + (version_ihl & 0x0F) * 4
+                # Ethernet padding is not part of the IP payload
+                ip_end = min(limit, l3 + total_length)
+                # Only the first fragment carries the transport header
+                if not frag & 0x1FFF and l4 + 4 <= ip_end:
+                    if ip_proto == IPPROTO_TCP:
+                        sport, dport = _PORTS(buf, l4)
+                        protocol = classify_tcp(buf, l4, ip_end, sport, dport, tcp_flows, src_ip)
+                    elif ip_proto == IPPROTO_UDP:
+                        sport, dport = _PORTS(buf, l4)
+                        protocol = classify_udp(buf, l4, ip_end, sport, dport, udp_flows, src_ip)
+        else:
+            protocol = classify_ethertype(ethertype)
+        counter[(macs, src_ip, protocol)] += 1
+    return counter
+
+
+def format_mac(raw: bytes) -> str:
+    return ":".join(f"{b:02X}" for b in raw)
+
+
+def summarize(counter: Counter, normalize=None) -> Tuple[dict, dict]:
+    """
+    Turn an aggregate_frames counter into the PCAP import dicts:
+    - devices: {src_mac: {"ips": [...], "protocols": [...]}}
+    - communications: {src_mac: {dst_mac: packet_count}}
+    normalize maps detected protocol names (None drops them).
+    """
+    devices = {}
+    communications = {}
+    protocol_names = {}
+    mac_names = {}
+    for (macs, src_ip, protocol), count in counter.items():
+        dst_raw, src_raw = bytes(macs[:6]), bytes(macs[6:])
+        src_mac = mac_names.get(src_raw) or mac_names.setdefault(src_raw, format_mac(src_raw))
+        dst_mac = mac_names.get(dst_raw) or mac_names.setdefault(dst_raw, format_mac(dst_raw))
+        dsts = communications.setdefault(src_mac, {})
+        dsts[dst_mac] = dsts.get(dst_mac, 0) + count
+
+        if protocol is not None and normalize is not None:
+            if protocol not in protocol_names:
+                protocol_names[protocol] = normalize(protocol)
+            protocol = protocol_names[protocol]
+        if src_ip is None and protocol is None:
+            continue
+        device = devices.setdefault(src_mac, {"ips": set(), "protocols": set()})
+        if src_ip is not None:
+            device["ips"].add(socket.inet_ntoa(src_ip))
+        if protocol is not None:
+            device["protocols"].add(protocol)
+
+    for device in devices.values():
+        device["ips"] = sorted(device["ips"])
+        device["protocols"] = sorted(device["protocols"])
+    return devices, communications
+
+
+class _MappedCapture:
+    """Read-only mmap of a capture file (None for an empty file)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        self.file = open(self.path, "rb")
+        try:
+            self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.buf = None
+            return None
+        if hasattr(self.buf, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.buf.madvise(mmap.MADV_SEQUENTIAL)
+        return self.buf
+
+    def __exit__(self, *exc):
+        if self.buf is not None:
+            self.buf.close()
+        self.file.close()
+
+
+def aggregate_pcap_file(
+    path: str, counter: Counter = None, state: tuple = None, end: int = None
+) -> Counter:
+    """aggregate_frames over a capture file (or a range of it), read through mmap"""
+    counter = Counter() if counter is None else counter
+    with _MappedCapture(path) as buf:
+        if buf is not None:
+            aggregate_frames(buf, counter, state, end)
+    return counter
+
+
+def split_pcap_file(path: str, chunk_size: int) -> List[Tuple[int, tuple]]:
+    """split_capture over a capture file (no ranges for an empty file)"""
+    with _MappedCapture(path) as buf:
+        return split_capture(buf, chunk_size) if buf is not None else []
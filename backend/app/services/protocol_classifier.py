@@ -0,0 +1,249 @@
+# backend/services/protocol_classifier.py
+"""
+Industrial protocol classifier used by the PCAP reader.
+
+A frame is classified from its EtherType, its TCP/UDP ports and the first
+bytes of its payload: payload signatures confirm (or correct) the
+well-known port, and recognize the protocols with a distinctive header on
+any port. Packets without payload (handshakes, ACKs) keep the port
+protocol. Names are the tokens normalize_protocol maps to the asset form
+options (MODBUS, S7COMM, ENIP, ...).
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import struct
+
+ETHERTYPE_PROTOCOLS = {
+    0x0806: "ARP",
+    0x86DD: "IPV6",
+    0x8892: "PROFINET",
+    0x88B8: "IEC61850",  # GOOSE
+    0x88BA: "IEC61850",  # Sampled Values
+}
+TCP_PORT_PROTOCOLS = {
+    502: "MODBUS",
+    102: "S7COMM",
+    44818: "ENIP",
+    20000: "DNP3",
+    4840: "OPCUA",
+    2404: "IEC104",
+    1883: "MQTT",
+    8883: "MQTT",
+    21: "FTP",
+    22: "SSH",
+    23: "TELNET",
+    53: "DNS",
+    80: "HTTP",
+    443: "HTTPS",
+    8080: "HTTP",
+}
+UDP_PORT_PROTOCOLS = {
+    47808: "BACNET",
+    2222: "ENIP",
+    44818: "ENIP",
+    20000: "DNP3",
+    3671: "KNXNET",
+    34962: "PROFINET",
+    34963: "PROFINET",
+    34964: "PROFINET",
+    53: "DNS",
+    67: "DHCP",
+    68: "DHCP",
+    161: "SNMP",
+    162: "SNMP",
+}
+
+# Port protocols whose payload is checked; on the other known ports
+# (HTTP, SSH, DNS, ...) the port is trusted and the payload not read
+INSPECTED_PROTOCOLS = frozenset({"MODBUS", "S7COMM", "ENIP", "DNP3", "OPCUA", "IEC104", "MQTT", "BACNET"})
+# Bytes of payload read for the signatures
+SIGNATURE_BYTES = 32
+# Flows whose protocol is remembered (least recently seen evicted first)
+FLOW_MEMO_SIZE = 65536
+
+ENIP_COMMANDS = frozenset({0x0004, 0x0063, 0x0064, 0x0065, 0x0066, 0x006F, 0x0070})
+OPCUA_MESSAGES = frozenset({b"HEL", b"ACK", b"OPN", b"MSG", b"CLO", b"ERR", b"RHE"})
+BVLC_FUNCTIONS = range(0x00, 0x0D)
+# TPKT payloads after the COTP header: S7comm and S7comm-plus protocol ids
+S7_PROTOCOL_IDS = (0x32, 0x72)
+COTP_DATA = 0xF0
+
+_U16_BE = struct.Struct("!H").unpack_from
+_U16_LE = struct.Struct("<H").unpack_from
+_U32_LE = struct.Struct("<I").unpack_from
+
+
+def _is_modbus(head: bytes, length: int) -> bool:
+    # MBAP: transaction id, protocol id 0, length of unit id + PDU
+    return (
+        length >= 8
+        and head[2] == 0
+        and head[3] == 0
+        and 2 <= _U16_BE(head, 4)[0] <= 254
+        and head[7] & 0x7F != 0
+    )
+
+
+def _tpkt_protocol(head: bytes, length: int) -> Optional[str]:
+    """TPKT + COTP (ISO-on-TCP): S7comm, or MMS (IEC 61850) on a data TPDU"""
+    if length < 7 or head[0] != 0x03 or head[1] != 0x00 or _U16_BE(head, 2)[0] < 7:
+        return None
+    cotp_end = 5 + head[4]
+    if head[5] != COTP_DATA or cotp_end >= len(head):
+        return "S7COMM"  # connection setup: keep the port protocol
+    return "S7COMM" if head[cotp_end] in S7_PROTOCOL_IDS else "MMS"
+
+
+def _is_enip(head: bytes, length: int) -> bool:
+    # 24 byte encapsulation header: command, length of the data that follows
+    return (
+        length >= 24
+        and _U16_LE(head, 0)[0] in ENIP_COMMANDS
+        and _U16_LE(head, 2)[0] == length - 24
+    )
+
+
+def _is_dnp3(head: bytes, length: int) -> bool:
+    # Link layer: start bytes 0x05 0x64, length >= 5
+    return length >= 10 and head[0] == 0x05 and head[1] == 0x64 and head[2] >= 5
+
+
+def _is_opcua(head: bytes, length: int) -> bool:
+    # UA TCP: message type, chunk type, message size
+    return (
+        length >= 8
+        and bytes(head[:3]) in OPCUA_MESSAGES
+        and head[3] in b"FCA"
+        and _U32_LE(head, 4)[0] >= 8
+    )
+
+
+def _is_iec104(head: bytes, length: int) -> bool:
+    # APCI: start byte 0x68, APDU length >= 4
+    return length >= 6 and head[0] == 0x68 and 4 <= head[1] <= 253
+
+
+def _is_mqtt_connect(head: bytes, length: int) -> bool:
+    # CONNECT fixed header, remaining length (varint), protocol name
+    if length < 10 or head[0] != 0x10:
+        return False
+    position = 1
+    while position < 5 and head[position] & 0x80:
+        position += 1
+    name = bytes(head[position + 1 : position + 9])
+    return name.startswith(b"\x00\x04MQTT") or name.startswith(b"\x00\x06MQIsdp")
+
+
+def _is_bacnet(head: bytes, length: int) -> bool:
+    # BVLC: type 0x81, function, length of the whole BVLL message
+    return length >= 4 and head[0] == 0x81 and head[1] in BVLC_FUNCTIONS and _U16_BE(head, 2)[0] == length
+
+
+class FlowMemo(OrderedDict):
+    """
+    Protocol found on the first payload of each (src, sport, dport) flow,
+    bounded to max_size flows so memory stays constant on long captures
+    """
+
+    def __init__(self, max_size: int = FLOW_MEMO_SIZE):
+        super().__init__()
+        self.max_size = max_size
+
+    def lookup(self, key):
+        # (found, protocol): the protocol of a known flow may be None
+        if key not in self:
+            return False, None
+        self.move_to_end(key)
+        return True, self[key]
+
+    def remember(self, key, protocol: Optional[str]) -> None:
+        self[key] = protocol
+        if len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+def _tcp_signature(head: bytes, length: int, port_protocol: Optional[str]) -> Optional[str]:
+    if port_protocol == "MODBUS" and _is_modbus(head, length):
+        return "MODBUS"
+    if port_protocol == "IEC104" and _is_iec104(head, length):
+        return "IEC104"
+    # TPKT is also RDP's transport: only trusted on the ISO-TSAP port
+    if port_protocol == "S7COMM" and head[0] == 0x03:
+        protocol = _tpkt_protocol(head, length)
+        if protocol:
+            return protocol
+    if _is_enip(head, length):
+        return "ENIP"
+    if _is_dnp3(head, length):
+        return "DNP3"
+    if _is_opcua(head, length):
+        return "OPCUA"
+    if _is_mqtt_connect(head, length):
+        return "MQTT"
+    return None
+
+
+def _udp_signature(head: bytes, length: int, port_protocol: Optional[str]) -> Optional[str]:
+    if _is_bacnet(head, length):
+        return "BACNET"
+    if _is_enip(head, length):
+        return "ENIP"
+    if _is_dnp3(head, length):
+        return "DNP3"
+    return None
+
+
+def classify_tcp(
+    buf, l4: int, end: int, sport: int, dport: int, flows: FlowMemo = None, src=None
+) -> Optional[str]:
+    """
+    Protocol of a TCP segment whose header starts at l4 (IP payload ends at
+    end). With a FlowMemo, the protocol found on the first payload of a
+    (src, sport, dport) flow is reused for its following segments.
+    """
+    port_protocol = TCP_PORT_PROTOCOLS.get(dport) or TCP_PORT_PROTOCOLS.get(sport)
+    if port_protocol is not None and port_protocol not in INSPECTED_PROTOCOLS:
+        return port_protocol
+    if flows is not None:
+        key = (src, sport, dport)
+        found, protocol = flows.lookup(key)
+        if found:
+            return protocol
+    if l4 + 13 > end:
+        return port_protocol
+    payload = l4 + (buf[l4 + 12] >> 4) * 4
+    length = end - payload
+    if length < 4:
+        return port_protocol
+    protocol = _tcp_signature(buf[payload : payload + SIGNATURE_BYTES], length, port_protocol) or port_protocol
+    if flows is not None:
+        flows.remember(key, protocol)
+    return protocol
+
+
+def classify_udp(
+    buf, l4: int, end: int, sport: int, dport: int, flows: FlowMemo = None, src=None
+) -> Optional[str]:
+    """Protocol of a UDP datagram whose header starts at l4, see classify_tcp"""
+    port_protocol = UDP_PORT_PROTOCOLS.get(dport) or UDP_PORT_PROTOCOLS.get(sport)
+    if port_protocol is not None and port_protocol not in INSPECTED_PROTOCOLS:
+        return port_protocol
+    if flows is not None:
+        key = (src, sport, dport)
+        found, protocol = flows.lookup(key)
+        if found:
+            return protocol
+    payload = l4 + 8
+    length = end - payload
+    if length < 4:
+        return port_protocol
+    protocol = _udp_signature(buf[payload : payload + SIGNATURE_BYTES], length, port_protocol) or port_protocol
+    if flows is not None:
+        flows.remember(key, protocol)
+    return protocol
+
+
+def classify_ethertype(ethertype: int) -> Optional[str]:
+    """Protocol of a non-IPv4 frame (Profinet RT, GOOSE, ARP, ...)"""
+    return ETHERTYPE_PROTOCOLS.get(ethertype)
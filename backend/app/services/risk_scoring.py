@@ -1,6 +1,21 @@
 # backend/app/services/risk_scoring.py
+from collections import Counter
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence
+import logging
+import threading
+import uuid
+
+import numpy as np
+from sqlalchemy import Float, column, event, inspect, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Selectable
+
+from app.services.asset_graph import AssetAdjacency, neighbour_ids_select
+
+
+logger = logging.getLogger(__name__)
 
 
 class CompositeRiskScoringEngine:
@@ -26,6 +41,7 @@ class CompositeRiskScoringEngine:
             "connections_count": "{n} connections (+{add})",
             "business_criticality": "Business criticality: {crit} ({score})",
             "purdue_low": "Low Purdue (+2)",
+            "connected_to_critical": "Connected to a critical asset (+1)",
             "missing_business_criticality": "Missing business criticality: cannot calculate risk.",
             "suggest_disable_remote": "Disable remote access if not needed.",
             "suggest_avoid_unattended": "Avoid unattended remote access.",
@@ -43,6 +59,7 @@ class CompositeRiskScoringEngine:
             "connections_count": "{n} connessioni (+{add})",
             "business_criticality": "Criticità business: {crit} ({score})",
             "purdue_low": "Purdue basso (+2)",
+            "connected_to_critical": "Connesso a un asset critico (+1)",
             "missing_business_criticality": "Criticità business mancante: impossibile calcolare il rischio.",
             "suggest_disable_remote": "Disabilita l’accesso remoto se non necessario.",
             "suggest_avoid_unattended": "Evita accesso remoto unattended.",
@@ -69,7 +86,15 @@ class CompositeRiskScoringEngine:
         },
     }
 
-    def calculate(self, asset, language="en") -> Dict[str, Any]:
+    def calculate(
+        self, asset, language="en", graph_features: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Score a single asset. graph_features come from
+        AssetAdjacency.features_of; without them the asset is scored as if
+        it had no links.
+        """
+        graph_features = graph_features or {}
         translations = self.TRANSLATIONS.get(language, self.TRANSLATIONS["en"])
         crit_trans = self.CRIT_TRANSLATIONS.get(language, self.CRIT_TRANSLATIONS["en"])
         missing = []
@@ -97,13 +122,13 @@ class CompositeRiskScoringEngine:
         # Purdue "inappropriato"
         purdue = getattr(asset, "purdue_level", None)
         if purdue is not None:
-            if purdue in [0, 1] and self._has_direct_high_level_connection(asset):
+            if purdue in [0, 1] and self._has_direct_high_level_connection(graph_features):
                 vuln_score += 3
                 vuln_break.append(translations["purdue_low_high_connection"])
         else:
             missing.append("purdue_level")
         # Numero connessioni
-        n_conn = len(getattr(asset, "connections", []) or [])
+        n_conn = int(graph_features.get("connection_count", 0))
         if n_conn:
             add_conn = n_conn // 5
             vuln_score += add_conn
@@ -111,7 +136,6 @@ class CompositeRiskScoringEngine:
                 vuln_break.append(
                     translations["connections_count"].format(n=n_conn, add=add_conn)
                 )
-        # TODO: connessioni a asset critici
         # --- Impatto ---
         imp_score = None
         imp_break = []
@@ -138,7 +162,10 @@ class CompositeRiskScoringEngine:
             if purdue in [0, 1, 2]:
                 imp_score += 2
                 imp_break.append(translations["purdue_low"])
-        # Dipendenze critiche (placeholder: nessuna logica, da implementare)
+        # Dipendenze critiche
+        if imp_score is not None and graph_features.get("connected_to_critical"):
+            imp_score += 1
+            imp_break.append(translations["connected_to_critical"])
         # --- Operativo ---
         oper_score = imp_score
         oper_break = [*imp_break]
@@ -167,7 +194,7 @@ class CompositeRiskScoringEngine:
             suggestions.append(translations["suggest_avoid_unattended"])
         if phys == "easy":
             suggestions.append(translations["suggest_harden_physical"])
-        if purdue in [0, 1] and self._has_direct_high_level_connection(asset):
+        if purdue in [0, 1] and self._has_direct_high_level_connection(graph_features):
             suggestions.append(translations["suggest_isolate_purdue"])
         if n_conn > 10:
             suggestions.append(translations["suggest_reduce_connections"])
@@ -189,7 +216,349 @@ class CompositeRiskScoringEngine:
         }
         return breakdown
 
-    def _has_direct_high_level_connection(self, asset) -> bool:
-        # Placeholder: implementa logica reale se hai info sulle connessioni
-        # Es: controlla se asset.connections contiene asset con purdue_level >= 4
-        return False
+    def calculate_batch(
+        self,
+        remote_access: Sequence,
+        remote_access_type: Sequence,
+        physical_access_ease: Sequence,
+        purdue_level: Sequence,
+        business_criticality: Sequence,
+        connection_counts: Optional[Sequence] = None,
+        high_level_connection: Optional[Sequence] = None,
+        connected_to_critical: Optional[Sequence] = None,
+    ) -> np.ndarray:
+        """
+        Vectorized equivalent of calculate(...)["final_score"] over column
+        arrays (one element per asset). No breakdown or translations are
+        built. The graph feature columns come from AssetAdjacency.features.
+        Returns a float array with NaN where the score is undefined.
+        """
+        n = len(remote_access)
+        remote = np.array([bool(v) for v in remote_access], dtype=bool)
+        unattended = remote & (np.asarray(remote_access_type, dtype=object) == "unattended")
+        phys = np.asarray(physical_access_ease, dtype=object)
+        purdue = np.array(
+            [np.nan if v is None else float(v) for v in purdue_level], dtype=float
+        )
+        n_conn = (
+            np.zeros(n, dtype=np.int64)
+            if connection_counts is None
+            else np.asarray(connection_counts, dtype=np.int64)
+        )
+        high_conn = (
+            np.zeros(n, dtype=bool)
+            if high_level_connection is None
+            else np.asarray(high_level_connection, dtype=bool)
+        )
+        critical_peer = (
+            np.zeros(n, dtype=bool)
+            if connected_to_critical is None
+            else np.asarray(connected_to_critical, dtype=bool)
+        )
+
+        # --- Vulnerabilities ---
+        low_purdue = (purdue == 0) | (purdue == 1)
+        vuln = (
+            1
+            + 2 * remote
+            + 2 * unattended
+            + 3 * (phys == "easy")
+            + 1 * (phys == "medium")
+            + 3 * (low_purdue & high_conn)
+            + n_conn // 5
+        )
+        vuln = np.clip(vuln, 1, 10)
+
+        # --- Impatto / Operativo ---
+        crit_lookup = self._crit_lookup()
+        imp = np.array(
+            [crit_lookup.get(str(c).lower(), 0) if c else 0 for c in business_criticality],
+            dtype=np.int64,
+        )
+        defined = imp > 0
+        imp = imp + 2 * ((purdue == 0) | (purdue == 1) | (purdue == 2)) + critical_peer
+        imp = np.clip(imp, 1, 10)
+
+        # Final scores only take 10x10 values: use a table built with the
+        # scalar formula, so that rounding matches calculate() exactly
+        scores = self._final_score_table()[vuln, imp]
+        scores[~defined] = np.nan
+        return scores
+
+    def _crit_lookup(self) -> Dict[str, int]:
+        lookup = dict(self.CRIT_MAP)
+        for key, translated in self.CRIT_TRANSLATIONS["it"].items():
+            lookup.setdefault(translated, self.CRIT_MAP[key])
+        return lookup
+
+    def _final_score_table(self) -> np.ndarray:
+        table = np.full((11, 11), np.nan)
+        for vuln in range(1, 11):
+            for imp in range(1, 11):
+                table[vuln, imp] = round(
+                    self.VULN_WEIGHT * vuln
+                    + self.IMPACT_WEIGHT * imp
+                    + self.OPER_WEIGHT * imp,
+                    2,
+                )
+        return table
+
+    def _has_direct_high_level_connection(self, graph_features: Dict[str, Any]) -> bool:
+        # Un vicino a livello Purdue >= HIGH_PURDUE_LEVEL (vedi AssetAdjacency)
+        return bool(graph_features.get("high_level_connection"))
+
+
+RISK_UPDATE_BATCH_SIZE = 5000
+# Asset columns read by CompositeRiskScoringEngine: changing any of them
+# marks the asset for rescoring
+RISK_INPUT_FIELDS = (
+    "remote_access",
+    "remote_access_type",
+    "physical_access_ease",
+    "purdue_level",
+    "business_criticality",
+)
+# Asset columns read by the graph features of its neighbours: changing any
+# of them marks the neighbours for rescoring
+NEIGHBOUR_INPUT_FIELDS = ("purdue_level", "business_criticality", "deleted_at")
+
+
+def _rescore_assets(
+    db: Session, tenant_id: uuid.UUID, asset_ids: Optional[Sequence[uuid.UUID]] = None
+) -> Dict[str, int]:
+    """
+    Rescore the active assets of a tenant (optionally only asset_ids) with
+    calculate_batch and write the changed scores back with bulk
+    UPDATE ... FROM (VALUES ...) statements. Does not commit.
+    """
+    from app.models import Asset
+    from app.services.asset_stats import apply_asset_stats_delta, risk_band
+
+    scope = [Asset.tenant_id == tenant_id, Asset.deleted_at == None]
+    if asset_ids is not None:
+        scope.append(Asset.id.in_(list(asset_ids)))
+
+    # Clear the dirty flag before reading the inputs: the UPDATE locks the
+    # rows, so a concurrent change commits after it and re-marks the asset
+    db.execute(
+        update(Asset)
+        .where(*scope, Asset.risk_score_dirty == True)
+        .values(risk_score_dirty=False, updated_at=Asset.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.query(
+        Asset.id,
+        Asset.risk_score,
+        Asset.remote_access,
+        Asset.remote_access_type,
+        Asset.physical_access_ease,
+        Asset.purdue_level,
+        Asset.business_criticality,
+    ).filter(*scope).all()
+    if not rows:
+        return {"updated_count": 0, "total_count": 0}
+
+    ids, old_scores, *columns = zip(*rows)
+    # One adjacency load per scoring run, shared by the whole batch; a
+    # subset only needs the links of its own assets
+    graph = AssetAdjacency.load(db, tenant_id, None if asset_ids is None else ids).features(ids)
+    new_scores = CompositeRiskScoringEngine().calculate_batch(
+        *columns,
+        connection_counts=graph["connection_count"],
+        high_level_connection=graph["high_level_connection"],
+        connected_to_critical=graph["connected_to_critical"],
+    )
+
+    changed = []
+    stats_delta = Counter()
+    for asset_id, old, new in zip(ids, old_scores, new_scores.tolist()):
+        if np.isnan(new) or old == new:
+            continue
+        changed.append((asset_id, new))
+        stats_delta[(tenant_id, "risk_band", risk_band(old))] -= 1
+        stats_delta[(tenant_id, "risk_band", risk_band(new))] += 1
+
+    now = datetime.utcnow()
+    for start in range(0, len(changed), RISK_UPDATE_BATCH_SIZE):
+        batch = values(
+            column("id", UUID(as_uuid=True)), column("score", Float), name="scores"
+        ).data(changed[start : start + RISK_UPDATE_BATCH_SIZE])
+        db.execute(
+            update(Asset)
+            .where(Asset.id == batch.c.id)
+            # A rescore is not an edit of the asset: keep updated_at
+            .values(risk_score=batch.c.score, last_risk_assessment=now, updated_at=Asset.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    apply_asset_stats_delta(db.connection(), stats_delta)
+    return {"updated_count": len(changed), "total_count": len(rows)}
+
+
+def recalculate_risk_scores(
+    db: Session, tenant_id: uuid.UUID, asset_ids: Optional[Sequence[uuid.UUID]] = None
+) -> Dict[str, int]:
+    """Rescore the active assets of a tenant (optionally only asset_ids) and commit"""
+    result = _rescore_assets(db, tenant_id, asset_ids)
+    db.commit()
+    return result
+
+
+def rescore_dirty_assets(db: Session, batch_size: int) -> int:
+    """
+    Rescore up to batch_size assets marked dirty, across tenants, in one
+    transaction. Return the number of assets processed.
+    """
+    from app.models import Asset
+
+    dirty = (
+        db.query(Asset.id, Asset.tenant_id)
+        .filter(Asset.risk_score_dirty == True)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    by_tenant = {}
+    for asset_id, tenant_id in dirty:
+        by_tenant.setdefault(tenant_id, []).append(asset_id)
+    for tenant_id, asset_ids in by_tenant.items():
+        _rescore_assets(db, tenant_id, asset_ids)
+    # Trashed assets are not scored: just clear their flag
+    db.execute(
+        update(Asset)
+        .where(Asset.id.in_([asset_id for asset_id, _ in dirty]), Asset.risk_score_dirty == True)
+        .values(risk_score_dirty=False, updated_at=Asset.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(dirty)
+
+
+def start_risk_rescore_worker(session_factory, interval_seconds: int, batch_size: int):
+    """
+    Every interval_seconds, rescore dirty assets in batches of batch_size
+    until none is left. Runs in a daemon thread.
+    """
+    if interval_seconds <= 0:
+        return None
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(interval_seconds):
+            db = session_factory()
+            try:
+                while rescore_dirty_assets(db, batch_size) == batch_size:
+                    pass
+            except Exception:
+                db.rollback()
+                logger.exception("Risk rescore of dirty assets failed")
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=_loop, name="risk-rescore-worker", daemon=True)
+    thread.start()
+    return stop
+
+
+def mark_assets_risk_dirty(connection, asset_ids) -> None:
+    """
+    Flag assets for rescoring (for writes that bypass the ORM flush hooks).
+    asset_ids is an iterable of ids or a SELECT of ids.
+    """
+    from app.models import Asset
+
+    if not isinstance(asset_ids, Selectable):
+        asset_ids = [asset_id for asset_id in set(asset_ids) if asset_id is not None]
+        if not asset_ids:
+            return
+    connection.execute(
+        update(Asset)
+        .where(Asset.id.in_(asset_ids), Asset.risk_score_dirty == False)
+        .values(risk_score_dirty=True, updated_at=Asset.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _connection_endpoints(connection, committed: bool) -> list:
+    state = inspect(connection)
+    endpoints = []
+    for field in ("parent_asset_id", "child_asset_id"):
+        history = state.attrs[field].history
+        if committed and history.deleted:
+            endpoints.append(history.deleted[0])
+        else:
+            endpoints.append(getattr(connection, field))
+    return endpoints
+
+
+def _collect_risk_dirty(session, flush_context, instances):
+    from app.models import Asset, AssetCommunication, AssetConnection
+
+    pending = session.info.setdefault(
+        "risk_dirty", {"assets": set(), "neighbours_of": set(), "interfaces": set()}
+    )
+    for obj in session.dirty:
+        if isinstance(obj, Asset):
+            state = inspect(obj)
+            if any(state.attrs[f].history.has_changes() for f in RISK_INPUT_FIELDS):
+                obj.risk_score_dirty = True
+            if any(state.attrs[f].history.has_changes() for f in NEIGHBOUR_INPUT_FIELDS):
+                pending["neighbours_of"].add(obj.id)
+        elif isinstance(obj, AssetConnection) and session.is_modified(obj):
+            pending["assets"].update(_connection_endpoints(obj, committed=True))
+            pending["assets"].update(_connection_endpoints(obj, committed=False))
+    for obj in session.new:
+        if isinstance(obj, AssetConnection):
+            pending["assets"].update(_connection_endpoints(obj, committed=False))
+        elif isinstance(obj, AssetCommunication):
+            pending["interfaces"].update((obj.src_interface_id, obj.dst_interface_id))
+    for obj in session.deleted:
+        if isinstance(obj, AssetConnection):
+            pending["assets"].update(_connection_endpoints(obj, committed=True))
+        elif isinstance(obj, AssetCommunication):
+            pending["interfaces"].update((obj.src_interface_id, obj.dst_interface_id))
+        elif isinstance(obj, Asset):
+            pending["neighbours_of"].add(obj.id)
+
+
+def _write_risk_dirty(session, flush_context):
+    from app.models import AssetInterface
+
+    pending = session.info.pop("risk_dirty", None)
+    if not pending:
+        return
+    connection = session.connection()
+    mark_assets_risk_dirty(connection, pending["assets"])
+    if pending["neighbours_of"]:
+        mark_assets_risk_dirty(connection, neighbour_ids_select(pending["neighbours_of"]))
+    interface_ids = [i for i in pending["interfaces"] if i is not None]
+    if interface_ids:
+        mark_assets_risk_dirty(
+            connection,
+            select(AssetInterface.asset_id).where(AssetInterface.id.in_(interface_ids)),
+        )
+
+
+_listeners_registered = False
+
+
+def register_risk_dirty_listeners():
+    """
+    Mark assets dirty from every ORM flush that changes a scoring input,
+    an AssetConnection or an AssetCommunication (both endpoints), or an
+    input of the graph features (the neighbours). New assets start dirty.
+    """
+    from app.models import AssetConnection
+
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    # Load the previous endpoints on assignment, so a re-pointed connection
+    # also dirties the assets it was detached from
+    for field in ("parent_asset_id", "child_asset_id"):
+        event.listen(
+            getattr(AssetConnection, field), "set", lambda *args: None, active_history=True
+        )
+    event.listen(Session, "before_flush", _collect_risk_dirty)
+    event.listen(Session, "after_flush", _write_risk_dirty)
+    event.listen(Session, "after_rollback", lambda session: session.info.pop("risk_dirty", None))
+    _listeners_registered = True
@@ -0,0 +1,95 @@
+# backend/services/supplier_import.py
+"""XLSX/CSV supplier import, an ImportTarget of services/import_engine.py"""
+
+from typing import List, Tuple
+
+from app.models import Supplier
+from app.schemas.validators import (
+    validate_email,
+    validate_phone,
+    validate_tax_code,
+    validate_vat_number,
+    validate_website,
+)
+from app.services.import_engine import ImportColumn, ImportRow, ImportSchema, ImportTarget
+
+
+def _validated(validator):
+    return lambda text: validator(None, text)
+
+
+SUPPLIER_SCHEMA = ImportSchema(
+    [
+        ImportColumn("name", required=True),
+        # Validated in this order, the first failure is the row error
+        ImportColumn("vat_number", required=True, parse=_validated(validate_vat_number)),
+        ImportColumn("tax_code", parse=_validated(validate_tax_code)),
+        ImportColumn("email", parse=_validated(validate_email)),
+        ImportColumn("phone", parse=_validated(validate_phone)),
+        ImportColumn("website", parse=_validated(validate_website)),
+        ImportColumn("description"),
+        ImportColumn("address"),
+        ImportColumn("city"),
+        ImportColumn("zip_code"),
+        ImportColumn("province"),
+        ImportColumn("country"),
+        ImportColumn("notes"),
+    ]
+)
+
+
+class SupplierImport(ImportTarget):
+    """Suppliers created, or updated when the VAT number matches"""
+
+    kind = "suppliers"
+    schema = SUPPLIER_SCHEMA
+
+    def _suppliers_by_vat(self, rows: List[ImportRow]) -> dict:
+        by_vat = {}
+        for supplier in (
+            self.db.query(Supplier)
+            .filter(
+                Supplier.tenant_id == self.tenant_id,
+                Supplier.vat_number.in_({row.values["vat_number"] for row in rows}),
+            )
+            .all()
+        ):
+            by_vat.setdefault(supplier.vat_number, supplier)
+        return by_vat
+
+    def preview(self, rows: List[ImportRow]) -> Tuple[list, list]:
+        by_vat = self._suppliers_by_vat(rows)
+        to_create, to_update = [], []
+        for row in rows:
+            values = row.values
+            supplier = by_vat.get(values["vat_number"])
+            if supplier is None:
+                to_create.append(values)
+                continue
+            diff = {}
+            for field in SUPPLIER_SCHEMA.names:
+                old = getattr(supplier, field)
+                if str(old) != str(values[field]):
+                    diff[field] = {"old": old, "new": values[field]}
+            if diff:
+                to_update.append({"vat_number": values["vat_number"], "diff": diff})
+        return to_create, to_update
+
+    def write(self, rows: List[ImportRow]) -> Tuple[list, list, list]:
+        by_vat = self._suppliers_by_vat(rows)
+        created, updated = [], []
+        new_suppliers = []
+        for row in rows:
+            values = row.values
+            supplier = by_vat.get(values["vat_number"])
+            if supplier is not None:
+                for field, value in values.items():
+                    setattr(supplier, field, value)
+                updated.append(values["vat_number"])
+            else:
+                by_vat[values["vat_number"]] = Supplier(**values, tenant_id=self.tenant_id)
+                new_suppliers.append(by_vat[values["vat_number"]])
+                created.append(values["vat_number"])
+        self.db.add_all(new_suppliers)
+        self.db.flush()
+        return created, updated, []
@@ -2,11 +2,15 @@
 Common utilities for the application
 """
 
+import base64
+import json
 import uuid
 from typing import Any, Dict, Optional
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
 import bleach
 
 
@@ -63,6 +67,31 @@ def apply_pagination(query, skip: int = 0, limit: int = 100):
     return query.offset(skip).limit(limit)
 
 
+def clamp_page_size(limit: Optional[int]) -> int:
+    """Bound a requested page size to [1, MAX_PAGE_SIZE]"""
+    from app.config import settings
+
+    if not limit or limit < 1:
+        return settings.DEFAULT_PAGE_SIZE
+    return min(limit, settings.MAX_PAGE_SIZE)
+
+
+def encode_cursor(values: list) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[list]:
+    """Decode a cursor produced by encode_cursor. Return None if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
 def validate_uuid(uuid_string: str) -> Optional[uuid.UUID]:
     """Validate and convert a string to UUID"""
     try:
@@ -84,3 +113,33 @@ def parse_datetime(dt_string: str) -> Optional[datetime]:
         return datetime.fromisoformat(dt_string.replace("Z", "+00:00"))
     except (ValueError, AttributeError):
         return None
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) wrapper for a SELECT statement"""
+
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kw)
+
+
+def explain_plan(db: Session, query) -> dict:
+    """Return the root node of the PostgreSQL plan for a Query or Select"""
+    statement = getattr(query, "statement", query)
+    result = db.execute(Explain(statement)).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"]
+
+
+def estimate_row_count(db: Session, query) -> int:
+    """Planner estimate of the rows returned by a query (no table scan)"""
+    return int(explain_plan(db, query).get("Plan Rows", 0))
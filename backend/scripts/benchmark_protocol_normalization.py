@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of the protocol normalization of the PCAP import
+
+Usage (from backend/):
+  python scripts/benchmark_protocol_normalization.py [calls]
+
+Prints, per protocol name, the cost of a memoized normalize_protocol call
+and of an uncached ProtocolNormalizer lookup.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pcap_parser import ProtocolNormalizer, normalize_protocol
+
+NAMES = ["MODBUS", "s7comm", "S7COMM-PLUS-XYZ", "TCP", "VENDOR-PROPRIETARY"]
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    normalizer = ProtocolNormalizer()
+    for name in NAMES:
+        memoized = timeit.timeit(lambda: normalize_protocol(name), number=number) / number
+        uncached = timeit.timeit(lambda: normalizer._normalize(name), number=number // 10) / (number // 10)
+        print(f"{name:<22} memoized {memoized * 1e9:7.0f} ns   uncached {uncached * 1e9:7.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
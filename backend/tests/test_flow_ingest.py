@@ -0,0 +1,92 @@
+import json
+import uuid
+from app.services.flow_ingest import FlowAggregator, summarize_flows
+
+TENANT = uuid.uuid4()
+SITE = uuid.uuid4()
+
+def _line(**record):
+    return json.dumps(record).encode()
+
+class TestFlowAggregator:
+    """Flow records are folded into the PCAP import devices/communications"""
+
+    def test_records_are_aggregated_per_window(self):
+        aggregator = FlowAggregator()
+        accepted, rejected = aggregator.add_lines(
+            [
+                _line(src_mac="00:1b:1b:00:00:02", dst_mac="00-1B-1B-00-00-01", src_ip="10.0.0.2", proto="modbus", packets=10),
+                _line(src_mac="001B1B000002", dst_mac="00:1B:1B:00:00:01", src_ip="10.0.0.2", proto="modbus", packets=5),
+                _line(src_mac="00:1B:1B:00:00:01", dst_mac="00:1B:1B:00:00:02", src_ip="10.0.0.1", proto="s7comm"),
+                b"",
+                b"not json",
+                _line(src_mac="not a mac", dst_mac="00:1B:1B:00:00:02"),
+                _line(src_mac="00:1B:1B:00:00:01", dst_mac="00:1B:1B:00:00:02", proto=["s7"]),
+            ],
+            TENANT,
+            SITE,
+        )
+
+        assert (accepted, rejected) == (3, 3)
+        window = aggregator._windows[(TENANT, SITE)]
+        assert set(window.last_seen) == {"00:1B:1B:00:00:01", "00:1B:1B:00:00:02"}
+
+        devices, communications = summarize_flows(window.flows)
+        assert devices["00:1B:1B:00:00:02"] == {"ips": ["10.0.0.2"], "protocols": ["Modbus"]}
+        assert devices["00:1B:1B:00:00:01"] == {"ips": ["10.0.0.1"], "protocols": ["S7"]}
+        assert communications["00:1B:1B:00:00:02"] == {"00:1B:1B:00:00:01": 15}
+        assert communications["00:1B:1B:00:00:01"] == {"00:1B:1B:00:00:02": 1}
+
+    def test_pending_counts_distinct_flows(self):
+        aggregator = FlowAggregator()
+        record = _line(src_mac="00:1B:1B:00:00:01", dst_mac="00:1B:1B:00:00:02", proto="modbus")
+        aggregator.add_lines([record, record], TENANT, SITE)
+        aggregator.add_lines([record], TENANT, uuid.uuid4())
+
+        assert aggregator.pending() == 2
+        # Nothing to write: no session is opened
+        assert FlowAggregator().flush(session_factory=None) == 0
+
+    def test_packet_counts(self):
+        aggregator = FlowAggregator()
+        macs = {"src_mac": "00:1B:1B:00:00:01", "dst_mac": "00:1B:1B:00:00:02"}
+
+        # A missing count is one packet, zero and negative counts are invalid
+        assert aggregator.add_lines(
+            [_line(**macs), _line(**macs, packets=0), _line(**macs, packets=-2), _line(**macs, packets="x")],
+            TENANT,
+            SITE,
+        ) == (1, 3)
+        assert aggregator.pending() == 1
+
+class _FailingSession:
+    """Session of an unreachable database: every query raises"""
+
+    def __init__(self):
+        self.rolled_back = False
+
+    def query(self, *args):
+        raise ConnectionError("database unavailable")
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        pass
+
+class TestFlowFlush:
+    def test_failed_window_is_retried(self):
+        aggregator = FlowAggregator()
+        record = _line(src_mac="00:1B:1B:00:00:01", dst_mac="00:1B:1B:00:00:02", proto="modbus", packets=3)
+        aggregator.add_lines([record], TENANT, SITE)
+        session = _FailingSession()
+
+        assert aggregator.flush(lambda: session) == 0
+        assert session.rolled_back
+        # The failed window is kept and keeps aggregating
+        aggregator.add_lines([record], TENANT, SITE)
+
+        window = aggregator._windows[(TENANT, SITE)]
+        assert aggregator.pending() == 1
+        assert sum(window.flows.values()) == 6
+        assert set(window.last_seen) == {"00:1B:1B:00:00:01", "00:1B:1B:00:00:02"}
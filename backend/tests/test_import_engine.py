@@ -0,0 +1,183 @@
+import io
+import uuid
+from datetime import datetime
+
+import openpyxl
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.errors.exceptions import ErrorCodeException
+from app.services.import_engine import (
+    ImportColumn,
+    ImportFileError,
+    ImportSchema,
+    ImportTarget,
+    iter_sheet_rows,
+    preview_import,
+    run_import,
+    stage_import,
+    staged_import_path,
+)
+
+TENANT = uuid.uuid4()
+
+
+class _Upload:
+    """The parts of an UploadFile the engine reads"""
+
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = io.BytesIO(content)
+
+
+class _Session:
+    def __init__(self):
+        self.commits = self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _number(text):
+    return int(text) if text is not None else None
+
+
+class _Target(ImportTarget):
+    """Keeps the written rows in memory, a name "fail" fails its batch"""
+
+    kind = "things"
+    schema = ImportSchema(
+        [ImportColumn("name", required=True), ImportColumn("count", parse=_number)]
+    )
+
+    def reset(self):
+        self.written = []
+
+    def preview(self, rows):
+        return [row.values for row in rows], []
+
+    def write(self, rows):
+        if any(row.values["name"] == "fail" for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+        self.written += [row.values["name"] for row in rows]
+        return [row.values["name"] for row in rows], [], []
+
+
+def _stage(monkeypatch, tmp_path, csv_text, kind="things"):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    token = stage_import(_Upload("sheet.csv", csv_text.encode()), kind, TENANT)
+    return staged_import_path(token, kind, TENANT)
+
+
+class TestSheetRows:
+    """Both formats stream (row number, cleaned text cells)"""
+
+    def test_csv_rows(self):
+        content = "﻿name,count\n a ,1\n,\nb,\n".encode()
+
+        assert list(iter_sheet_rows(io.BytesIO(content), "things.CSV")) == [
+            (2, {"name": "a", "count": "1"}),
+            (4, {"name": "b"}),
+        ]
+
+    def test_xlsx_cells_are_text(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["name", "count", "date"])
+        sheet.append(["a", 3.0, datetime(2024, 5, 1)])
+        sheet.append([None, None, None])
+        sheet.append(["b", 2.5, datetime(2024, 5, 1, 10, 30)])
+        content = io.BytesIO()
+        workbook.save(content)
+        content.seek(0)
+
+        assert list(iter_sheet_rows(content, "things.xlsx")) == [
+            (2, {"name": "a", "count": "3", "date": "2024-05-01"}),
+            (4, {"name": "b", "count": "2.5", "date": "2024-05-01 10:30:00"}),
+        ]
+
+
+class TestImportSchema:
+    def test_headers_missing_and_invalid(self):
+        schema = ImportSchema(
+            [
+                ImportColumn("name", required=True, headers=("nome", "name")),
+                ImportColumn("count", parse=_number),
+            ]
+        )
+
+        assert schema.parse({"nome": "a", "name": "b"}) == ({"name": "a", "count": None}, None)
+        assert schema.parse({"count": "1"})[1] == "Missing required fields: name"
+        assert schema.parse({"name": "a", "count": "x"})[1].startswith("Validation error: ")
+
+
+class TestStagedImport:
+    """A preview token is only valid for its tenant and kind"""
+
+    def test_token_is_scoped(self, monkeypatch, tmp_path):
+        path = _stage(monkeypatch, tmp_path, "name\na\n")
+        token = path.rsplit("/", 1)[1].split(".")[0]
+
+        with pytest.raises(ErrorCodeException):
+            staged_import_path(token, "things", uuid.uuid4())
+        with pytest.raises(ErrorCodeException):
+            staged_import_path(token, "assets", TENANT)
+        with pytest.raises(ErrorCodeException):
+            staged_import_path("../" + token, "things", TENANT)
+
+    def test_unreadable_upload(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+        with pytest.raises(ImportFileError):
+            stage_import(_Upload("sheet.xlsx", b"not a workbook"), "things", TENANT)
+        assert list((tmp_path / "imports").iterdir()) == []
+
+
+class TestRunImport:
+    SHEET = "name,count\na,1\n,2\nb,x\nfail,3\nc,4\n"
+
+    def test_preview(self, monkeypatch, tmp_path):
+        path = _stage(monkeypatch, tmp_path, self.SHEET)
+
+        result = preview_import(_Target(_Session(), TENANT), path)
+
+        assert [values["name"] for values in result["to_create"]] == ["a", "fail", "c"]
+        assert [error["row"] for error in result["errors"]] == [3, 4]
+
+    def test_per_batch_skips_failed_rows_and_batches(self, monkeypatch, tmp_path):
+        path = _stage(monkeypatch, tmp_path, self.SHEET)
+        db = _Session()
+        target = _Target(db, TENANT)
+
+        result = run_import(target, path, batch_size=1)
+
+        assert result["created"] == ["a", "c"]
+        assert result["errors"] == [
+            {"row": 3, "error": "Missing required fields: name"},
+            {"row": 4, "error": "Validation error: invalid literal for int() with base 10: 'x'"},
+            {"row": 5, "error": "Integrity error: duplicate key"},
+        ]
+        assert (db.commits, db.rollbacks) == (2, 1)
+
+    def test_all_or_nothing(self, monkeypatch, tmp_path):
+        db = _Session()
+
+        result = run_import(
+            _Target(db, TENANT), _stage(monkeypatch, tmp_path, self.SHEET), "all_or_nothing"
+        )
+        assert result["created"] == [] and len(result["errors"]) == 2
+        assert db.commits == 0
+
+        result = run_import(
+            _Target(db, TENANT), _stage(monkeypatch, tmp_path, "name\na\nfail\n"), "all_or_nothing", 1
+        )
+        assert result == {
+            "created": [],
+            "updated": [],
+            "errors": [{"row": 3, "error": "Integrity error: duplicate key"}],
+        }
+        assert (db.commits, db.rollbacks) == (0, 1)
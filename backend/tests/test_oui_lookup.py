@@ -0,0 +1,46 @@
+import pytest
+from app.services.oui_lookup import OUIDatabase, compile_oui, get_oui_database, parse_oui
+
+REGISTRY = """\
+OUI/MA-L                                                    Organization
+company_id                                                  Organization
+
+00-1B-1B   (hex)		Siemens AG
+001B1B     (base 16)		Siemens AG
+				Nuernberg  Bavaria  90475
+				DE
+
+40-D8-55                      (hex)                         IEEE Registration Authority
+40D855                        (base 16)                     IEEE Registration Authority
+
+40-D8-55                      (hex)                         Avant Technologies
+0D7000-0D7FFF                 (base 16)                     Avant Technologies
+
+70-B3-D5                      (hex)                         Example MA-M
+A00000-AFFFFF                 (base 16)                     Example MA-M
+"""
+
+class TestOUILookup:
+    """The compiled OUI table resolves MA-L, MA-M and MA-S/IAB prefixes"""
+
+    def test_longest_prefix_wins(self):
+        database = OUIDatabase(compile_oui(parse_oui(REGISTRY), "test"))
+
+        assert database.version == "test"
+        assert len(database) == 4
+        assert database.lookup("00:1b:1b:00:00:01") == "Siemens AG"
+        assert database.lookup("40-D8-55-0D-70-01") == "Avant Technologies"
+        assert database.lookup("40D8550D8001") == "IEEE Registration Authority"
+        assert database.lookup("70:B3:D5:AB:CD:EF") == "Example MA-M"
+        assert database.lookup("70:B3:D5:BB:CD:EF") is None
+        assert database.lookup("not a mac") is None
+
+    def test_rejects_other_files(self):
+        with pytest.raises(ValueError):
+            OUIDatabase(b"\0" * 64)
+
+    def test_vendored_table(self):
+        database = get_oui_database()
+
+        assert len(database) > 30000
+        assert database.lookup("00:1B:1B:00:00:01").startswith("Siemens")
@@ -0,0 +1,90 @@
+import pytest
+import struct
+from app.services.pcap_parser import aggregate_pcap_files, extract_assets_and_communications_from_pcap
+from app.services.pcap_reader import PcapFormatError, aggregate_pcap_file, split_pcap_file
+from collections import Counter
+
+PLC_MAC = bytes.fromhex("001b1b000001")
+HMI_MAC = bytes.fromhex("001b1b000002")
+
+def _tcp_frame(src_mac, dst_mac, src_ip, dst_ip, dport, vlan=False):
+    tcp = struct.pack("!HHIIBBHHH", 40000, dport, 0, 0, 0x50, 0x18, 0, 0, 0)
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0, src_ip, dst_ip)
+    tag = struct.pack("!HH", 0x8100, 10) if vlan else b""
+    return dst_mac + src_mac + tag + b"\x08\x00" + ip + tcp
+
+def _frames():
+    return [
+        _tcp_frame(HMI_MAC, PLC_MAC, bytes([10, 0, 0, 2]), bytes([10, 0, 0, 1]), 502),
+        _tcp_frame(HMI_MAC, PLC_MAC, bytes([10, 0, 0, 2]), bytes([10, 0, 0, 1]), 502, vlan=True),
+        _tcp_frame(PLC_MAC, HMI_MAC, bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]), 102),
+    ]
+
+def _write_pcap(path):
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for i, frame in enumerate(_frames()):
+            f.write(struct.pack("<IIII", i, 0, len(frame), len(frame)))
+            f.write(frame)
+
+def _write_pcapng(path):
+    def block(block_type, body):
+        body += b"\0" * (-len(body) % 4)
+        length = 12 + len(body)
+        return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+    with open(path, "wb") as f:
+        f.write(block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1)))
+        f.write(block(1, struct.pack("<HHI", 1, 0, 65535)))
+        for i, frame in enumerate(_frames()):
+            f.write(block(6, struct.pack("<IIIII", 0, 0, i, len(frame), len(frame)) + frame))
+
+class TestPcapReader:
+    """The streaming reader produces the devices/communications of the PCAP import"""
+
+    @pytest.mark.parametrize("writer,name", [(_write_pcap, "capture.pcap"), (_write_pcapng, "capture.pcapng")])
+    def test_devices_and_communications(self, tmp_path, writer, name):
+        path = tmp_path / name
+        writer(path)
+
+        devices, communications = extract_assets_and_communications_from_pcap(str(path))
+
+        assert devices["00:1B:1B:00:00:02"] == {"ips": ["10.0.0.2"], "protocols": ["Modbus"]}
+        assert devices["00:1B:1B:00:00:01"] == {"ips": ["10.0.0.1"], "protocols": ["S7"]}
+        assert communications["00:1B:1B:00:00:02"] == {"00:1B:1B:00:00:01": 2}
+        assert communications["00:1B:1B:00:00:01"] == {"00:1B:1B:00:00:02": 1}
+
+    @pytest.mark.parametrize("writer,name", [(_write_pcap, "capture.pcap"), (_write_pcapng, "capture.pcapng")])
+    def test_chunks_merge_to_the_whole_capture(self, tmp_path, writer, name):
+        path = tmp_path / name
+        writer(path)
+        whole = aggregate_pcap_file(str(path))
+
+        ranges = split_pcap_file(str(path), 64)
+        merged = Counter()
+        for end, state in ranges:
+            aggregate_pcap_file(str(path), merged, state, end)
+
+        assert len(ranges) > 1
+        assert merged == whole
+        reported = []
+        assert aggregate_pcap_files(
+            [str(path)], workers=1, chunk_size=64, progress=lambda size, packets: reported.append((size, packets))
+        ) == [whole]
+        assert sum(size for size, _ in reported) == path.stat().st_size - ranges[0][1][3]
+        assert sum(packets for _, packets in reported) == 3
+
+    def test_truncated_capture_is_read_up_to_the_last_full_record(self, tmp_path):
+        path = tmp_path / "capture.pcap"
+        _write_pcap(path)
+        with open(path, "ab") as f:
+            f.write(struct.pack("<IIII", 9, 0, 1000, 1000) + b"\0" * 10)
+
+        assert sum(aggregate_pcap_file(str(path)).values()) == 3
+
+    def test_rejects_non_capture_files(self, tmp_path):
+        path = tmp_path / "capture.pcap"
+        path.write_bytes(b"this is not a capture file at all")
+
+        with pytest.raises(PcapFormatError):
+            aggregate_pcap_file(str(path))
@@ -0,0 +1,85 @@
+import pytest
+import struct
+from app.services.pcap_parser import PROTOCOL_MAPPING
+from app.services.protocol_classifier import (
+    ETHERTYPE_PROTOCOLS,
+    TCP_PORT_PROTOCOLS,
+    UDP_PORT_PROTOCOLS,
+    FlowMemo,
+    classify_ethertype,
+    classify_tcp,
+    classify_udp,
+)
+
+def _tcp(dport, payload=b"", sport=40000):
+    header = struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 0x50, 0x18, 0, 0, 0)
+    segment = header + payload
+    return segment, len(segment)
+
+def _udp(dport, payload=b"", sport=40000):
+    datagram = struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+    return datagram, len(datagram)
+
+def _tpkt(cotp_payload):
+    cotp = bytes([2, 0xF0, 0x80])
+    return struct.pack("!BBH", 3, 0, 4 + len(cotp) + len(cotp_payload)) + cotp + cotp_payload
+
+ENIP_REGISTER = struct.pack("<HHI4s8sI", 0x0065, 4, 0, b"\0" * 4, b"\0" * 8, 0) + b"\x01\x00\x00\x00"
+MQTT_CONNECT = b"\x10\x10\x00\x04MQTT\x04\x02\x00\x3c\x00\x04test"
+
+class TestProtocolClassifier:
+    """Ports and payload signatures identify the industrial protocols"""
+
+    @pytest.mark.parametrize("dport,payload,expected", [
+        (502, b"\x00\x01\x00\x00\x00\x06\x01\x03\x00\x00\x00\x0a", "MODBUS"),
+        (102, _tpkt(b"\x32\x01\x00\x00"), "S7COMM"),
+        (102, _tpkt(b"\x0d\x00\x00\x00"), "MMS"),
+        (44818, ENIP_REGISTER, "ENIP"),
+        (2404, b"\x68\x04\x07\x00\x00\x00", "IEC104"),
+        (20000, b"\x05\x64\x05\xc0\x01\x00\x00\x04\xe9\x21", "DNP3"),
+        (4840, b"HELF\x20\x00\x00\x00" + b"\0" * 24, "OPCUA"),
+        (502, b"", "MODBUS"),  # handshake: port only
+        (3389, _tpkt(b"\x32\x01\x00\x00"), None),  # RDP also runs over TPKT
+        (80, ENIP_REGISTER, "HTTP"),
+    ])
+    def test_tcp(self, dport, payload, expected):
+        segment, end = _tcp(dport, payload)
+        assert classify_tcp(segment, 0, end, 40000, dport) == expected
+
+    @pytest.mark.parametrize("payload,expected", [
+        (ENIP_REGISTER, "ENIP"),
+        (MQTT_CONNECT, "MQTT"),
+        (b"\x05\x64\x05\xc0\x01\x00\x00\x04\xe9\x21", "DNP3"),
+        (b"GET / HTTP/1.1\r\n\r\n", None),
+    ])
+    def test_signatures_on_other_ports(self, payload, expected):
+        segment, end = _tcp(12345, payload)
+        assert classify_tcp(segment, 0, end, 40000, 12345) == expected
+
+    def test_udp_and_ethertype(self):
+        bvlc = b"\x81\x0b\x00\x0c\x01\x20\xff\xff\x00\xff\x10\x08"
+        datagram, end = _udp(47808, bvlc)
+        assert classify_udp(datagram, 0, end, 47808, 47808) == "BACNET"
+        datagram, end = _udp(50000, bvlc)
+        assert classify_udp(datagram, 0, end, 50000, 50000) == "BACNET"
+        datagram, end = _udp(2222, b"\x02\x00\x02\x80")
+        assert classify_udp(datagram, 0, end, 2222, 2222) == "ENIP"
+        assert classify_ethertype(0x8892) == "PROFINET"
+
+    def test_every_label_has_a_canonical_name(self):
+        labels = {*ETHERTYPE_PROTOCOLS.values(), *TCP_PORT_PROTOCOLS.values(), *UDP_PORT_PROTOCOLS.values(), "MMS"}
+        assert sorted(label for label in labels if label not in PROTOCOL_MAPPING) == []
+        assert PROTOCOL_MAPPING["IEC104"] == "IEC 60870-5-104"
+
+    def test_flow_memo_is_bounded(self):
+        flows = FlowMemo(max_size=2)
+        modbus, end = _tcp(502, b"\x00\x01\x00\x00\x00\x06\x01\x03\x00\x00\x00\x0a")
+        ack, ack_end = _tcp(502)
+
+        for sport in (1, 2, 3):
+            assert classify_tcp(modbus, 0, end, sport, 502, flows, "plc") == "MODBUS"
+        assert list(flows) == [("plc", 2, 502), ("plc", 3, 502)]
+        # A hit keeps the flow, the least recently seen one is evicted
+        classify_tcp(ack, 0, ack_end, 2, 502, flows, "plc")
+        classify_tcp(modbus, 0, end, 4, 502, flows, "plc")
+        assert list(flows) == [("plc", 2, 502), ("plc", 4, 502)]
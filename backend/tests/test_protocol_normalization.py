@@ -0,0 +1,33 @@
+import pytest
+from app.services.pcap_parser import ProtocolNormalizer, get_protocol_normalizer, normalize_protocol
+
+class TestProtocolNormalization:
+    """Compiled protocol table: exact match, substring match, tenant entries"""
+
+    @pytest.mark.parametrize("name,expected", [
+        ("modbus", "Modbus"),
+        ("S7COMM", "S7"),
+        ("s7comm-plus", "S7"),
+        ("http-modbus", "Modbus"),  # the first key of the table wins
+        ("TCP", None),
+        ("", None),
+        (None, None),
+        ("vendor-proprietary", "VENDOR-PROPRIETARY"),
+    ])
+    def test_default_table(self, name, expected):
+        assert normalize_protocol(name) == expected
+        # memoized result
+        assert normalize_protocol(name) == expected
+
+    def test_tenant_entries_take_priority(self):
+        normalizer = get_protocol_normalizer({"foobus": "Modbus", "S7": "Other"})
+
+        assert normalizer("FOOBUS-V2") == "Modbus"
+        assert normalizer("s7-plus") == "Other"
+        assert normalizer("s7comm") == "S7"  # exact built-in entry
+        assert normalize_protocol("s7-plus") == "S7"
+        assert get_protocol_normalizer({"S7": "Other", "foobus": "Modbus"}) is normalizer
+        assert get_protocol_normalizer(None) is get_protocol_normalizer({})
+
+    def test_tenant_entry_can_drop_a_protocol(self):
+        assert ProtocolNormalizer({"LLDP": None})("lldp") is None
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+
+import openpyxl
+
+from app.services.table_export import EXPORT_CHUNK_ROWS, iter_csv, iter_jsonl, iter_xlsx
+
+COLUMNS = ["name", "id", "installation_date", "protocols", "risk_score", "notes"]
+ASSET_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+ROW = ("PLC 1", ASSET_ID, date(2024, 1, 2), ["modbus", "s7"], 42.5, None)
+
+
+class TestTableExport:
+    """Every writer streams the header and the rows, whatever their count"""
+
+    def test_csv_is_sent_in_chunks(self):
+        rows = [("asset", index) for index in range(EXPORT_CHUNK_ROWS * 2 + 1)]
+
+        chunks = list(iter_csv(["name", "index"], iter(rows)))
+
+        assert len(chunks) == 3
+        parsed = list(csv.reader(io.StringIO("".join(chunks))))
+        assert parsed[0] == ["name", "index"]
+        assert len(parsed) == len(rows) + 1
+        assert parsed[-1] == ["asset", str(len(rows) - 1)]
+
+    def test_csv_values(self):
+        parsed = list(csv.reader(io.StringIO("".join(iter_csv(COLUMNS, [ROW])))))
+
+        assert parsed[1] == ["PLC 1", str(ASSET_ID), "2024-01-02", "modbus;s7", "42.5", ""]
+
+    def test_jsonl_keeps_types(self):
+        lines = "".join(iter_jsonl(COLUMNS, [ROW, ROW])).splitlines()
+
+        assert len(lines) == 2
+        assert json.loads(lines[0]) == {
+            "name": "PLC 1",
+            "id": str(ASSET_ID),
+            "installation_date": "2024-01-02",
+            "protocols": ["modbus", "s7"],
+            "risk_score": 42.5,
+            "notes": None,
+        }
+
+    def test_xlsx_round_trip(self):
+        content = b"".join(
+            iter_xlsx(COLUMNS, [ROW, ("PLC 2", None, datetime(2024, 1, 2, 8), [], 0, "n")], "Assets")
+        )
+
+        workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+        rows = list(workbook["Assets"].iter_rows(values_only=True))
+        workbook.close()
+        assert rows[0] == tuple(COLUMNS)
+        # Trailing blank cells are not written
+        assert rows[1] == ("PLC 1", str(ASSET_ID), "2024-01-02", "modbus;s7", 42.5)
+        assert rows[2] == ("PLC 2", None, "2024-01-02T08:00:00", None, 0, "n")
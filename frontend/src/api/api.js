@@ -32,6 +32,10 @@ export default {
   getAssets(params = {}) {
     return api.get('/assets', { params })
   },
+  // format: csv | xlsx | jsonl, params: i filtri di getAssets
+  exportAssets(format = 'csv', params = {}) {
+    return api.get('/assets/export', { params: { ...params, format }, responseType: 'blob' })
+  },
   getAssetsForNetworkMap() {
     return api.get('/assets/for-network-map')
   },
@@ -132,6 +136,10 @@ export default {
   getAllConnections() {
     return api.get('/asset-connections')
   },
+  // params: group_by, expand (id dei cluster), max_nodes, min_x/min_y/max_x/max_y, site_id, asset_type_id
+  getNetworkTopologyLod(params = {}) {
+    return api.get('/asset-connections/network-topology/lod', { params, paramsSerializer: { indexes: null } })
+  },
   createAssetConnection(assetId, connectionData) {
     return api.post(`/assets/${assetId}/connections`,connectionData)
   },
@@ -156,11 +164,18 @@ export default {
   updatePosition(assetId,position) {
     return api.patch(`/assets/${assetId}/position`, position)
   },
+  // positions: [{ id, map_x, map_y, version }], la risposta riporta updated, conflicts e not_found
+  updatePositions(positions) {
+    return api.patch('/assets/positions', positions)
+  },
   uploadPcapFile(formData) {
     return api.post(`/pcap/upload`, formData, {
       headers: { "Content-Type": "multipart/form-data" }
       }) 
   },
+  getPcapJob(jobId) {
+    return api.get(`/pcap/jobs/${jobId}`)
+  },
   getAssetCommunications(assetId) {
     return api.get(`/assets/${assetId}/communications`)
   },
@@ -326,13 +341,17 @@ export default {
     formData.append('file', file)
     return api.post('/assets/import/xlsx/preview', formData, { headers: { 'Content-Type': 'multipart/form-data' } })
   },
-  confirmAssetImportXlsx(file) {
+  // token: from the preview, the confirm reuses its parsed rows instead of the file
+  confirmAssetImportXlsx(file, mode = 'per_batch', token = null) {
     const formData = new FormData()
-    formData.append('file', file)
+    if (token) formData.append('token', token)
+    else formData.append('file', file)
+    formData.append('mode', mode)
     return api.post('/assets/import/xlsx/confirm', formData, { headers: { 'Content-Type': 'multipart/form-data' } })
   },
-  bulkUpdateAssets(ids, fields) {
-    return api.post('/assets/bulk-update', { ids, fields })
+  // mode: per_asset | all_or_nothing
+  bulkUpdateAssets(ids, fields, mode = 'per_asset') {
+    return api.post('/assets/bulk-update', { ids, fields, mode })
   },
   bulkSoftDeleteAssets(ids) {
     return api.post('/assets/bulk-soft-delete', { ids })
@@ -472,9 +491,10 @@ export default {
       headers: { 'Content-Type': 'multipart/form-data' }
     });
   },
-  confirmSupplierImportXlsx(file) {
+  confirmSupplierImportXlsx(file, token = null) {
     const formData = new FormData();
-    formData.append('file', file);
+    if (token) formData.append('token', token);
+    else formData.append('file', file);
     return api.post('/suppliers/import/xlsx/confirm', formData, {
       headers: { 'Content-Type': 'multipart/form-data' }
     });
@@ -489,9 +509,10 @@ export default {
       headers: { 'Content-Type': 'multipart/form-data' }
     });
   },
-  confirmContactImportXlsx(file) {
+  confirmContactImportXlsx(file, token = null) {
     const formData = new FormData();
-    formData.append('file', file);
+    if (token) formData.append('token', token);
+    else formData.append('file', file);
     return api.post('/contacts/import/xlsx/confirm', formData, {
       headers: { 'Content-Type': 'multipart/form-data' }
     });